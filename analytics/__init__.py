@@ -0,0 +1 @@
+from .ingestion import track, metrics  # noqa
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AnalyticsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "analytics"
+
+    def ready(self):
+        # Planificateur d'agrégation en processus (serveurs uniquement, voir core.workers)
+        if getattr(settings, 'ANALYTICS_ROLLUP_SCHEDULER', False):
+            from .rollup import scheduler
+            scheduler.start()
@@ -0,0 +1,289 @@
+"""
+Pipeline d'ingestion des événements analytics
+
+track() ajoute l'événement dans un tampon circulaire en mémoire (aucune
+requête SQL) ; un thread d'arrière-plan l'écrit par lots avec bulk_create.
+
+Comportement en cas de tampon plein (ANALYTICS_OVERFLOW) :
+- 'drop'  : l'événement est abandonné et comptabilisé ;
+- 'block' : l'appelant attend au plus ANALYTICS_BLOCK_TIMEOUT secondes qu'un
+            flush libère de la place, puis l'événement est abandonné ;
+- 'spill' : l'événement est écrit sur disque (JSON lines) dans
+            ANALYTICS_SPILL_DIR et réinjecté au flush suivant.
+
+Un lot refusé par la base est scindé : les lignes valides sont écrites, les
+lignes refusées mises de côté dans ANALYTICS_SPILL_DIR (dead-letter-*.jsonl,
+non réinjectées). Un lot qui échoue faute de connexion est réessayé au plus
+ANALYTICS_MAX_WRITE_ATTEMPTS fois avant d'être mis de côté.
+
+metrics() expose la profondeur du tampon et la latence des flush.
+Chaque flush met aussi à jour les sketches de visiteurs uniques (voir visitors).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, InterfaceError, OperationalError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.buffers import BufferedWriter
+from core.ratelimit import client_ip
+from .visitors import update_sketches
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('website_id', 'event_type', 'metadata', 'ip_address', 'user_agent', 'referer', 'created_at')
+REFERER_MAX_LENGTH = 200
+
+# Erreurs de connexion : le lot est réessayé tel quel (les autres erreurs
+# tiennent aux lignes elles-mêmes)
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+class AnalyticsBuffer(BufferedWriter):
+    """Tampon circulaire borné des événements analytics"""
+
+    interval_setting = 'ANALYTICS_FLUSH_INTERVAL'
+    max_pending_setting = 'ANALYTICS_FLUSH_BATCH_SIZE'
+    default_interval = 5
+    default_max_pending = 5000
+    thread_name = 'analytics-flusher'
+
+    def __init__(self):
+        self._not_full = None
+        super().__init__()
+        self._not_full = threading.Condition(self._lock)
+        self._spill_lock = threading.Lock()
+        self._failed_writes = 0
+        self._stats = {
+            'dropped': 0,
+            'spilled': 0,
+            'dead_lettered': 0,
+            'flushed': 0,
+            'flushes': 0,
+            'last_flush_size': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+        }
+
+    @property
+    def capacity(self):
+        return getattr(settings, 'ANALYTICS_BUFFER_SIZE', 100000)
+
+    @property
+    def overflow(self):
+        return getattr(settings, 'ANALYTICS_OVERFLOW', 'drop')
+
+    @property
+    def spill_dir(self):
+        return Path(getattr(settings, 'ANALYTICS_SPILL_DIR', Path(settings.BASE_DIR) / 'var' / 'analytics_spill'))
+
+    # Tampons
+
+    def reset(self):
+        self._events = deque()
+        if self._not_full is not None:
+            self._not_full.notify_all()
+
+    def snapshot(self):
+        return self._events
+
+    def merge(self, batch):
+        self._events.extendleft(reversed(batch))
+
+    # Ingestion
+
+    def record(self, event):
+        """Ajoute un événement (tuple ordonné selon FIELDS)"""
+        with self._lock:
+            if len(self._events) >= self.capacity:
+                if self.overflow == 'block' and self.threaded:
+                    self._wakeup.set()
+                    timeout = getattr(settings, 'ANALYTICS_BLOCK_TIMEOUT', 1)
+                    self._not_full.wait_for(lambda: len(self._events) < self.capacity, timeout)
+
+            if len(self._events) >= self.capacity:
+                if self.overflow == 'spill':
+                    self._stats['spilled'] += 1
+                    spill = True
+                else:
+                    self._stats['dropped'] += 1
+                    return False
+            else:
+                self._events.append(event)
+                self._pending += 1
+                spill = False
+
+        if spill:
+            self._spill(event)
+            return True
+
+        self.added()
+        return True
+
+    def _spill(self, event):
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        line = json.dumps(dict(zip(FIELDS, event)), default=str)
+        with self._spill_lock:
+            with open(self.spill_dir / f'events-{os.getpid()}.jsonl', 'a') as spill_file:
+                spill_file.write(line + '\n')
+
+    def _load_spilled(self):
+        """Récupère les événements déversés sur disque (tous processus confondus)"""
+        if not self.spill_dir.exists():
+            return []
+
+        events = []
+        for path in sorted(self.spill_dir.glob('events-*.jsonl')):
+            claimed = path.with_suffix(f'.processing-{os.getpid()}')
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue  # déjà réclamé par un autre processus
+            with open(claimed) as spill_file:
+                for line in spill_file:
+                    if line.strip():
+                        data = json.loads(line)
+                        data['created_at'] = parse_datetime(data['created_at'])
+                        events.append(tuple(data[field] for field in FIELDS))
+            claimed.unlink()
+        return events
+
+    # Écriture
+
+    def flush(self):
+        written = super().flush()
+        spilled = self._load_spilled()
+        if spilled:
+            with self._lock:
+                self._events.extend(spilled)
+                self._pending += len(spilled)
+            written += super().flush()
+        return written
+
+    def write(self, batch):
+        started = time.perf_counter()
+        batch = list(batch)
+        try:
+            objects = self._insert(batch)
+        except TRANSIENT_ERRORS:
+            # Base indisponible : le lot est réintégré, au plus ANALYTICS_MAX_WRITE_ATTEMPTS fois
+            self._failed_writes += 1
+            if self._failed_writes < getattr(settings, 'ANALYTICS_MAX_WRITE_ATTEMPTS', 5):
+                raise
+            logger.exception('Échec persistant de l\'écriture des événements analytics')
+            self._dead_letter(batch)
+            objects = []
+        except DatabaseError:
+            # Lignes refusées : écrire les lignes valides, mettre les autres de côté
+            objects, rejected = self._insert_valid(batch)
+            if rejected:
+                logger.error('%d événement(s) analytics refusé(s) par la base', len(rejected))
+                self._dead_letter(rejected)
+        self._failed_writes = 0
+
+        # Les événements sont écrits : un échec ici ne doit pas les réintégrer au tampon
+        try:
+            update_sketches(objects)
+        except Exception:
+            logger.exception('Échec de la mise à jour des sketches de visiteurs')
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._stats['flushes'] += 1
+        self._stats['flushed'] += len(objects)
+        self._stats['last_flush_size'] = len(objects)
+        self._stats['last_flush_ms'] = round(elapsed_ms, 2)
+        self._stats['max_flush_ms'] = round(max(self._stats['max_flush_ms'], elapsed_ms), 2)
+
+    def _insert(self, events):
+        """Insère des événements en une transaction ; retourne les objets créés"""
+        from .models import AnalyticsEvent
+
+        objects = [AnalyticsEvent(**dict(zip(FIELDS, event))) for event in events]
+        with transaction.atomic():
+            AnalyticsEvent.objects.bulk_create(objects, batch_size=self.max_pending)
+        return objects
+
+    def _insert_valid(self, events):
+        """
+        Écrit les événements valides d'un lot refusé : ceux des sites web
+        supprimés entre-temps sont écartés, puis le lot est scindé par
+        dichotomie jusqu'à isoler les lignes refusées.
+        Retourne (objets créés, événements refusés).
+        """
+        from websites.models import Website
+
+        website_ids = {event[0] for event in events}
+        existing = set(Website.objects.filter(pk__in=website_ids).values_list('pk', flat=True))
+        events = [event for event in events if event[0] in existing]
+        if not events:
+            return [], []
+        try:
+            return self._insert(events), []
+        except TRANSIENT_ERRORS:
+            raise
+        except DatabaseError:
+            if len(events) == 1:
+                return [], events
+        middle = len(events) // 2
+        written, rejected = self._insert_valid(events[:middle])
+        more_written, more_rejected = self._insert_valid(events[middle:])
+        return written + more_written, rejected + more_rejected
+
+    def _dead_letter(self, events):
+        """Met de côté sur disque (JSON lines) des événements qui ne peuvent pas être écrits"""
+        self._stats['dead_lettered'] += len(events)
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            with self._spill_lock:
+                with open(self.spill_dir / f'dead-letter-{os.getpid()}.jsonl', 'a') as dead_letter_file:
+                    for event in events:
+                        dead_letter_file.write(json.dumps(dict(zip(FIELDS, event)), default=str) + '\n')
+        except OSError:
+            logger.exception('Impossible de mettre de côté %d événement(s) analytics', len(events))
+
+    def metrics(self):
+        """Profondeur du tampon, volumes et latence des flush"""
+        return {
+            'depth': len(self._events),
+            'capacity': self.capacity,
+            'overflow': self.overflow,
+            **self._stats,
+        }
+
+
+analytics_buffer = AnalyticsBuffer()
+
+
+def track(website, event_type, request=None, metadata=None):
+    """
+    Enregistre un événement analytics sans requête SQL.
+    website peut être une instance Website, un WebsiteSnapshot ou un identifiant.
+    """
+    website_id = getattr(website, 'id', website)
+    ip_address = user_agent = referer = ''
+    if request is not None:
+        ip_address = client_ip(request)
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+        referer = request.META.get('HTTP_REFERER', '')[:REFERER_MAX_LENGTH]
+
+    return analytics_buffer.record((
+        website_id,
+        event_type,
+        metadata,
+        ip_address or None,
+        user_agent,
+        referer,
+        timezone.now(),
+    ))
+
+
+def metrics():
+    """Métriques du pipeline d'ingestion"""
+    return analytics_buffer.metrics()
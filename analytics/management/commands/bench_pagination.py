@@ -0,0 +1,104 @@
+"""
+Benchmark pagination par numéro de page vs pagination par curseur
+
+Usage: python manage.py bench_pagination --rows 1000000 --page 500
+
+Remplit analytics_events pour un compte de test (réutilisé d'une exécution à
+l'autre, --cleanup pour le supprimer), puis mesure la latence de
+AnalyticsEventViewSet en page 1 et en page N dans les deux modes.
+"""
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from analytics.models import AnalyticsEvent
+from analytics.views import AnalyticsEventViewSet
+from core.pagination import KeysetPagination
+from websites.models import Website
+
+BENCH_EMAIL = 'bench-pagination@example.com'
+INSERT_BATCH = 10000
+
+
+class Command(BaseCommand):
+    help = "Compare la latence des pages profondes entre pagination par page et par curseur"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help="Nombre d'événements")
+        parser.add_argument('--page', type=int, default=500, help='Page profonde à mesurer')
+        parser.add_argument('--repeat', type=int, default=5, help='Nombre de mesures par cas')
+        parser.add_argument('--cleanup', action='store_true', help='Supprimer les données de test')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['cleanup']:
+            User.objects.filter(email=BENCH_EMAIL).delete()
+            self.stdout.write('Données de test supprimées')
+            return
+
+        user, created = User.objects.get_or_create(email=BENCH_EMAIL)
+        if created:
+            user.set_unusable_password()
+            user.save()
+        subscription = user.subscription
+        subscription.analytics = True
+        subscription.save()
+        website = Website.objects.filter(user=user).first() or Website.objects.create(
+            user=user, name='Bench', domain='bench.example.com'
+        )
+        self.fill(website, options['rows'])
+
+        page_size = KeysetPagination.page_size
+        view = AnalyticsEventViewSet.as_view({'get': 'list'})
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*',) and not host.startswith('.')), 'localhost')
+        factory = APIRequestFactory(HTTP_HOST=host)
+
+        def measure(params):
+            timings = []
+            for _ in range(options['repeat']):
+                request = factory.get('/api/v1/analytics/events/', params)
+                force_authenticate(request, user=user)
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append((time.perf_counter() - started) * 1000)
+            return statistics.median(timings)
+
+        # Curseur positionné sur la dernière ligne de la page N-1 (hors mesure)
+        offset = (options['page'] - 1) * page_size
+        anchor = AnalyticsEvent.objects.filter(website=website).order_by('-created_at', '-id').values_list(
+            'created_at', 'id'
+        )[offset - 1]
+        cursor = KeysetPagination().encode_cursor((anchor[0], anchor[1], False))
+
+        results = [
+            ('page=1', measure({})),
+            (f'page={options["page"]}', measure({'page': options['page']})),
+            ('curseur, page 1', measure({'pagination': 'cursor'})),
+            (f'curseur, page {options["page"]}', measure({'cursor': cursor})),
+        ]
+        self.stdout.write(f'{options["rows"]} événements, {page_size} par page, médiane de {options["repeat"]} mesures')
+        for label, elapsed in results:
+            self.stdout.write(f'  {label:<22} {elapsed:>9.1f} ms')
+
+    def fill(self, website, rows):
+        existing = AnalyticsEvent.objects.filter(website=website).count()
+        if existing >= rows:
+            return
+
+        # Répartis sur les 25 derniers jours (dans la fenêtre par défaut de la vue)
+        now = timezone.now()
+        step = timedelta(days=25) / rows
+        for start in range(existing, rows, INSERT_BATCH):
+            AnalyticsEvent.objects.bulk_create([
+                AnalyticsEvent(website=website, event_type='api_call', created_at=now - step * index)
+                for index in range(start, min(start + INSERT_BATCH, rows))
+            ])
+            self.stdout.write(f'\r{min(start + INSERT_BATCH, rows)}/{rows} événements', ending='')
+        self.stdout.write('')
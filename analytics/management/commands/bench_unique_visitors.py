@@ -0,0 +1,84 @@
+"""
+Benchmark de précision des sketches HyperLogLog de visiteurs uniques
+
+Usage: python manage.py bench_unique_visitors --cardinalities 100,10000,1000000 --days 7
+
+Pour chaque cardinalité, compare au compte exact :
+- l'estimation de l'union des sketches journaliers (visiteurs revenant
+  plusieurs jours) ; l'union étant sans perte, c'est aussi l'erreur d'un
+  sketch unique contenant tous les visiteurs ;
+- la somme des estimations journalières, qui compte plusieurs fois les
+  visiteurs revenus.
+Aucune écriture en base.
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.hll import DEFAULT_PRECISION, HyperLogLog
+from analytics.visitors import visitor_hash
+
+USER_AGENTS = ['Mozilla/5.0 (Windows)', 'Mozilla/5.0 (Macintosh)', 'Mozilla/5.0 (iPhone)', 'curl/8.0']
+
+
+class Command(BaseCommand):
+    help = "Mesure l'erreur des sketches HyperLogLog par rapport aux comptes exacts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cardinalities', default='100,1000,10000,100000,1000000',
+                            help='Nombres de visiteurs distincts à tester (séparés par des virgules)')
+        parser.add_argument('--days', type=int, default=7,
+                            help='Nombre de jours fusionnés pour le test d\'union')
+        parser.add_argument('--return-rate', type=float, default=0.3,
+                            help='Probabilité qu\'un visiteur revienne un autre jour')
+        parser.add_argument('--trials', type=int, default=3,
+                            help='Nombre de tirages par cardinalité')
+        parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            cardinalities = [int(value) for value in options['cardinalities'].split(',')]
+        except ValueError:
+            raise CommandError('--cardinalities doit être une liste d\'entiers')
+
+        rng = random.Random(options['seed'])
+        precision = options['precision']
+        self.stdout.write(
+            f'Précision p={precision} ({1 << precision} registres, '
+            f'erreur type théorique {104 / (1 << precision) ** 0.5:.2f} %)'
+        )
+        self.stdout.write(f'{"visiteurs":>10} {"erreur union":>13} {"erreur somme":>13} {"taille":>8} {"ajouts/s":>10}')
+
+        for cardinality in cardinalities:
+            union_errors, sum_errors, sizes, rates = [], [], [], []
+            for _ in range(options['trials']):
+                visitors = [
+                    visitor_hash(f'{rng.getrandbits(32)}.{index}', rng.choice(USER_AGENTS))
+                    for index in range(cardinality)
+                ]
+
+                # Chaque visiteur a un premier jour, puis revient éventuellement un autre jour
+                days = [HyperLogLog(precision) for _ in range(options['days'])]
+                started = time.perf_counter()
+                adds = 0
+                for hashed in visitors:
+                    days[rng.randrange(options['days'])].add_hash(hashed)
+                    adds += 1
+                    if rng.random() < options['return_rate']:
+                        days[rng.randrange(options['days'])].add_hash(hashed)
+                        adds += 1
+                elapsed = time.perf_counter() - started
+
+                merged = HyperLogLog.union(days, precision)
+                union_errors.append(abs(merged.count() - cardinality) / cardinality)
+                sum_errors.append(abs(sum(day.count() for day in days) - cardinality) / cardinality)
+                sizes.append(max(len(day.to_bytes()) for day in days))
+                rates.append(adds / elapsed if elapsed else float('inf'))
+
+            self.stdout.write(
+                f'{cardinality:>10} {statistics.mean(union_errors) * 100:>12.2f}% '
+                f'{statistics.mean(sum_errors) * 100:>12.2f}% {max(sizes):>7}o {statistics.mean(rates):>10.0f}'
+            )
@@ -0,0 +1,37 @@
+"""
+Partitions mensuelles et rétention des événements analytics
+
+Usage: python manage.py maintain_analytics_partitions [--ahead 3] [--detach] [--chunk-size 5000]
+
+À planifier quotidiennement (cron). Voir analytics.partitions.
+"""
+from django.core.management.base import BaseCommand
+
+from analytics.partitions import maintain
+
+
+class Command(BaseCommand):
+    help = "Crée les partitions à venir et applique la rétention des événements analytics"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=None,
+                            help='Nombre de mois de partitions à créer à l\'avance')
+        parser.add_argument('--detach', action='store_true', default=None,
+                            help='Détacher les partitions expirées au lieu de les supprimer')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Nombre maximal d\'événements par requête DELETE')
+
+    def handle(self, *args, **options):
+        summary = maintain(
+            ahead=options['ahead'],
+            detach=options['detach'],
+            chunk_size=options['chunk_size'],
+        )
+
+        for name in summary['created']:
+            self.stdout.write(f'Partition créée : {name}')
+        for name in summary['expired']:
+            self.stdout.write(f'Partition expirée : {name}')
+        for plan, count in summary['deleted'].items():
+            self.stdout.write(f'Plan {plan} : {count} événement(s) supprimé(s)')
+        self.stdout.write(self.style.SUCCESS('Rétention analytics appliquée'))
@@ -0,0 +1,47 @@
+"""
+Agrégation des événements analytics dans DailyStats
+
+Usage:
+    python manage.py rollup_analytics                      # passage incrémental
+    python manage.py rollup_analytics --start 2025-01-01 --end 2025-01-31 [--website 12]
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.rollup import run_rollup, backfill
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Date invalide : {value} (format attendu AAAA-MM-JJ)')
+
+
+class Command(BaseCommand):
+    help = "Agrège les événements analytics dans les statistiques journalières"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Nombre d'identifiants d'événements par fenêtre")
+        parser.add_argument('--start', help='Début de la plage à recalculer (AAAA-MM-JJ)')
+        parser.add_argument('--end', help='Fin de la plage à recalculer (AAAA-MM-JJ, incluse)')
+        parser.add_argument('--website', type=int, action='append', dest='websites',
+                            help='Limiter le recalcul à ce site web (répétable)')
+
+    def handle(self, *args, **options):
+        # Rattraper les nouveaux événements avant un éventuel recalcul
+        batches = run_rollup(batch_size=options['batch_size'])
+        self.stdout.write(f'{batches} fenêtre(s) agrégée(s)')
+
+        if options['start'] or options['end']:
+            if not (options['start'] and options['end']):
+                raise CommandError('--start et --end doivent être fournis ensemble')
+            start, end = _parse_date(options['start']), _parse_date(options['end'])
+            if start > end:
+                raise CommandError('--start doit précéder --end')
+            rows = backfill(start, end, website_ids=options['websites'])
+            if rows is None:
+                raise CommandError('Agrégation en cours dans un autre processus, relancer le recalcul plus tard')
+            self.stdout.write(self.style.SUCCESS(f'{rows} ligne(s) recalculée(s) du {start} au {end}'))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_analyticsevent_created_at_default'),
+        ('websites', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.BigIntegerField(default=0, verbose_name='Dernier événement agrégé')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('website', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rollup_checkpoint', to='websites.website', verbose_name='Site web')),
+            ],
+            options={
+                'verbose_name': "Point de reprise d'agrégation",
+                'verbose_name_plural': "Points de reprise d'agrégation",
+                'db_table': 'analytics_rollup_checkpoints',
+                'indexes': [models.Index(fields=['last_event_id'], name='analytics_r_last_ev_13ec01_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_rollupcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailystats',
+            name='visitors_sketch',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Sketch des visiteurs'),
+        ),
+    ]
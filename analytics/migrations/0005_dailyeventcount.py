@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_dailystats_visitors_sketch'),
+        ('websites', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyEventCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('event_type', models.CharField(choices=[('contact_received', 'Contact reçu'), ('contact_read', 'Contact lu'), ('contact_replied', 'Contact répondu'), ('project_viewed', 'Projet consulté'), ('project_created', 'Projet créé'), ('project_updated', 'Projet mis à jour'), ('api_call', 'Appel API'), ('form_submission', 'Soumission de formulaire')], max_length=50, verbose_name="Type d'événement")),
+                ('count', models.IntegerField(default=0, verbose_name="Nombre d'événements")),
+                ('website', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_event_counts', to='websites.website', verbose_name='Site web')),
+            ],
+            options={
+                'verbose_name': "Compteur journalier d'événements",
+                'verbose_name_plural': "Compteurs journaliers d'événements",
+                'db_table': 'daily_event_counts',
+                'ordering': ['-date'],
+                'unique_together': {('website', 'date', 'event_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+"""
+Conversion d'analytics_events en table partitionnée par mois (PostgreSQL uniquement)
+
+La clé primaire devient (id, created_at), exigence des tables partitionnées ;
+id reste alimenté par une séquence et unique, le modèle Django est inchangé.
+Les partitions couvrent les données existantes et les mois à venir ;
+analytics.partitions.maintain() les crée ensuite au fil du temps.
+
+Sur les autres moteurs, la migration ne fait rien. Le retour arrière conserve
+la table partitionnée (compatible avec le modèle).
+"""
+from datetime import date, datetime, timezone
+
+from django.db import migrations
+
+TABLE = 'analytics_events'
+LEGACY = 'analytics_events_legacy'
+SEQUENCE = 'analytics_events_id_seq_partitioned'
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def partition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{LEGACY}"')
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{LEGACY}" INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'CREATE SEQUENCE "{SEQUENCE}" AS bigint OWNED BY "{TABLE}".id')
+        cursor.execute(f'ALTER TABLE "{TABLE}" ALTER COLUMN id SET DEFAULT nextval(\'"{SEQUENCE}"\')')
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY (id, created_at)')
+
+        # Une partition par mois, des données les plus anciennes aux mois à venir
+        cursor.execute(f'SELECT min(created_at), max(created_at), now() FROM "{LEGACY}"')
+        oldest, newest, now = cursor.fetchone()
+        first = (oldest or now).astimezone(timezone.utc).date().replace(day=1)
+        last = _add_months(max(newest or now, now).astimezone(timezone.utc).date().replace(day=1), MONTHS_AHEAD)
+        month = first
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE "{TABLE}_p{month:%Y%m}" PARTITION OF "{TABLE}" '
+                f"FOR VALUES FROM ('{_bound(month).isoformat()}') TO ('{_bound(_add_months(month, 1)).isoformat()}')"
+            )
+            month = _add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{LEGACY}"')
+        cursor.execute(f'SELECT setval(\'"{SEQUENCE}"\', COALESCE((SELECT max(id) FROM "{TABLE}"), 0) + 1, false)')
+        cursor.execute(f'DROP TABLE "{LEGACY}"')
+
+        # Index et contrainte recréés sous les noms attendus par Django
+        cursor.execute(
+            f'CREATE INDEX "analytics_e_website_2e91f1_idx" ON "{TABLE}" (website_id, event_type, created_at DESC)'
+        )
+        cursor.execute(f'CREATE INDEX "analytics_e_created_3bce1d_idx" ON "{TABLE}" (created_at)')
+        cursor.execute(f'CREATE INDEX "analytics_events_website_id_idx" ON "{TABLE}" (website_id)')
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "analytics_events_website_id_fk_websites_id" '
+            f'FOREIGN KEY (website_id) REFERENCES "websites" (id) DEFERRABLE INITIALLY DEFERRED'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0005_dailyeventcount"),
+        ("websites", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, migrations.RunPython.noop),
+    ]
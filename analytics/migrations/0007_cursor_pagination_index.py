@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_partition_analytics_events'),
+        ('websites', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='analyticsevent',
+            index=models.Index(fields=['website', '-created_at', '-id'], name='analytics_e_website_a563a5_idx'),
+        ),
+    ]
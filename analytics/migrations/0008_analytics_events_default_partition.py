@@ -0,0 +1,44 @@
+"""
+Partition par défaut d'analytics_events (PostgreSQL uniquement)
+
+Un événement hors des partitions mensuelles (partition du mois pas encore
+créée, événement tardif ou réinjecté) y est écrit au lieu de faire échouer
+l'insertion ; analytics.partitions.create_partitions() le déplace ensuite
+dans la partition de son mois.
+"""
+from django.db import migrations
+
+TABLE = 'analytics_events'
+DEFAULT_PARTITION = 'analytics_events_default'
+
+
+def is_partitioned(cursor):
+    cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABLE])
+    return cursor.fetchone() is not None
+
+
+def create_default_partition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+
+
+def drop_default_partition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            cursor.execute(f'DROP TABLE IF EXISTS "{DEFAULT_PARTITION}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0007_cursor_pagination_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_partition, drop_default_partition),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.functions import Now
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from websites.models import Website
 
@@ -64,7 +66,12 @@ class AnalyticsEvent(models.Model):
         verbose_name=_("Ville")
     )
 
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Horodatage de l'événement (fixé à l'ingestion, pas à l'écriture par lots)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Horodatage de l'écriture en base (fixé par la base) : sert au délai de
+    # sécurité de l'agrégation, un lot tamponné pouvant être écrit bien après
+    # created_at
+    inserted_at = models.DateTimeField(db_default=Now(), editable=False)
 
     class Meta:
         db_table = 'analytics_events'
@@ -74,6 +81,7 @@ class AnalyticsEvent(models.Model):
         indexes = [
             models.Index(fields=['website', 'event_type', '-created_at']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['website', '-created_at', '-id']),  # pagination par curseur
         ]
 
     def __str__(self):
@@ -110,6 +118,13 @@ class DailyStats(models.Model):
         default=0,
         verbose_name=_("Visiteurs uniques")
     )
+    # Sketch HyperLogLog des visiteurs (voir analytics.visitors)
+    visitors_sketch = models.BinaryField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("Sketch des visiteurs")
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -123,3 +138,64 @@ class DailyStats(models.Model):
 
     def __str__(self):
         return f"{self.website.name} - {self.date}"
+
+
+class DailyEventCount(models.Model):
+    """Compteur d'événements par site web, jour et type (alimenté par l'agrégation)"""
+
+    website = models.ForeignKey(
+        Website,
+        on_delete=models.CASCADE,
+        related_name='daily_event_counts',
+        verbose_name=_("Site web")
+    )
+    date = models.DateField(
+        verbose_name=_("Date")
+    )
+    event_type = models.CharField(
+        max_length=50,
+        choices=AnalyticsEvent.EVENT_TYPE_CHOICES,
+        verbose_name=_("Type d'événement")
+    )
+    count = models.IntegerField(
+        default=0,
+        verbose_name=_("Nombre d'événements")
+    )
+
+    class Meta:
+        db_table = 'daily_event_counts'
+        verbose_name = _("Compteur journalier d'événements")
+        verbose_name_plural = _("Compteurs journaliers d'événements")
+        ordering = ['-date']
+        unique_together = ['website', 'date', 'event_type']
+
+    def __str__(self):
+        return f"{self.website.name} - {self.date} - {self.event_type}: {self.count}"
+
+
+class RollupCheckpoint(models.Model):
+    """Point de reprise (high-water mark) de l'agrégation des événements par site web"""
+
+    website = models.OneToOneField(
+        Website,
+        on_delete=models.CASCADE,
+        related_name='rollup_checkpoint',
+        verbose_name=_("Site web")
+    )
+    last_event_id = models.BigIntegerField(
+        default=0,
+        verbose_name=_("Dernier événement agrégé")
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'analytics_rollup_checkpoints'
+        verbose_name = _("Point de reprise d'agrégation")
+        verbose_name_plural = _("Points de reprise d'agrégation")
+        indexes = [
+            models.Index(fields=['last_event_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.website.name} - {self.last_event_id}"
@@ -0,0 +1,199 @@
+"""
+Partitionnement mensuel et rétention de la table analytics_events
+
+Sur PostgreSQL, analytics_events est partitionnée par intervalle sur
+created_at (migration 0006), une partition par mois UTC :
+analytics_events_pAAAAMM, et une partition par défaut (migration 0008) qui
+reçoit les événements hors de ces mois au lieu de faire échouer l'insertion.
+maintain() :
+- crée les partitions du mois courant et des ANALYTICS_PARTITIONS_AHEAD mois
+  suivants, ainsi que celles des mois présents dans la partition par défaut,
+  dont les événements sont déplacés dans leur partition ;
+- supprime (ou détache, selon ANALYTICS_EXPIRED_PARTITIONS) les partitions
+  entièrement antérieures à la plus longue durée de rétention des plans ;
+- supprime par lots les événements expirés selon la rétention du plan de
+  chaque compte (HOSTMAIL_PLANS[plan]['analytics_retention_days']).
+
+Sur les autres moteurs (SQLite en tests), seule la suppression par lots
+s'applique : aucune requête DELETE ne porte sur plus de
+ANALYTICS_RETENTION_CHUNK_SIZE lignes.
+"""
+import logging
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from subscriptions.plans import get_catalog
+from .models import AnalyticsEvent
+
+logger = logging.getLogger(__name__)
+
+TABLE = AnalyticsEvent._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y%m}'
+
+
+def _bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """Partitions attachées : [(nom, mois)] triées par mois"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass", [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    prefix = f'{TABLE}_p'
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            partitions.append((name, date(int(suffix[:4]), int(suffix[4:]), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def default_partition_months():
+    """Mois (UTC) des événements présents dans la partition par défaut"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s)', [DEFAULT_PARTITION])
+        if cursor.fetchone()[0] is None:
+            return set()
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC')::date FROM \"{DEFAULT_PARTITION}\""
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def create_partitions(ahead=None, today=None):
+    """
+    Crée les partitions manquantes jusqu'à `ahead` mois après le mois courant,
+    et celles des mois présents dans la partition par défaut
+    """
+    ahead = getattr(settings, 'ANALYTICS_PARTITIONS_AHEAD', 3) if ahead is None else ahead
+    current = month_start(today or timezone.now().astimezone(dt_timezone.utc).date())
+    existing = {month for _, month in list_partitions()}
+    stray = default_partition_months()
+    months = sorted(({add_months(current, offset) for offset in range(ahead + 1)} | stray) - existing)
+
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Une partition ne peut pas être créée si la partition par défaut contient
+        # des lignes de son intervalle : détacher, créer, déplacer, rattacher
+        if stray:
+            cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{DEFAULT_PARTITION}"')
+        for month in months:
+            lower, upper = _bound(month).isoformat(), _bound(add_months(month, 1)).isoformat()
+            # Les bornes de partition ne peuvent pas être des paramètres de requête
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{partition_name(month)}" PARTITION OF "{TABLE}" '
+                f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            )
+            if month in stray:
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+                    f'WHERE created_at >= %s AND created_at < %s RETURNING *) '
+                    f'INSERT INTO "{TABLE}" SELECT * FROM moved', [lower, upper]
+                )
+                logger.warning('%d événement(s) déplacé(s) de la partition par défaut vers %s',
+                               cursor.rowcount, partition_name(month))
+            created.append(partition_name(month))
+        if stray:
+            cursor.execute(f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{DEFAULT_PARTITION}" DEFAULT')
+    return created
+
+
+def expire_partitions(cutoff, detach=None):
+    """
+    Supprime ou détache les partitions dont tous les événements sont antérieurs à cutoff.
+    Une partition détachée reste en base (archivage, export) hors de la table.
+    """
+    if detach is None:
+        detach = getattr(settings, 'ANALYTICS_EXPIRED_PARTITIONS', 'drop') == 'detach'
+
+    expired = [
+        name for name, month in list_partitions()
+        if _bound(add_months(month, 1)) <= cutoff
+    ]
+    with connection.cursor() as cursor:
+        for name in expired:
+            if detach:
+                cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+            else:
+                cursor.execute(f'DROP TABLE "{name}"')
+    return expired
+
+
+def retention_days():
+    """Durée de rétention des événements par plan : {plan: jours}"""
+    return {
+        code: plan.limits['analytics_retention_days']
+        for code, plan in get_catalog().plans.items()
+        if plan.limits.get('analytics_retention_days')
+    }
+
+
+def delete_expired(plan, cutoff, chunk_size=None):
+    """Supprime par lots les événements antérieurs à cutoff des comptes d'un plan"""
+    chunk_size = chunk_size or getattr(settings, 'ANALYTICS_RETENTION_CHUNK_SIZE', 5000)
+    expired = AnalyticsEvent.objects.filter(
+        website__user__subscription__plan=plan, created_at__lt=cutoff
+    ).order_by()
+
+    deleted = 0
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            # created_at reste dans le filtre pour limiter le DELETE aux partitions concernées
+            count, _ = AnalyticsEvent.objects.filter(id__in=ids, created_at__lt=cutoff).delete()
+        deleted += count
+
+
+def maintain(ahead=None, detach=None, chunk_size=None, now=None):
+    """Crée les partitions à venir et applique la rétention ; retourne un résumé"""
+    now = now or timezone.now()
+    retention = retention_days()
+    summary = {'created': [], 'expired': [], 'deleted': {}}
+
+    if is_partitioned():
+        summary['created'] = create_partitions(ahead, today=now.astimezone(dt_timezone.utc).date())
+        if retention:
+            summary['expired'] = expire_partitions(now - timedelta(days=max(retention.values())), detach)
+
+    for plan, days in retention.items():
+        summary['deleted'][plan] = delete_expired(plan, now - timedelta(days=days), chunk_size)
+
+    logger.info(
+        'Rétention analytics : %d partition(s) créée(s), %d expirée(s), %d événement(s) supprimé(s)',
+        len(summary['created']), len(summary['expired']), sum(summary['deleted'].values())
+    )
+    return summary
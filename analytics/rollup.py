@@ -0,0 +1,270 @@
+"""
+Agrégation incrémentale des événements analytics dans DailyStats
+
+Chaque site web possède un point de reprise (RollupCheckpoint.last_event_id) :
+seuls les événements d'identifiant supérieur sont agrégés. Les sites partageant
+le même point de reprise sont traités ensemble, par fenêtres de
+ANALYTICS_ROLLUP_BATCH_SIZE identifiants, avec une seule requête groupée
+(site, jour, type) par fenêtre. Les compteurs sont ensuite upsertés avec
+bulk_create(update_conflicts=True) dans DailyEventCount (tous les types) et
+DailyStats.
+
+Les événements écrits depuis moins de ANALYTICS_ROLLUP_LAG secondes sont
+ignorés jusqu'au passage suivant, le temps que les écritures par lots
+concurrentes soient validées. Le délai porte sur inserted_at (heure
+d'écriture, fixée par la base) et non sur created_at : un lot tamponné ou
+déversé sur disque peut être écrit bien après ses événements.
+
+Champs de DailyStats alimentés ici : contacts_count et api_calls.
+projects_views est alimenté en continu par projects.counters.
+
+event_counts() combine DailyEventCount et les seuls événements postérieurs
+aux points de reprise, ce qui évite de parcourir les événements bruts.
+"""
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.workers import PeriodicWorker
+from websites.models import Website
+from .models import AnalyticsEvent, DailyEventCount, DailyStats, RollupCheckpoint
+
+logger = logging.getLogger(__name__)
+
+# Type d'événement -> champ de DailyStats
+EVENT_FIELDS = {
+    'contact_received': 'contacts_count',
+    'api_call': 'api_calls',
+}
+ROLLUP_FIELDS = sorted(set(EVENT_FIELDS.values()))
+
+LOCK_KEY = 'hostmail:analytics-rollup:lock'
+
+
+def _ensure_checkpoints():
+    """Crée les points de reprise manquants (nouveaux sites web)"""
+    missing = Website.objects.filter(rollup_checkpoint__isnull=True).values_list('id', flat=True)
+    RollupCheckpoint.objects.bulk_create(
+        [RollupCheckpoint(website_id=website_id) for website_id in missing],
+        ignore_conflicts=True
+    )
+
+
+def _safe_high_water_mark():
+    """Identifiant maximal des événements écrits depuis assez longtemps pour être agrégés"""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'ANALYTICS_ROLLUP_LAG', 300))
+    return AnalyticsEvent.objects.filter(inserted_at__lte=cutoff).aggregate(high=Max('id'))['high'] or 0
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, dt_time.min), timezone.get_current_timezone())
+
+
+def _group_counts(events):
+    """Une requête groupée : {(website_id, date, event_type): total}"""
+    rows = events.annotate(
+        day=TruncDate('created_at')
+    ).values('website_id', 'day', 'event_type').annotate(total=Count('id'))
+    return {(row['website_id'], row['day'], row['event_type']): row['total'] for row in rows}
+
+
+def _stats_counts(event_counts):
+    """Compteurs de DailyStats : {(website_id, date): {champ: total}}"""
+    counts = defaultdict(lambda: dict.fromkeys(ROLLUP_FIELDS, 0))
+    for (website_id, date, event_type), total in event_counts.items():
+        if event_type in EVENT_FIELDS:
+            counts[(website_id, date)][EVENT_FIELDS[event_type]] += total
+    return counts
+
+
+def _upsert(event_counts, additive=True):
+    """Upsert des compteurs dans DailyEventCount et DailyStats (addition ou remplacement)"""
+    if not event_counts:
+        return
+
+    stats_counts = _stats_counts(event_counts)
+    if additive:
+        event_counts = dict(event_counts)
+        website_ids = {key[0] for key in event_counts}
+        dates = {key[1] for key in event_counts}
+
+        existing = DailyEventCount.objects.filter(
+            website_id__in=website_ids, date__in=dates
+        ).values_list('website_id', 'date', 'event_type', 'count')
+        for website_id, date, event_type, count in existing:
+            if (website_id, date, event_type) in event_counts:
+                event_counts[(website_id, date, event_type)] += count
+
+        existing = DailyStats.objects.filter(
+            website_id__in=website_ids, date__in=dates
+        ).values_list('website_id', 'date', *ROLLUP_FIELDS)
+        for website_id, date, *values in existing:
+            if (website_id, date) in stats_counts:
+                for field, value in zip(ROLLUP_FIELDS, values):
+                    stats_counts[(website_id, date)][field] += value
+
+    DailyEventCount.objects.bulk_create(
+        [
+            DailyEventCount(website_id=website_id, date=date, event_type=event_type, count=count)
+            for (website_id, date, event_type), count in event_counts.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['website', 'date', 'event_type'],
+        update_fields=['count'],
+    )
+    if stats_counts:
+        DailyStats.objects.bulk_create(
+            [
+                DailyStats(website_id=website_id, date=date, **values)
+                for (website_id, date), values in stats_counts.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['website', 'date'],
+            update_fields=ROLLUP_FIELDS + ['updated_at'],
+        )
+
+
+def run_rollup(batch_size=None, high=None):
+    """
+    Agrège les nouveaux événements de tous les sites web.
+    Retourne le nombre de fenêtres traitées.
+    """
+    batch_size = batch_size or getattr(settings, 'ANALYTICS_ROLLUP_BATCH_SIZE', 50000)
+    if not cache.add(LOCK_KEY, 1, getattr(settings, 'ANALYTICS_ROLLUP_LOCK_TIMEOUT', 600)):
+        logger.info('Agrégation analytics déjà en cours, passage ignoré')
+        return 0
+
+    try:
+        _ensure_checkpoints()
+        high = _safe_high_water_mark() if high is None else high
+        batches = 0
+
+        while True:
+            marks = list(
+                RollupCheckpoint.objects.filter(last_event_id__lt=high)
+                .values_list('last_event_id', flat=True).distinct().order_by('last_event_id')[:2]
+            )
+            if not marks:
+                break
+
+            low = marks[0]
+            upper = min(low + batch_size, high)
+            if len(marks) > 1:
+                upper = min(upper, marks[1])  # les groupes fusionnent au point de reprise suivant
+
+            group = RollupCheckpoint.objects.filter(last_event_id=low).values('website_id')
+            with transaction.atomic():
+                counts = _group_counts(AnalyticsEvent.objects.filter(
+                    website_id__in=group, id__gt=low, id__lte=upper
+                ))
+                _upsert(counts)
+                RollupCheckpoint.objects.filter(last_event_id=low).update(
+                    last_event_id=upper, updated_at=timezone.now()
+                )
+            batches += 1
+
+        return batches
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def backfill(start_date, end_date, website_ids=None):
+    """
+    Recalcule les compteurs de DailyStats sur une plage de dates à partir des
+    événements déjà couverts par le point de reprise de chaque site web.
+    Retourne le nombre de compteurs (site, jour, type) recalculés, ou None si
+    une agrégation est en cours : le recalcul prend le même verrou que
+    run_rollup(), dont l'upsert additif fausserait les compteurs remis à zéro.
+    """
+    if not cache.add(LOCK_KEY, 1, getattr(settings, 'ANALYTICS_ROLLUP_LOCK_TIMEOUT', 600)):
+        logger.info('Agrégation analytics en cours, recalcul refusé')
+        return None
+
+    try:
+        _ensure_checkpoints()
+        start = _day_start(start_date)
+        end = _day_start(end_date + timedelta(days=1))
+
+        checkpoints = RollupCheckpoint.objects.all()
+        if website_ids:
+            checkpoints = checkpoints.filter(website_id__in=website_ids)
+
+        with transaction.atomic():
+            stats = DailyStats.objects.filter(date__gte=start_date, date__lte=end_date)
+            if website_ids:
+                stats = stats.filter(website_id__in=website_ids)
+            stats.update(**dict.fromkeys(ROLLUP_FIELDS, 0))
+            event_counts = DailyEventCount.objects.filter(date__gte=start_date, date__lte=end_date)
+            if website_ids:
+                event_counts = event_counts.filter(website_id__in=website_ids)
+            event_counts.delete()
+
+            total = 0
+            for mark in checkpoints.values_list('last_event_id', flat=True).distinct():
+                group = checkpoints.filter(last_event_id=mark).values('website_id')
+                counts = _group_counts(AnalyticsEvent.objects.filter(
+                    website_id__in=group, id__lte=mark, created_at__gte=start, created_at__lt=end
+                ))
+                _upsert(counts, additive=False)
+                total += len(counts)
+        return total
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def event_counts(websites, start_date, end_date=None):
+    """
+    Nombre d'événements par type sur une plage de jours, pour un queryset de sites web.
+
+    Les jours agrégés sont lus dans DailyEventCount ; seuls les événements non
+    encore couverts par le point de reprise de leur site sont comptés en brut.
+    Retourne un Counter {event_type: total}.
+    """
+    totals = Counter()
+
+    rolled = DailyEventCount.objects.filter(website__in=websites, date__gte=start_date)
+    if end_date:
+        rolled = rolled.filter(date__lte=end_date)
+    for event_type, total in rolled.values('event_type').annotate(total=Sum('count')).values_list('event_type', 'total'):
+        totals[event_type] += total
+
+    # Les sites sans point de reprise n'ont encore rien d'agrégé
+    marks = [mark or 0 for mark in websites.values_list('rollup_checkpoint__last_event_id', flat=True)]
+    if not marks:
+        return totals
+
+    pending = AnalyticsEvent.objects.filter(
+        website__in=websites,
+        id__gt=min(marks),
+        created_at__gte=_day_start(start_date),
+    ).filter(
+        Q(website__rollup_checkpoint__isnull=True) | Q(id__gt=F('website__rollup_checkpoint__last_event_id'))
+    )
+    if end_date:
+        pending = pending.filter(created_at__lt=_day_start(end_date + timedelta(days=1)))
+    for event_type, total in pending.values('event_type').annotate(total=Count('id')).values_list('event_type', 'total'):
+        totals[event_type] += total
+
+    return totals
+
+
+class RollupScheduler(PeriodicWorker):
+    """Planificateur en processus : lance run_rollup() à intervalle régulier"""
+
+    interval_setting = 'ANALYTICS_ROLLUP_INTERVAL'
+    default_interval = 300
+    thread_name = 'analytics-rollup'
+    error_message = "Échec de l'agrégation analytics"
+
+    def run_once(self):
+        run_rollup()
+
+
+scheduler = RollupScheduler()
@@ -6,6 +6,7 @@ class AnalyticsEventSerializer(serializers.ModelSerializer):
     """Serializer pour les événements analytics"""
 
     event_type_display = serializers.CharField(source='get_event_type_display', read_only=True)
+    ip_address = serializers.CharField(read_only=True, allow_null=True)
 
     class Meta:
         model = AnalyticsEvent
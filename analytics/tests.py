@@ -1,3 +1,451 @@
-from django.test import TestCase
+import json
+import os
+from io import StringIO
+from unittest import mock
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from websites.models import Website
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .hll import HyperLogLog
+from .ingestion import analytics_buffer, track, metrics
+from .models import AnalyticsEvent, DailyEventCount, DailyStats, RollupCheckpoint
+from .partitions import maintain
+from .rollup import run_rollup, backfill, event_counts
+from .visitors import unique_visitors
+
+User = get_user_model()
+
+
+@override_settings(ANALYTICS_FLUSH_INTERVAL=0, ANALYTICS_FLUSH_BATCH_SIZE=1000, ANALYTICS_BUFFER_SIZE=1000)
+class AnalyticsIngestionTests(TestCase):
+    """Tests pour le pipeline d'ingestion des événements analytics"""
+
+    def setUp(self):
+        analytics_buffer.discard()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+        self.request = RequestFactory().get(
+            '/api/public/projects/',
+            HTTP_USER_AGENT='Mozilla/5.0',
+            HTTP_REFERER='https://example.com/portfolio',
+            HTTP_X_FORWARDED_FOR='198.51.100.9, 203.0.113.7',
+            REMOTE_ADDR='10.0.0.1'
+        )
+
+    def test_track_is_buffered(self):
+        """Test que track() n'exécute aucune requête SQL"""
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                track(self.website, 'api_call', self.request, {'path': '/'})
+        self.assertEqual(metrics()['depth'], 10)
+        self.assertFalse(AnalyticsEvent.objects.exists())
+
+    @override_settings(RATELIMIT_TRUSTED_PROXIES=1)
+    def test_flush_bulk_creates(self):
+        """Test que le flush écrit les événements en un bulk_create"""
+        # 50 événements : sous la limite de paramètres d'une requête SQLite (999)
+        created_before = track(self.website.id, 'project_viewed', self.request, {'slug': 'demo'})
+        for _ in range(49):
+            track(self.website.id, 'project_viewed', self.request)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(analytics_buffer.flush(), 50)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "analytics_events"')]
+        self.assertEqual(len(inserts), 1)
+
+        event = AnalyticsEvent.objects.order_by('id').first()
+        self.assertTrue(created_before)
+        self.assertEqual(event.ip_address, '203.0.113.7')
+        self.assertEqual(event.user_agent, 'Mozilla/5.0')
+        self.assertEqual(event.referer, 'https://example.com/portfolio')
+        self.assertEqual(event.metadata, {'slug': 'demo'})
+        self.assertEqual(metrics()['depth'], 0)
+        self.assertEqual(metrics()['last_flush_size'], 50)
+
+    def test_forwarded_for_not_trusted(self):
+        """Test qu'un X-Forwarded-For fourni par le client ne fabrique pas de visiteurs"""
+        track(self.website.id, 'project_viewed', self.request)
+        analytics_buffer.flush()
+        self.assertEqual(AnalyticsEvent.objects.get().ip_address, '10.0.0.1')
+
+    @override_settings(ANALYTICS_FLUSH_BATCH_SIZE=5)
+    def test_flush_on_batch_size(self):
+        """Test que le flush est déclenché lorsque le lot est plein"""
+        for _ in range(5):
+            track(self.website, 'api_call')
+        self.assertEqual(AnalyticsEvent.objects.count(), 5)
+
+    @override_settings(ANALYTICS_BUFFER_SIZE=3, ANALYTICS_OVERFLOW='drop')
+    def test_overflow_drop(self):
+        """Test de l'abandon des événements lorsque le tampon est plein"""
+        dropped = metrics()['dropped']
+        results = [track(self.website, 'api_call') for _ in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertEqual(metrics()['dropped'] - dropped, 2)
+
+    def test_overflow_spill(self):
+        """Test du déversement sur disque puis de la réinjection au flush"""
+        with tempfile.TemporaryDirectory() as spill_dir, \
+                self.settings(ANALYTICS_BUFFER_SIZE=2, ANALYTICS_OVERFLOW='spill', ANALYTICS_SPILL_DIR=spill_dir):
+            for _ in range(5):
+                track(self.website, 'api_call', self.request)
+            self.assertEqual(metrics()['depth'], 2)
+
+            self.assertEqual(analytics_buffer.flush(), 5)
+        self.assertEqual(AnalyticsEvent.objects.count(), 5)
+
+    def reject(self, error, predicate=lambda obj: True):
+        """bulk_create qui lève error si une ligne vérifie predicate"""
+        from unittest import mock
+        bulk_create = AnalyticsEvent.objects.bulk_create
+
+        def fake(objs, **kwargs):
+            if any(predicate(obj) for obj in objs):
+                raise error('refusé')
+            return bulk_create(objs, **kwargs)
+        return mock.patch.object(AnalyticsEvent.objects, 'bulk_create', side_effect=fake)
+
+    def test_rejected_rows_are_set_aside(self):
+        """Test qu'un lot refusé est scindé : lignes valides écrites, autres mises de côté"""
+        from django.db import DataError
+        with tempfile.TemporaryDirectory() as spill_dir, self.settings(ANALYTICS_SPILL_DIR=spill_dir):
+            for index in range(10):
+                track(self.website, 'bad' if index == 3 else 'api_call')
+            with self.reject(DataError, lambda obj: obj.event_type == 'bad'):
+                analytics_buffer.flush()
+            with open(f'{spill_dir}/dead-letter-{os.getpid()}.jsonl') as dead_letter_file:
+                self.assertEqual([json.loads(line)['event_type'] for line in dead_letter_file], ['bad'])
+        self.assertEqual(AnalyticsEvent.objects.count(), 9)
+        self.assertEqual(metrics()['depth'], 0)
+
+    @override_settings(ANALYTICS_MAX_WRITE_ATTEMPTS=3)
+    def test_unavailable_database_bounded_retries(self):
+        """Test qu'un lot est réessayé un nombre borné de fois si la base est indisponible"""
+        from django.db import OperationalError
+        with tempfile.TemporaryDirectory() as spill_dir, self.settings(ANALYTICS_SPILL_DIR=spill_dir):
+            track(self.website, 'api_call')
+            with self.reject(OperationalError):
+                self.assertEqual(analytics_buffer.flush(), 0)
+                self.assertEqual(analytics_buffer.flush(), 0)
+                self.assertEqual(metrics()['depth'], 1)
+                analytics_buffer.flush()
+            self.assertEqual(metrics()['depth'], 0)
+            self.assertFalse(AnalyticsEvent.objects.exists())
+            self.assertTrue(os.path.exists(f'{spill_dir}/dead-letter-{os.getpid()}.jsonl'))
+
+    def test_middleware_tracks_api_calls(self):
+        """Test que les appels à l'API publique sont enregistrés"""
+        self.client.get('/api/public/projects/', HTTP_X_API_KEY=self.website.api_key)
+        analytics_buffer.flush()
+        self.assertEqual(AnalyticsEvent.objects.get().event_type, 'api_call')
+
+
+@override_settings(ANALYTICS_ROLLUP_LAG=0, ANALYTICS_ROLLUP_BATCH_SIZE=1000)
+class AnalyticsRollupTests(TestCase):
+    """Tests pour l'agrégation incrémentale dans DailyStats"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+        self.other = Website.objects.create(user=self.user, name='Autre', domain='other.com')
+        self.today = timezone.localdate()
+        self.yesterday = timezone.now() - timedelta(days=1)
+
+    def events(self, website, event_type, count, created_at=None):
+        AnalyticsEvent.objects.bulk_create([
+            AnalyticsEvent(website=website, event_type=event_type, created_at=created_at or timezone.now())
+            for _ in range(count)
+        ])
+
+    def stats(self, website, date=None):
+        return DailyStats.objects.get(website=website, date=date or self.today)
+
+    def test_rollup_counts(self):
+        """Test que l'agrégation compte les événements par site et par jour"""
+        self.events(self.website, 'api_call', 3)
+        self.events(self.website, 'contact_received', 2)
+        self.events(self.website, 'api_call', 4, self.yesterday)
+        self.events(self.other, 'api_call', 1)
+        self.events(self.website, 'project_viewed', 5)
+
+        run_rollup()
+
+        stats = self.stats(self.website)
+        self.assertEqual((stats.api_calls, stats.contacts_count), (3, 2))
+        self.assertEqual(self.stats(self.website, timezone.localdate(self.yesterday)).api_calls, 4)
+        self.assertEqual(self.stats(self.other).api_calls, 1)
+        self.assertEqual(
+            RollupCheckpoint.objects.get(website=self.website).last_event_id,
+            AnalyticsEvent.objects.latest('id').id
+        )
+
+    def test_rollup_is_incremental(self):
+        """Test que seuls les nouveaux événements sont ajoutés"""
+        self.events(self.website, 'api_call', 3)
+        run_rollup()
+        self.events(self.website, 'api_call', 2)
+        run_rollup()
+        run_rollup()
+        self.assertEqual(self.stats(self.website).api_calls, 5)
+
+    def test_rollup_keeps_project_views(self):
+        """Test que l'upsert ne touche pas aux vues de projets"""
+        DailyStats.objects.create(website=self.website, date=self.today, projects_views=7, api_calls=1)
+        self.events(self.website, 'api_call', 2)
+        run_rollup()
+        stats = self.stats(self.website)
+        self.assertEqual((stats.projects_views, stats.api_calls), (7, 3))
+
+    def test_rollup_batches(self):
+        """Test du découpage en fenêtres et de la fusion des points de reprise"""
+        self.events(self.website, 'api_call', 5)
+        run_rollup()
+        Website.objects.create(user=self.user, name='Nouveau', domain='new.com')
+        self.events(self.website, 'api_call', 5)
+        self.events(self.other, 'api_call', 5)
+
+        run_rollup(batch_size=2)
+
+        self.assertEqual(self.stats(self.website).api_calls, 10)
+        self.assertEqual(self.stats(self.other).api_calls, 5)
+        self.assertEqual(RollupCheckpoint.objects.values('last_event_id').distinct().count(), 1)
+
+    def test_rollup_respects_lag(self):
+        """Test que les événements trop récents attendent le passage suivant"""
+        self.events(self.website, 'api_call', 2)
+        with self.settings(ANALYTICS_ROLLUP_LAG=3600):
+            run_rollup()
+        self.assertFalse(DailyStats.objects.exists())
+
+    def test_rollup_lag_uses_insert_time(self):
+        """Test qu'un lot ancien écrit tardivement attend le délai de sécurité (inserted_at)"""
+        self.events(self.website, 'api_call', 2, self.yesterday)
+        with self.settings(ANALYTICS_ROLLUP_LAG=3600):
+            run_rollup()
+            self.assertFalse(DailyStats.objects.exists())
+
+            AnalyticsEvent.objects.update(inserted_at=timezone.now() - timedelta(hours=2))
+            run_rollup()
+        self.assertEqual(self.stats(self.website, timezone.localdate(self.yesterday)).api_calls, 2)
+
+    def test_rollup_event_counts(self):
+        """Test que tous les types d'événements sont comptés par jour"""
+        self.events(self.website, 'project_viewed', 4)
+        self.events(self.website, 'project_viewed', 1, self.yesterday)
+        run_rollup()
+        self.events(self.website, 'project_viewed', 2)
+        run_rollup()
+        counts = DailyEventCount.objects.filter(website=self.website, event_type='project_viewed')
+        self.assertEqual(
+            dict(counts.values_list('date', 'count')),
+            {self.today: 6, timezone.localdate(self.yesterday): 1}
+        )
+
+    def test_event_counts_pending_fallback(self):
+        """Test que les événements non agrégés sont ajoutés aux compteurs"""
+        self.events(self.website, 'api_call', 3)
+        self.events(self.other, 'api_call', 10)
+        run_rollup()
+        self.events(self.website, 'api_call', 2)
+        self.events(self.website, 'contact_received', 1)
+
+        websites = Website.objects.filter(id=self.website.id)
+        start = self.today - timedelta(days=30)
+        self.assertEqual(event_counts(websites, start), {'api_call': 5, 'contact_received': 1})
+        self.assertEqual(event_counts(websites, start, self.today - timedelta(days=1)), {})
+
+    def test_event_counts_without_checkpoint(self):
+        """Test qu'un site jamais agrégé est compté en brut"""
+        self.events(self.website, 'api_call', 2)
+        self.assertEqual(
+            event_counts(Website.objects.filter(user=self.user), self.today),
+            {'api_call': 2}
+        )
+
+    def test_backfill(self):
+        """Test du recalcul d'une plage de dates"""
+        self.events(self.website, 'api_call', 3)
+        run_rollup()
+        DailyStats.objects.filter(website=self.website).update(api_calls=42)
+
+        self.assertEqual(backfill(self.today, self.today, website_ids=[self.website.id]), 1)
+        self.assertEqual(self.stats(self.website).api_calls, 3)
+
+    def test_backfill_refused_during_rollup(self):
+        """Test que le recalcul ne s'exécute pas pendant une agrégation (même verrou)"""
+        from django.core.cache import cache
+        from .rollup import LOCK_KEY
+        self.events(self.website, 'api_call', 3)
+        run_rollup()
+        DailyStats.objects.filter(website=self.website).update(api_calls=42)
+
+        cache.add(LOCK_KEY, 1)
+        try:
+            self.assertIsNone(backfill(self.today, self.today))
+        finally:
+            cache.delete(LOCK_KEY)
+        self.assertEqual(self.stats(self.website).api_calls, 42)
+
+    def test_scheduler_not_started_by_management_commands(self):
+        """Test que le planificateur ne démarre pas sous manage.py test"""
+        from .rollup import scheduler
+        with mock.patch('sys.argv', ['manage.py', 'test']):
+            self.assertFalse(scheduler.start())
+        self.assertIsNone(scheduler._thread)
+
+    def test_command(self):
+        """Test de la commande de gestion"""
+        self.events(self.website, 'contact_received', 2, self.yesterday)
+        day = timezone.localdate(self.yesterday).isoformat()
+        call_command('rollup_analytics', start=day, end=day, stdout=StringIO())
+        self.assertEqual(self.stats(self.website, timezone.localdate(self.yesterday)).contacts_count, 2)
+
+
+class HyperLogLogTests(TestCase):
+    """Tests pour le sketch HyperLogLog"""
+
+    def test_count_accuracy(self):
+        """Test que l'erreur reste dans les bornes attendues"""
+        for cardinality in (10, 1000, 20000):
+            sketch = HyperLogLog()
+            sketch.update(f'visitor-{i}' for i in range(cardinality))
+            sketch.update(f'visitor-{i}' for i in range(cardinality))  # doublons
+            self.assertLess(abs(sketch.count() - cardinality) / cardinality, 0.05)
+
+    def test_merge_is_union(self):
+        """Test que la fusion équivaut au sketch de l'union"""
+        monday, tuesday, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        monday.update(f'visitor-{i}' for i in range(0, 600))
+        tuesday.update(f'visitor-{i}' for i in range(400, 1000))
+        both.update(f'visitor-{i}' for i in range(1000))
+        self.assertEqual(HyperLogLog.union([monday, tuesday]).registers, both.registers)
+
+    def test_serialization(self):
+        """Test de la sérialisation compacte"""
+        sketch = HyperLogLog()
+        sketch.update(['a', 'b', 'c'])
+        data = sketch.to_bytes()
+        self.assertLess(len(data), 100)
+        self.assertEqual(HyperLogLog.from_bytes(data).registers, sketch.registers)
+        self.assertTrue(HyperLogLog().is_empty())
+
+
+@override_settings(ANALYTICS_FLUSH_INTERVAL=0, ANALYTICS_FLUSH_BATCH_SIZE=1000)
+class UniqueVisitorsTests(TestCase):
+    """Tests pour les visiteurs uniques par site et par jour"""
+
+    def setUp(self):
+        analytics_buffer.discard()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.user.subscription.analytics = True
+        self.user.subscription.save()
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+        self.factory = RequestFactory()
+
+    def visit(self, ip, user_agent='Mozilla/5.0', count=1):
+        request = self.factory.get('/', REMOTE_ADDR=ip, HTTP_USER_AGENT=user_agent)
+        for _ in range(count):
+            track(self.website, 'api_call', request)
+
+    def test_ingestion_updates_sketch(self):
+        """Test que le flush alimente le sketch et unique_visitors"""
+        self.visit('10.0.0.1', count=3)
+        self.visit('10.0.0.2')
+        self.visit('10.0.0.2', user_agent='curl/8.0')
+        analytics_buffer.flush()
+        self.visit('10.0.0.1')
+        self.visit('10.0.0.3')
+        analytics_buffer.flush()
+
+        stats = DailyStats.objects.get(website=self.website, date=timezone.localdate())
+        self.assertEqual(stats.unique_visitors, 4)
+        self.assertEqual(HyperLogLog.from_bytes(stats.visitors_sketch).count(), 4)
+
+    def test_range_merges_days(self):
+        """Test qu'un visiteur revenu plusieurs jours n'est compté qu'une fois"""
+        days = [timezone.localdate() - timedelta(days=offset) for offset in range(3)]
+        for day in days:
+            sketch = HyperLogLog()
+            sketch.update(f'visitor-{i}' for i in range(100))
+            DailyStats.objects.create(
+                website=self.website, date=day,
+                unique_visitors=sketch.count(), visitors_sketch=sketch.to_bytes()
+            )
+
+        # Union sans perte : même estimation qu'un jour seul, au lieu de 3 x 100
+        expected = sketch.count()
+        self.assertEqual(unique_visitors(DailyStats.objects.filter(website=self.website)), expected)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/analytics/stats/', {'website': self.website.id, 'days': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_unique_visitors'], expected)
+
+
+    def test_stats_top_events(self):
+        """Test que top_events est servi par les compteurs agrégés"""
+        for event_type, count in (('api_call', 5), ('project_viewed', 3), ('contact_received', 1)):
+            DailyEventCount.objects.create(
+                website=self.website, date=timezone.localdate(), event_type=event_type, count=count
+            )
+        RollupCheckpoint.objects.create(website=self.website, last_event_id=0)
+        self.visit('10.0.0.1', count=2)
+        analytics_buffer.flush()
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/analytics/stats/', {'days': 7})
+        self.assertEqual(response.data['top_events'], [
+            {'event_type': 'api_call', 'count': 7},
+            {'event_type': 'project_viewed', 'count': 3},
+            {'event_type': 'contact_received', 'count': 1},
+        ])
+
+
+class AnalyticsRetentionTests(TestCase):
+    """Tests pour la rétention des événements (suppression par lots hors PostgreSQL)"""
+
+    def setUp(self):
+        self.free_user = User.objects.create_user(email='free@example.com', password='password123')
+        self.pro_user = User.objects.create_user(email='pro@example.com', password='password123')
+        self.pro_user.subscription.plan = 'pro'
+        self.pro_user.subscription.save()
+        self.free_site = Website.objects.create(user=self.free_user, name='Free', domain='free.com')
+        self.pro_site = Website.objects.create(user=self.pro_user, name='Pro', domain='pro.com')
+
+    def events(self, website, count, age_days):
+        created_at = timezone.now() - timedelta(days=age_days)
+        AnalyticsEvent.objects.bulk_create([
+            AnalyticsEvent(website=website, event_type='api_call', created_at=created_at)
+            for _ in range(count)
+        ])
+
+    def test_retention_per_plan(self):
+        """Test que chaque plan applique sa propre durée de rétention"""
+        self.events(self.free_site, 5, age_days=60)
+        self.events(self.free_site, 2, age_days=1)
+        self.events(self.pro_site, 3, age_days=60)
+        self.events(self.pro_site, 1, age_days=400)
+
+        summary = maintain(chunk_size=2)
+
+        self.assertEqual(summary['deleted'], {'free': 5, 'pro': 1, 'agency': 0})
+        self.assertEqual(AnalyticsEvent.objects.filter(website=self.free_site).count(), 2)
+        self.assertEqual(AnalyticsEvent.objects.filter(website=self.pro_site).count(), 3)
+
+    def test_deletes_are_chunked(self):
+        """Test qu'aucun DELETE ne dépasse la taille de lot"""
+        self.events(self.free_site, 7, age_days=60)
+        with CaptureQueriesContext(connection) as queries:
+            call_command('maintain_analytics_partitions', chunk_size=3, stdout=StringIO())
+        deletes = [q for q in queries if q['sql'].startswith('DELETE FROM "analytics_events"')]
+        self.assertEqual(len(deletes), 3)
+        self.assertFalse(AnalyticsEvent.objects.exists())
@@ -1,12 +1,15 @@
-from rest_framework import viewsets, views, status
-from rest_framework.decorators import action
+from rest_framework import viewsets, views
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count, Sum
+from django.db.models import Sum
 from django.utils import timezone
 from datetime import timedelta
+from core.pagination import KeysetPagination
 from core.permissions import HasAnalyticsFeature
+from websites.models import Website
 from .models import AnalyticsEvent, DailyStats
+from .rollup import event_counts
+from .visitors import unique_visitors
 from .serializers import (
     AnalyticsEventSerializer,
     DailyStatsSerializer,
@@ -19,6 +22,7 @@ class AnalyticsEventViewSet(viewsets.ReadOnlyModelViewSet):
 
     serializer_class = AnalyticsEventSerializer
     permission_classes = [IsAuthenticated, HasAnalyticsFeature]
+    pagination_class = KeysetPagination  # ?pagination=cursor pour paginer par curseur
 
     def get_queryset(self):
         """Retourne les événements des sites web de l'utilisateur"""
@@ -37,11 +41,11 @@ class AnalyticsEventViewSet(viewsets.ReadOnlyModelViewSet):
         if event_type:
             queryset = queryset.filter(event_type=event_type)
 
-        # Filtrer par période
+        # Filtrer par période (bornes sur created_at : seules les partitions mensuelles utiles sont lues)
         if start_date_param and end_date_param:
-            start_date = datetime.strptime(start_date_param, '%Y-%m-%d')
-            end_date = datetime.strptime(end_date_param, '%Y-%m-%d')
-            queryset = queryset.filter(created_at__gte=start_date, created_at__lte=end_date)
+            start_date = timezone.make_aware(datetime.strptime(start_date_param, '%Y-%m-%d'))
+            end_date = timezone.make_aware(datetime.strptime(end_date_param, '%Y-%m-%d')) + timedelta(days=1)
+            queryset = queryset.filter(created_at__gte=start_date, created_at__lt=end_date)
         elif days:
             start_date = timezone.now() - timedelta(days=int(days))
             queryset = queryset.filter(created_at__gte=start_date)
@@ -109,6 +113,7 @@ class AnalyticsStatsView(views.APIView):
             queryset = queryset.filter(website_id=website_id)
 
         # Filtrer par période
+        end_date = None
         if start_date_param and end_date_param:
             start_date = datetime.strptime(start_date_param, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_param, '%Y-%m-%d').date()
@@ -124,43 +129,32 @@ class AnalyticsStatsView(views.APIView):
         aggregated = queryset.aggregate(
             total_contacts=Sum('contacts_count'),
             total_projects_views=Sum('projects_views'),
-            total_api_calls=Sum('api_calls'),
-            total_unique_visitors=Sum('unique_visitors')
+            total_api_calls=Sum('api_calls')
         )
 
         # Stats par période
         period_stats = list(queryset.values('date').annotate(
             contacts=Sum('contacts_count'),
             views=Sum('projects_views'),
-            calls=Sum('api_calls')
+            calls=Sum('api_calls'),
+            visitors=Sum('unique_visitors')
         ).order_by('date'))
 
-        # Top événements
-        if start_date_param and end_date_param:
-            events_start = datetime.strptime(start_date_param, '%Y-%m-%d')
-            events_end = datetime.strptime(end_date_param, '%Y-%m-%d')
-            events_queryset = AnalyticsEvent.objects.filter(
-                website__user=request.user,
-                created_at__gte=events_start,
-                created_at__lte=events_end
-            )
-        else:
-            events_queryset = AnalyticsEvent.objects.filter(
-                website__user=request.user,
-                created_at__gte=start_date
-            )
+        # Top événements : compteurs agrégés, événements bruts seulement au-delà des points de reprise
+        websites = Website.objects.filter(user=request.user)
         if website_id:
-            events_queryset = events_queryset.filter(website_id=website_id)
-
-        top_events = list(events_queryset.values('event_type').annotate(
-            count=Count('id')
-        ).order_by('-count')[:5])
+            websites = websites.filter(id=website_id)
+        top_events = [
+            {'event_type': event_type, 'count': count}
+            for event_type, count in event_counts(websites, start_date, end_date).most_common(5)
+        ]
 
         data = {
             'total_contacts': aggregated['total_contacts'] or 0,
             'total_projects_views': aggregated['total_projects_views'] or 0,
             'total_api_calls': aggregated['total_api_calls'] or 0,
-            'total_unique_visitors': aggregated['total_unique_visitors'] or 0,
+            # Union des sketches HyperLogLog : un visiteur revenu plusieurs jours compte une fois
+            'total_unique_visitors': unique_visitors(queryset),
             'period_stats': period_stats,
             'top_events': top_events
         }
@@ -0,0 +1,76 @@
+"""
+Visiteurs uniques approximatifs par site web et par jour
+
+Un visiteur est identifié par le couple (adresse IP, user agent). À chaque
+flush du tampon d'ingestion, les visiteurs du lot sont ajoutés à un sketch
+HyperLogLog par (site, jour), fusionné avec celui stocké dans
+DailyStats.visitors_sketch. unique_visitors reçoit l'estimation du jour.
+
+Le nombre de visiteurs uniques d'une période s'obtient en fusionnant les
+sketches journaliers, sans parcourir les événements.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .hll import HyperLogLog, hash64
+
+
+def visitor_hash(ip_address, user_agent):
+    return hash64(f'{ip_address}|{user_agent or ""}')
+
+
+def update_sketches(events):
+    """
+    Ajoute les visiteurs d'un lot d'AnalyticsEvent aux sketches journaliers.
+    Retourne le nombre de lignes DailyStats mises à jour.
+    """
+    from .models import DailyStats
+
+    sketches = defaultdict(HyperLogLog)
+    for event in events:
+        if event.ip_address:
+            key = (event.website_id, timezone.localdate(event.created_at))
+            sketches[key].add_hash(visitor_hash(event.ip_address, event.user_agent))
+    if not sketches:
+        return 0
+
+    website_ids = {website_id for website_id, _ in sketches}
+    dates = {date for _, date in sketches}
+
+    with transaction.atomic():
+        DailyStats.objects.bulk_create(
+            [DailyStats(website_id=website_id, date=date) for website_id, date in sketches],
+            ignore_conflicts=True
+        )
+        rows = DailyStats.objects.select_for_update().filter(
+            website_id__in=website_ids, date__in=dates
+        ).only('id', 'website_id', 'date', 'visitors_sketch')
+
+        updated = []
+        for row in rows:
+            sketch = sketches.get((row.website_id, row.date))
+            if sketch is None:
+                continue
+            if row.visitors_sketch:
+                sketch.merge(HyperLogLog.from_bytes(row.visitors_sketch))
+            row.visitors_sketch = sketch.to_bytes()
+            row.unique_visitors = sketch.count()
+            updated.append(row)
+
+        DailyStats.objects.bulk_update(updated, ['visitors_sketch', 'unique_visitors'])
+    return len(updated)
+
+
+def merged_sketch(stats_queryset):
+    """Union des sketches d'un ensemble de lignes DailyStats"""
+    return HyperLogLog.union(
+        HyperLogLog.from_bytes(data)
+        for data in stats_queryset.exclude(visitors_sketch=None).values_list('visitors_sketch', flat=True)
+    )
+
+
+def unique_visitors(stats_queryset):
+    """Visiteurs uniques estimés sur l'ensemble des lignes (jours, sites)"""
+    return merged_sketch(stats_queryset).count()
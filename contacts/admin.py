@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ContactFormField, ContactMessage
+from .models import ContactFormField, ContactMessage, ContactNotification, SpamModel
 
 
 @admin.register(ContactFormField)
@@ -15,3 +15,16 @@ class ContactMessageAdmin(admin.ModelAdmin):
     list_filter = ['status', 'website', 'created_at']
     search_fields = ['name', 'email', 'subject', 'message']
     readonly_fields = ['form_data', 'ip_address', 'user_agent', 'read_at', 'replied_at', 'created_at', 'updated_at']
+
+
+@admin.register(ContactNotification)
+class ContactNotificationAdmin(admin.ModelAdmin):
+    list_display = ['message', 'website', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status', 'website']
+    readonly_fields = ['message', 'website', 'attempts', 'claimed_at', 'last_error', 'sent_at', 'created_at']
+
+
+@admin.register(SpamModel)
+class SpamModelAdmin(admin.ModelAdmin):
+    list_display = ['id', 'spam_count', 'ham_count', 'created_at']
+    readonly_fields = ['spam_count', 'ham_count', 'tokens', 'created_at']
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ContactsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "contacts"
+
+    def ready(self):
+        import contacts.signals  # noqa
+
+        # Worker des notifications email en processus (serveurs uniquement, voir core.workers)
+        if getattr(settings, 'CONTACT_NOTIFICATION_WORKER', False):
+            from .notifications import worker
+            worker.start()
@@ -0,0 +1,68 @@
+"""
+Changements de statut groupés des messages de contact
+
+Le changement est appliqué par un seul UPDATE sur le queryset fourni, qui
+porte déjà le filtre de propriété (website__user) : un message d'un autre
+compte ne peut pas être modifié. Les messages déjà dans le statut cible
+sont ignorés ; le nombre retourné est celui des messages effectivement
+modifiés.
+
+Les webhooks contact.read / contact.replied ne passent pas par les signaux
+(un UPDATE n'en émet pas) : s'il existe des abonnés, les messages concernés
+sont verrouillés et lus avant la mise à jour, puis notifiés.
+"""
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+WEBHOOK_STATUSES = ('read', 'replied')
+
+
+def status_changes(new_status, now):
+    """Colonnes à mettre à jour pour un statut, comme les actions unitaires"""
+    changes = {'status': new_status, 'updated_at': now}
+    if new_status == 'read':
+        changes['read_at'] = Coalesce('read_at', now)
+    elif new_status == 'replied':
+        changes['replied_at'] = now
+    return changes
+
+
+def _webhook_subscribers(queryset, event_type):
+    from webhooks.models import Webhook
+
+    website_ids = queryset.order_by().values('website_id')
+    webhooks = Webhook.objects.filter(website_id__in=website_ids, is_active=True).values_list('website_id', 'events')
+    return {website_id for website_id, events in webhooks if event_type in (events or [])}
+
+
+def bulk_update_status(queryset, new_status):
+    """Applique new_status aux messages du queryset ; retourne le nombre de messages modifiés"""
+    now = timezone.now()
+    queryset = queryset.exclude(status=new_status).order_by()
+
+    if new_status not in WEBHOOK_STATUSES:
+        return queryset.update(**status_changes(new_status, now))
+
+    event_type = f'contact.{new_status}'
+    subscribed = _webhook_subscribers(queryset, event_type)
+    if not subscribed:
+        return queryset.update(**status_changes(new_status, now))
+
+    from webhooks.delivery import trigger_webhooks
+    from webhooks.signals import contact_data
+
+    with transaction.atomic():
+        notified = list(queryset.filter(website_id__in=subscribed).select_for_update(of=('self',)))
+        count = queryset.filter(pk__in=[message.pk for message in notified]).update(
+            **status_changes(new_status, now)
+        ) + queryset.exclude(website_id__in=subscribed).update(**status_changes(new_status, now))
+
+        for message in notified:
+            message.status = new_status
+            if new_status == 'read':
+                message.read_at = message.read_at or now
+            else:
+                message.replied_at = now
+            trigger_webhooks(message.website_id, event_type, contact_data(message))
+    return count
@@ -0,0 +1,110 @@
+"""
+Export en flux des messages de contact (CSV ou NDJSON)
+
+Les lignes sont lues par paquets de CONTACT_EXPORT_CHUNK_SIZE avec
+.iterator() et écrites au fil de l'eau dans une StreamingHttpResponse :
+la mémoire utilisée ne dépend pas du nombre de messages.
+
+Les clés de form_data sont aplaties en colonnes selon les ContactFormField
+des sites exportés ; les clés sans définition sont regroupées (JSON) dans la
+colonne other_fields.
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import ContactFormField
+
+BASE_COLUMNS = [
+    ('id', 'id'),
+    ('website', 'website__name'),
+    ('created_at', 'created_at'),
+    ('status', 'status'),
+    ('email', 'email'),
+    ('name', 'name'),
+    ('subject', 'subject'),
+    ('message', 'message'),
+    ('ip_address', 'ip_address'),
+]
+EXTRA_COLUMN = 'other_fields'
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _Echo:
+    """Pseudo-fichier : csv.writer retourne la ligne au lieu de l'écrire"""
+
+    def write(self, value):
+        return value
+
+
+def form_field_names(website_ids):
+    """Noms des champs de formulaire des sites, dans l'ordre d'affichage, sans doublon"""
+    names = ContactFormField.objects.filter(website_id__in=website_ids).order_by(
+        'order', 'created_at'
+    ).values_list('name', flat=True)
+    return list(dict.fromkeys(name for name in names if name not in dict(BASE_COLUMNS)))
+
+
+def _flat(value):
+    """Valeur de formulaire représentable dans une cellule CSV"""
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return value
+
+
+def export_rows(queryset, field_names):
+    """Génère des dictionnaires aplatis, un par message"""
+    chunk_size = getattr(settings, 'CONTACT_EXPORT_CHUNK_SIZE', 2000)
+    lookups = [lookup for _, lookup in BASE_COLUMNS] + ['form_data']
+    known = set(field_names)
+
+    for values in queryset.values_list(*lookups).iterator(chunk_size=chunk_size):
+        row = {column: value for (column, _), value in zip(BASE_COLUMNS, values)}
+        form_data = values[-1] if isinstance(values[-1], dict) else {}
+        for name in field_names:
+            row[name] = form_data.get(name)
+        row[EXTRA_COLUMN] = {
+            key: value for key, value in form_data.items()
+            if key not in known and key not in row
+        } or None
+        yield row
+
+
+def stream_csv(rows, columns):
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(columns)  # BOM : accents corrects à l'ouverture dans Excel
+    for row in rows:
+        yield writer.writerow([
+            row['created_at'].isoformat() if column == 'created_at' else _flat(row[column])
+            for column in columns
+        ])
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def export_response(queryset, website_ids, output='csv'):
+    """StreamingHttpResponse d'export des messages du queryset"""
+    field_names = form_field_names(website_ids)
+    columns = [column for column, _ in BASE_COLUMNS] + field_names + [EXTRA_COLUMN]
+    rows = export_rows(queryset, field_names)
+
+    content = stream_csv(rows, columns) if output == 'csv' else stream_ndjson(rows)
+    response = StreamingHttpResponse(content, content_type=FORMATS[output])
+    filename = f'contacts-{timezone.localdate():%Y%m%d}.{output}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,91 @@
+"""
+Benchmark du quota de contacts sous soumissions concurrentes
+
+Usage: python manage.py bench_contact_quota --submitters 200 --limit 150
+
+À lancer sur PostgreSQL : SQLite sérialise les écritures et ne reflète pas
+le comportement en production.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from subscriptions.models import Subscription
+from subscriptions.quota import reserve_contact, increment_website_contacts
+from websites.models import Website
+
+
+class Command(BaseCommand):
+    help = "Vérifie l'exactitude des compteurs de contacts sous concurrence"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submitters', type=int, default=200,
+                            help='Nombre de soumissions concurrentes')
+        parser.add_argument('--limit', type=int, default=150,
+                            help='Quota mensuel de contacts du compte de test')
+        parser.add_argument('--concurrency', type=int, default=200,
+                            help='Nombre de threads (à adapter à max_connections)')
+
+    def handle(self, *args, **options):
+        submitters = options['submitters']
+        limit = options['limit']
+
+        user = get_user_model().objects.create_user(
+            email=f'bench-{uuid.uuid4().hex[:12]}@example.com',
+            password=uuid.uuid4().hex
+        )
+        try:
+            Subscription.objects.filter(user=user).update(
+                limit_overrides={'contacts_per_month': limit}, current_month_contacts=0
+            )
+            website = Website.objects.create(user=user, name='Benchmark', domain='bench.example.com')
+
+            barrier = threading.Barrier(min(options['concurrency'], submitters))
+            latencies = []
+            latencies_lock = threading.Lock()
+
+            def submit(_):
+                try:
+                    try:
+                        barrier.wait(timeout=30)
+                    except threading.BrokenBarrierError:
+                        pass
+                    started = time.perf_counter()
+                    accepted = reserve_contact(user.id, limit)
+                    if accepted:
+                        increment_website_contacts(website.id)
+                    with latencies_lock:
+                        latencies.append(time.perf_counter() - started)
+                    return accepted
+                finally:
+                    connection.close()
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                results = list(executor.map(submit, range(submitters)))
+            elapsed = time.perf_counter() - started
+
+            accepted = sum(results)
+            subscription = Subscription.objects.get(user=user)
+            website.refresh_from_db(fields=['total_contacts'])
+            expected = min(submitters, limit)
+            latencies.sort()
+
+            self.stdout.write(f"Soumissions       : {submitters}")
+            self.stdout.write(f"Acceptées / 429   : {accepted} / {submitters - accepted}")
+            self.stdout.write(f"Compteur abonnement: {subscription.current_month_contacts} (attendu {expected})")
+            self.stdout.write(f"Total site web    : {website.total_contacts} (attendu {expected})")
+            self.stdout.write(f"Durée totale      : {elapsed * 1000:.1f} ms")
+            self.stdout.write(f"Latence p50 / p99 : {latencies[len(latencies) // 2] * 1000:.2f} ms / "
+                              f"{latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms")
+
+            if not (accepted == subscription.current_month_contacts == website.total_contacts == expected):
+                raise CommandError('Compteurs incohérents : des incréments ont été perdus ou le quota a été dépassé')
+            self.stdout.write(self.style.SUCCESS('Compteurs exacts, quota respecté'))
+        finally:
+            user.delete()
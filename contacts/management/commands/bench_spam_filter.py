@@ -0,0 +1,107 @@
+"""
+Benchmark de la latence du filtre anti-spam par soumission
+
+Usage: python manage.py bench_spam_filter --submissions 20000 --websites 50
+
+Mesure en mémoire (sans base) chaque vérification de contacts.spam puis la
+chaîne complète, sur un corpus synthétique et un modèle bayésien entraîné à
+la volée. L'historique des doublons est rempli avant les mesures.
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from contacts.spam import (
+    BayesCheck, BayesModel, DuplicateCheck, HoneypotCheck, TimingTokenCheck,
+    Submission, issue_timing_token, message_text, score_submission
+)
+
+HAM_WORDS = (
+    'bonjour je souhaite un devis pour la refonte de notre site vitrine avec une boutique '
+    'en ligne pouvez vous me rappeler demain matin merci cordialement projet rendez vous '
+    'délai budget maquette référencement hébergement maintenance équipe association'
+).split()
+SPAM_WORDS = (
+    'seo backlinks ranking guaranteed traffic casino crypto bitcoin viagra cheap offer '
+    'click here free money investment loan winner limited promotion https://promo.example'
+).split()
+
+
+def _text(rng, words, length):
+    return ' '.join(rng.choice(words) for _ in range(length))
+
+
+class Command(BaseCommand):
+    help = "Mesure la latence par soumission des vérifications anti-spam"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submissions', type=int, default=20000, help='Nombre de soumissions mesurées')
+        parser.add_argument('--websites', type=int, default=50, help='Nombre de sites web simulés')
+        parser.add_argument('--training', type=int, default=5000, help='Messages par classe pour le modèle')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Vocabulaire réaliste : mots du domaine + mots rares (noms, lieux, détails du projet)
+        rare = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 10))) for _ in range(3000)]
+        ham_words = HAM_WORDS * 20 + rare
+        training = options['training']
+        tokens, spam_count, ham_count = BayesModel.train(
+            (_text(rng, SPAM_WORDS + HAM_WORDS[:10], 40) for _ in range(training)),
+            (_text(rng, ham_words, 60) for _ in range(training)),
+        )
+        bayes = BayesCheck()
+        bayes.model = BayesModel(tokens, spam_count, ham_count)
+        bayes.checked_at = time.monotonic()  # jamais rechargé pendant la mesure
+        bayes.reload_interval = float('inf')
+
+        duplicate = DuplicateCheck()
+        checks = [HoneypotCheck(), TimingTokenCheck(), duplicate, bayes]
+
+        websites = range(1, options['websites'] + 1)
+        tokens_by_website = {website_id: issue_timing_token(website_id) for website_id in websites}
+        submissions = []
+        for index in range(options['submissions']):
+            website_id = rng.choice(websites)
+            words = SPAM_WORDS if index % 5 == 0 else ham_words
+            submissions.append((website_id, {
+                'name': 'Visiteur', 'email': f'visiteur{index}@example.com', 'subject': 'Contact',
+                'message': _text(rng, words, rng.randint(20, 120)),
+                '_hm_token': tokens_by_website[website_id],
+            }))
+
+        # Historique des doublons plein pour chaque site
+        for website_id in websites:
+            for _ in range(duplicate.history_size):
+                duplicate.check(Submission(website_id, {}, _text(rng, ham_words, 60)))
+
+        self.stdout.write(
+            f'{len(submissions)} soumissions, {len(websites)} sites, '
+            f'historique {duplicate.history_size} empreintes/site, {len(tokens)} tokens'
+        )
+        for check in checks:
+            prepared = [Submission(website_id, form_data, message_text(form_data)) for website_id, form_data in submissions]
+            self.report(type(check).__name__, [lambda s=s, c=check: c.check(s) for s in prepared])
+
+        spam = 0
+
+        def full(website_id, form_data):
+            nonlocal spam
+            spam += score_submission(website_id, form_data, checks)[1].is_spam
+
+        self.report('Total', [lambda w=w, f=f: full(w, f) for w, f in submissions])
+        self.stdout.write(f'{spam} soumissions classées spam')
+
+    def report(self, label, calls):
+        timings = []
+        for call in calls:
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1e6)
+        quantiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'  {label:<18} médiane {statistics.median(timings):>8.1f} µs'
+            f'   p95 {quantiles[94]:>8.1f} µs   p99 {quantiles[98]:>8.1f} µs'
+        )
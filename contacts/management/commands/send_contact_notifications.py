@@ -0,0 +1,43 @@
+"""
+Envoi des notifications email des nouveaux messages (vidage de l'outbox)
+
+Usage: python manage.py send_contact_notifications [--loop] [--batch-size 100]
+
+Sans --loop : traite les notifications dues puis s'arrête (cron).
+Avec --loop : worker dédié, un passage toutes les CONTACT_NOTIFICATION_INTERVAL
+secondes (à utiliser avec CONTACT_NOTIFICATION_WORKER=False sur les serveurs web).
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from contacts.notifications import drain
+
+
+class Command(BaseCommand):
+    help = "Envoie les notifications email en attente"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Notifications par lot')
+        parser.add_argument('--loop', action='store_true', help='Tourne en continu')
+
+    def handle(self, *args, **options):
+        while True:
+            totals = {'sent': 0, 'failed': 0, 'deferred': 0, 'skipped': 0}
+            while True:
+                result = drain(options['batch_size'])
+                for key, value in result.items():
+                    totals[key] += value
+                if not any(result.values()):
+                    break
+            if any(totals.values()):
+                self.stdout.write(
+                    f"{totals['sent']} email(s) envoyé(s), {totals['failed']} échec(s), "
+                    f"{totals['deferred']} en résumé, {totals['skipped']} ignorée(s)"
+                )
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(getattr(settings, 'CONTACT_NOTIFICATION_INTERVAL', 30))
@@ -0,0 +1,53 @@
+"""
+Entraînement du modèle bayésien anti-spam
+
+Usage: python manage.py train_spam_filter [--limit 50000] [--keep 3]
+
+Messages spam : statut spam, hors classements automatiques (contacts.spam).
+Messages légitimes : statuts lu et répondu. Les processus chargent le nouveau
+modèle au plus tard après CONTACT_SPAM_MODEL_RELOAD secondes.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from contacts.models import ContactMessage, SpamModel
+from contacts.spam import AUTO_NOTE, BayesModel, message_text
+
+
+class Command(BaseCommand):
+    help = "Entraîne le modèle anti-spam sur les messages classés"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int,
+                            default=getattr(settings, 'CONTACT_SPAM_TRAINING_LIMIT', 50000),
+                            help='Nombre maximal de messages par classe (les plus récents)')
+        parser.add_argument('--vocabulary', type=int, default=20000, help='Nombre maximal de tokens conservés')
+        parser.add_argument('--keep', type=int, default=3, help='Nombre de modèles conservés')
+
+    def texts(self, queryset, limit):
+        for form_data in queryset.order_by('-id').values_list('form_data', flat=True)[:limit].iterator(chunk_size=2000):
+            if isinstance(form_data, dict):
+                yield message_text(form_data)
+
+    def handle(self, *args, **options):
+        spam = ContactMessage.objects.filter(status='spam').exclude(notes__startswith=AUTO_NOTE)
+        ham = ContactMessage.objects.filter(status__in=['read', 'replied'])
+
+        tokens, spam_count, ham_count = BayesModel.train(
+            self.texts(spam, options['limit']),
+            self.texts(ham, options['limit']),
+            vocabulary=options['vocabulary']
+        )
+        model = SpamModel.objects.create(tokens=tokens, spam_count=spam_count, ham_count=ham_count)
+
+        obsolete = SpamModel.objects.order_by('-id').values_list('id', flat=True)[options['keep']:]
+        SpamModel.objects.filter(id__in=list(obsolete)).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Modèle {model.id} : {spam_count} spam, {ham_count} légitimes, {len(tokens)} tokens'
+        ))
+        minimum = getattr(settings, 'CONTACT_SPAM_MIN_TRAINING', 20)
+        if min(spam_count, ham_count) < minimum:
+            self.stdout.write(self.style.WARNING(
+                f'Moins de {minimum} messages dans une classe : le modèle ne sera pas utilisé'
+            ))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0001_initial'),
+        ('websites', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['website', '-created_at', '-id'], name='contact_mes_website_d0a8a0_idx'),
+        ),
+    ]
@@ -0,0 +1,113 @@
+"""
+Index de recherche plein texte des messages de contact
+
+PostgreSQL : trigger alimentant search_vector à l'insertion (et si les champs
+indexés changent), index GIN sur search_vector et index trigrammes (pg_trgm)
+pour la recherche approchée de secours.
+
+SQLite : table virtuelle FTS5 contact_messages_fts (rowid = id du message),
+tenue à jour par triggers.
+
+Les autres moteurs n'ont pas d'index : la recherche y reste un filtre icontains.
+"""
+from django.db import migrations
+
+# Doit correspondre à contacts.search.SEARCH_CONFIG
+SEARCH_CONFIG = 'french'
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f"""
+    CREATE OR REPLACE FUNCTION contact_messages_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.name, '') || ' ' || coalesce(NEW.email, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.subject, '')), 'B') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.message, '')), 'C') ||
+            setweight(jsonb_to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.form_data, '{{}}'::jsonb), '["string"]'), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER contact_messages_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, email, subject, message, form_data ON contact_messages
+    FOR EACH ROW EXECUTE FUNCTION contact_messages_search_vector_update()
+    """,
+    # Indexation des messages existants (le trigger recalcule search_vector)
+    'UPDATE contact_messages SET name = name',
+    'CREATE INDEX contact_messages_search_vector_idx ON contact_messages USING gin (search_vector)',
+    'CREATE INDEX contact_messages_name_trgm_idx ON contact_messages USING gin (UPPER(name) gin_trgm_ops)',
+    'CREATE INDEX contact_messages_email_trgm_idx ON contact_messages USING gin (UPPER(email) gin_trgm_ops)',
+    'CREATE INDEX contact_messages_subject_trgm_idx ON contact_messages USING gin (UPPER(subject) gin_trgm_ops)',
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS contact_messages_subject_trgm_idx',
+    'DROP INDEX IF EXISTS contact_messages_email_trgm_idx',
+    'DROP INDEX IF EXISTS contact_messages_name_trgm_idx',
+    'DROP INDEX IF EXISTS contact_messages_search_vector_idx',
+    'DROP TRIGGER IF EXISTS contact_messages_search_vector_trigger ON contact_messages',
+    'DROP FUNCTION IF EXISTS contact_messages_search_vector_update()',
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE contact_messages_fts USING fts5(
+        name, email, subject, message, form_data, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER contact_messages_fts_insert AFTER INSERT ON contact_messages BEGIN
+        INSERT INTO contact_messages_fts (rowid, name, email, subject, message, form_data)
+        VALUES (new.id, new.name, new.email, new.subject, new.message, new.form_data);
+    END
+    """,
+    """
+    CREATE TRIGGER contact_messages_fts_update
+    AFTER UPDATE OF name, email, subject, message, form_data ON contact_messages BEGIN
+        DELETE FROM contact_messages_fts WHERE rowid = old.id;
+        INSERT INTO contact_messages_fts (rowid, name, email, subject, message, form_data)
+        VALUES (new.id, new.name, new.email, new.subject, new.message, new.form_data);
+    END
+    """,
+    """
+    CREATE TRIGGER contact_messages_fts_delete AFTER DELETE ON contact_messages BEGIN
+        DELETE FROM contact_messages_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    INSERT INTO contact_messages_fts (rowid, name, email, subject, message, form_data)
+    SELECT id, name, email, subject, message, form_data FROM contact_messages
+    """,
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS contact_messages_fts_delete',
+    'DROP TRIGGER IF EXISTS contact_messages_fts_update',
+    'DROP TRIGGER IF EXISTS contact_messages_fts_insert',
+    'DROP TABLE IF EXISTS contact_messages_fts',
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        statements = statements_by_vendor.get(schema_editor.connection.vendor, [])
+        with schema_editor.connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0003_contactmessage_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0004_contact_message_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpamModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spam_count', models.PositiveIntegerField(verbose_name='Messages spam')),
+                ('ham_count', models.PositiveIntegerField(verbose_name='Messages légitimes')),
+                ('tokens', models.JSONField(verbose_name='Tokens')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Modèle anti-spam',
+                'verbose_name_plural': 'Modèles anti-spam',
+                'db_table': 'contact_spam_models',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0005_spammodel'),
+        ('websites', '0002_website_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('sending', "En cours d'envoi"), ('sent', 'Envoyée'), ('failed', 'Échec'), ('skipped', 'Ignorée')], default='pending', max_length=10, verbose_name='Statut')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')),
+                ('next_attempt_at', models.DateTimeField(verbose_name='Prochaine tentative')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True, verbose_name='Prise en charge le')),
+                ('last_error', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Envoyée le')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='contacts.contactmessage', verbose_name='Message')),
+                ('website', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contact_notifications', to='websites.website', verbose_name='Site web')),
+            ],
+            options={
+                'verbose_name': 'Notification de contact',
+                'verbose_name_plural': 'Notifications de contact',
+                'db_table': 'contact_notifications',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='contact_not_status_81fea3_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from websites.models import Website
@@ -153,6 +154,9 @@ class ContactMessage(models.Model):
         verbose_name=_("Répondu le")
     )
 
+    # Index de recherche plein texte (PostgreSQL, alimenté par trigger : voir contacts.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -164,6 +168,7 @@ class ContactMessage(models.Model):
         indexes = [
             models.Index(fields=['status', '-created_at']),
             models.Index(fields=['email']),
+            models.Index(fields=['website', '-created_at', '-id']),  # pagination par curseur
         ]
 
     def __str__(self):
@@ -188,3 +193,95 @@ class ContactMessage(models.Model):
         """Marque le message comme spam"""
         self.status = 'spam'
         self.save(update_fields=['status'])
+
+
+class ContactNotification(models.Model):
+    """File d'envoi (outbox) des notifications email des nouveaux messages"""
+
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('sending', 'En cours d\'envoi'),
+        ('sent', 'Envoyée'),
+        ('failed', 'Échec'),
+        ('skipped', 'Ignorée'),
+    ]
+
+    website = models.ForeignKey(
+        Website,
+        on_delete=models.CASCADE,
+        related_name='contact_notifications',
+        verbose_name=_("Site web")
+    )
+    message = models.ForeignKey(
+        ContactMessage,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name=_("Message")
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name=_("Statut")
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name=_("Tentatives")
+    )
+    next_attempt_at = models.DateTimeField(
+        verbose_name=_("Prochaine tentative")
+    )
+    claimed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Prise en charge le")
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name=_("Dernière erreur")
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Envoyée le")
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'contact_notifications'
+        verbose_name = _("Notification de contact")
+        verbose_name_plural = _("Notifications de contact")
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"Notification {self.message_id} ({self.status})"
+
+
+class SpamModel(models.Model):
+    """Modèle bayésien de détection du spam (entraîné par la commande train_spam_filter)"""
+
+    spam_count = models.PositiveIntegerField(
+        verbose_name=_("Messages spam")
+    )
+    ham_count = models.PositiveIntegerField(
+        verbose_name=_("Messages légitimes")
+    )
+    # {token: [occurrences spam, occurrences légitimes]}
+    tokens = models.JSONField(
+        verbose_name=_("Tokens")
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'contact_spam_models'
+        verbose_name = _("Modèle anti-spam")
+        verbose_name_plural = _("Modèles anti-spam")
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Modèle anti-spam {self.created_at.strftime('%Y-%m-%d %H:%M')} ({self.spam_count}/{self.ham_count})"
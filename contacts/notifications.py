@@ -0,0 +1,249 @@
+"""
+Notifications email des nouveaux messages de contact (outbox)
+
+La soumission publique n'envoie rien : elle insère une ligne dans
+contact_notifications (file persistée) et réveille le worker après le commit.
+Le worker (thread en processus, ou commande send_contact_notifications)
+vide la file par lots :
+- prise en charge des lignes dues, comme des lignes ajoutées à un résumé
+  (SELECT ... FOR UPDATE SKIP LOCKED sous PostgreSQL : plusieurs workers
+  peuvent tourner en parallèle) ;
+- une seule connexion SMTP (get_connection) ouverte pour tout le lot, les
+  emails passent par send_messages un par un pour attribuer chaque échec ;
+- mode du site : 'instant' (un email par message), 'digest' (un résumé au
+  plus toutes les notification_digest_minutes, la fenêtre s'ouvre au premier
+  message en attente) ou 'off' ;
+- échec : nouvelle tentative avec backoff exponentiel, puis statut failed
+  après CONTACT_NOTIFICATION_MAX_ATTEMPTS tentatives.
+
+Une ligne restée 'sending' (worker interrompu) est reprise après
+CONTACT_NOTIFICATION_CLAIM_TIMEOUT secondes.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.workers import PeriodicWorker
+from .models import ContactNotification
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(message):
+    """Met en file la notification d'un nouveau message (une insertion)"""
+    ContactNotification.objects.create(
+        website_id=message.website_id,
+        message=message,
+        next_attempt_at=timezone.now()
+    )
+    transaction.on_commit(worker.wake)
+
+
+def _claim_ids(queryset, now, limit=None):
+    """
+    Passe en 'sending' les lignes du queryset qu'aucun autre worker ne tient ;
+    retourne leurs identifiants
+    """
+    with transaction.atomic():
+        queryset = queryset.order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True, of=('self',))
+        ids = list(queryset.values_list('id', flat=True)[:limit])
+        ContactNotification.objects.filter(id__in=ids).update(status='sending', claimed_at=now)
+    return ids
+
+
+def _claim(now, batch_size):
+    """Passe en 'sending' les notifications dues ou abandonnées ; retourne les lignes prises"""
+    timeout = getattr(settings, 'CONTACT_NOTIFICATION_CLAIM_TIMEOUT', 600)
+    ids = _claim_ids(ContactNotification.objects.filter(
+        Q(status='pending', next_attempt_at__lte=now)
+        | Q(status='sending', claimed_at__lt=now - timedelta(seconds=timeout))
+    ), now, batch_size)
+
+    return list(
+        ContactNotification.objects.filter(id__in=ids).select_related(
+            'website', 'website__user', 'message'
+        ).order_by('id')
+    )
+
+
+def _recipient(website):
+    return website.notification_email or website.user.email
+
+
+def _sender(message):
+    return message.name or message.email or 'Visiteur'
+
+
+def _message_email(notification):
+    website = notification.website
+    message = notification.message
+    lines = [
+        f"Nouveau message reçu sur {website.name} ({website.domain}).",
+        '',
+        f"De : {_sender(message)}" + (f" <{message.email}>" if message.email and message.name else ''),
+    ]
+    if message.subject:
+        lines.append(f"Sujet : {message.subject}")
+    lines += ['', message.message or '']
+    extra = [
+        f"{key} : {value}" for key, value in (message.form_data or {}).items()
+        if key not in ('name', 'full_name', 'email', 'subject', 'message')
+    ]
+    if extra:
+        lines += [''] + extra
+    return EmailMessage(
+        subject=f"[{website.name}] Nouveau message de {_sender(message)}",
+        body='\n'.join(lines),
+        to=[_recipient(website)],
+        reply_to=[message.email] if message.email else None,
+    )
+
+
+def _digest_email(website, notifications):
+    lines = [f"{len(notifications)} nouveaux messages reçus sur {website.name} ({website.domain}) :", '']
+    for notification in notifications:
+        message = notification.message
+        summary = message.subject or (message.message or '')[:80]
+        lines.append(
+            f"- {timezone.localtime(message.created_at):%d/%m %H:%M}  {_sender(message)}"
+            + (f" : {summary}" if summary else '')
+        )
+    return EmailMessage(
+        subject=f"[{website.name}] {len(notifications)} nouveaux messages",
+        body='\n'.join(lines),
+        to=[_recipient(website)],
+    )
+
+
+def _retry(notifications, error, now):
+    """Replanifie (backoff exponentiel) ou abandonne après le nombre maximal de tentatives"""
+    max_attempts = getattr(settings, 'CONTACT_NOTIFICATION_MAX_ATTEMPTS', 5)
+    backoff = getattr(settings, 'CONTACT_NOTIFICATION_RETRY_BACKOFF', 60)
+    for notification in notifications:
+        attempts = notification.attempts + 1
+        delay = timedelta(seconds=backoff * (2 ** (attempts - 1)))
+        ContactNotification.objects.filter(pk=notification.pk).update(
+            status='failed' if attempts >= max_attempts else 'pending',
+            attempts=attempts,
+            next_attempt_at=now + delay,
+            claimed_at=None,
+            last_error=str(error)[:2000],
+        )
+
+
+def drain(batch_size=None):
+    """
+    Traite un lot de notifications dues
+    Retourne {'sent': emails envoyés, 'failed': échecs, 'deferred': ..., 'skipped': ...}
+    """
+    batch_size = batch_size or getattr(settings, 'CONTACT_NOTIFICATION_BATCH_SIZE', 100)
+    now = timezone.now()
+    result = {'sent': 0, 'failed': 0, 'deferred': 0, 'skipped': 0}
+    claimed = _claim(now, batch_size)
+    if not claimed:
+        return result
+
+    # Un email par message, ou un résumé par site en mode digest
+    jobs = []
+    skipped, deferred = [], {}
+    digests = defaultdict(list)
+    for notification in claimed:
+        mode = notification.website.notification_mode
+        if mode == 'off':
+            skipped.append(notification.pk)
+        elif mode == 'digest':
+            digests[notification.website_id].append(notification)
+        else:
+            jobs.append(([notification], _message_email(notification)))
+
+    for website_id, notifications in digests.items():
+        website = notifications[0].website
+        pending = ContactNotification.objects.filter(website_id=website_id, status='pending', attempts=0)
+        oldest = min(
+            [notification.created_at for notification in notifications]
+            + list(pending.order_by('created_at').values_list('created_at', flat=True)[:1])
+        )
+        window_end = oldest + timedelta(minutes=website.notification_digest_minutes)
+        if window_end > now and all(notification.attempts == 0 for notification in notifications):
+            deferred.setdefault(window_end, []).extend(notification.pk for notification in notifications)
+            continue
+        # Fenêtre écoulée : le résumé reprend aussi les messages arrivés depuis
+        ids = _claim_ids(pending.exclude(pk__in=[n.pk for n in notifications]), now)
+        others = list(ContactNotification.objects.filter(pk__in=ids).select_related('message'))
+        for notification in others:
+            notification.website = website
+        notifications = sorted(notifications + others, key=lambda notification: notification.pk)
+        jobs.append((notifications, _digest_email(website, notifications)))
+
+    if skipped:
+        ContactNotification.objects.filter(pk__in=skipped).update(status='skipped', claimed_at=None)
+        result['skipped'] = len(skipped)
+    for window_end, ids in deferred.items():
+        ContactNotification.objects.filter(pk__in=ids).update(
+            status='pending', next_attempt_at=window_end, claimed_at=None
+        )
+        result['deferred'] += len(ids)
+
+    if not jobs:
+        return result
+
+    sent_ids = []
+    try:
+        smtp = get_connection()
+        smtp.open()
+    except Exception as exc:
+        logger.warning('Connexion email impossible : %s', exc)
+        for notifications, _ in jobs:
+            _retry(notifications, exc, now)
+            result['failed'] += 1
+        return result
+
+    try:
+        for notifications, email in jobs:
+            try:
+                smtp.send_messages([email])
+            except Exception as exc:
+                logger.warning('Échec de la notification %s : %s', notifications[0].pk, exc)
+                _retry(notifications, exc, now)
+                result['failed'] += 1
+            else:
+                sent_ids += [notification.pk for notification in notifications]
+                result['sent'] += 1
+    finally:
+        try:
+            smtp.close()
+        except Exception:
+            logger.warning('Fermeture de la connexion email impossible', exc_info=True)
+
+    if sent_ids:
+        ContactNotification.objects.filter(pk__in=sent_ids).update(
+            status='sent', sent_at=timezone.now(), claimed_at=None, last_error=''
+        )
+    return result
+
+
+class NotificationWorker(PeriodicWorker):
+    """
+    Worker en processus : vide la file à intervalle régulier, ou dès qu'une
+    notification est mise en file (wake)
+    """
+
+    interval_setting = 'CONTACT_NOTIFICATION_INTERVAL'
+    default_interval = 30
+    thread_name = 'contact-notifications'
+    error_message = "Échec de l'envoi des notifications de contact"
+
+    def run_once(self):
+        while drain()['sent']:
+            pass
+
+
+worker = NotificationWorker()
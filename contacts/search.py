@@ -0,0 +1,91 @@
+"""
+Recherche plein texte dans les messages de contact
+
+L'index est maintenu par la base (triggers créés par la migration 0004),
+y compris pour les insertions par lots :
+- PostgreSQL : colonne search_vector (GIN), pondérée nom/email > sujet >
+  message > valeurs de form_data. Les résultats sont classés par SearchRank.
+  Sans résultat (faute de frappe, fragment d'adresse...), repli sur une
+  recherche par trigrammes (pg_trgm, opérateur %> indexé) sur le nom,
+  l'email et le sujet.
+- SQLite : table virtuelle FTS5 contact_messages_fts, classement bm25.
+- Autres moteurs : filtre icontains, du plus récent au plus ancien.
+
+Le queryset reçu porte déjà la restriction aux sites de l'utilisateur.
+"""
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Greatest, Upper
+
+# Doit correspondre à la configuration du trigger (migration 0004)
+SEARCH_CONFIG = 'french'
+TRIGRAM_THRESHOLD = 0.3
+SQLITE_MAX_RESULTS = 1000
+
+
+def search_messages(queryset, terms):
+    """Filtre et classe les messages correspondant à terms (pertinence décroissante)"""
+    terms = terms.strip()
+    if not terms:
+        return queryset
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(queryset, terms)
+    if connection.vendor == 'sqlite':
+        return _search_sqlite(queryset, terms)
+    return _contains(queryset, terms).order_by('-created_at')
+
+
+def _contains(queryset, terms):
+    return queryset.filter(
+        Q(name__icontains=terms) | Q(email__icontains=terms)
+        | Q(subject__icontains=terms) | Q(message__icontains=terms)
+    )
+
+
+def _search_postgresql(queryset, terms):
+    query = SearchQuery(terms, config=SEARCH_CONFIG, search_type='websearch')
+    ranked = queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', '-created_at')
+    if ranked.exists():
+        return ranked
+
+    # Repli par trigrammes : le filtre n'utilise que des opérateurs couverts par
+    # les index GIN gin_trgm_ops sur UPPER(...) (%> et LIKE) ; la similarité
+    # n'est calculée que pour le tri des lignes retenues
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)", [str(TRIGRAM_THRESHOLD)])
+    fields = ('name', 'email', 'subject')
+    matches = Q()
+    for field in fields:
+        matches |= Q(TrigramWordSimilar(Upper(field), terms.upper())) | Q(**{f'{field}__icontains': terms})
+    similarity = Greatest(*[TrigramWordSimilarity(terms, field) for field in fields])
+    return queryset.filter(matches).annotate(rank=similarity).order_by('-rank', '-created_at')
+
+
+def _fts5_query(terms):
+    """Requête FTS5 : chaque mot entre guillemets, recherche par préfixe, ET implicite"""
+    return ' '.join('"%s"*' % word.replace('"', '""') for word in terms.split())
+
+
+def _search_sqlite(queryset, terms):
+    scope_sql, scope_params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT rowid, bm25(contact_messages_fts) FROM contact_messages_fts '
+            f'WHERE contact_messages_fts MATCH %s AND rowid IN ({scope_sql}) '
+            'ORDER BY bm25(contact_messages_fts) LIMIT %s',
+            [_fts5_query(terms), *scope_params, SQLITE_MAX_RESULTS]
+        )
+        scores = cursor.fetchall()
+
+    if not scores:
+        return queryset.none()
+    # bm25 : plus petit = plus pertinent
+    rank = Case(
+        *[When(pk=pk, then=Value(-score)) for pk, score in scores],
+        output_field=FloatField()
+    )
+    return queryset.filter(pk__in=[pk for pk, _ in scores]).annotate(rank=rank).order_by('-rank', '-created_at')
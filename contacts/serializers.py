@@ -1,5 +1,8 @@
 from rest_framework import serializers
+from core.ratelimit import client_ip
 from .models import ContactFormField, ContactMessage
+from .spam import score_submission, spam_note
+from .validation import FormDataError, get_validator
 
 
 class ContactFormFieldSerializer(serializers.ModelSerializer):
@@ -59,10 +62,18 @@ class ContactMessageSubmitSerializer(serializers.Serializer):
     )
 
     def validate_form_data(self, value):
-        """Valide que form_data est un dictionnaire"""
+        """Valide form_data selon les champs de formulaire du site (validateur compilé en cache)"""
         if not isinstance(value, dict):
             raise serializers.ValidationError("form_data doit être un objet JSON.")
-        return value
+        try:
+            return get_validator(self.context['website'].id).validate(value)
+        except FormDataError as exc:
+            raise serializers.ValidationError(exc.errors)
+
+    def validate(self, attrs):
+        """Évalue la soumission (contacts.spam) et retire les clés réservées de form_data"""
+        attrs['form_data'], self.verdict = score_submission(self.context['website'].id, attrs['form_data'])
+        return attrs
 
     def create(self, validated_data):
         """Crée un message de contact avec extraction des champs standards"""
@@ -70,30 +81,25 @@ class ContactMessageSubmitSerializer(serializers.Serializer):
         request = self.context['request']
 
         form_data = validated_data['form_data']
+        spam = {}
+        if self.verdict.is_spam:
+            spam = {'status': 'spam', 'notes': spam_note(self.verdict)}
 
         # Extraire les champs standards pour faciliter les recherches
         message = ContactMessage.objects.create(
-            website=website,
+            website_id=website.id,
             form_data=form_data,
             email=form_data.get('email', ''),
             name=form_data.get('name', '') or form_data.get('full_name', ''),
             subject=form_data.get('subject', ''),
             message=form_data.get('message', ''),
-            ip_address=self.get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
+            ip_address=client_ip(request),
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            **spam
         )
 
         return message
 
-    def get_client_ip(self, request):
-        """Récupère l'adresse IP du client"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
-
 
 class ContactMessageUpdateStatusSerializer(serializers.Serializer):
     """Serializer pour mettre à jour le statut d'un message"""
@@ -102,3 +108,50 @@ class ContactMessageUpdateStatusSerializer(serializers.Serializer):
         choices=ContactMessage.STATUS_CHOICES
     )
     notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class ContactMessageBulkStatusSerializer(serializers.Serializer):
+    """Serializer pour changer le statut de plusieurs messages"""
+
+    FILTER_KEYS = {'website', 'status', 'start_date', 'end_date'}
+
+    status = serializers.ChoiceField(
+        choices=ContactMessage.STATUS_CHOICES
+    )
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        allow_empty=False,
+        max_length=1000,
+        help_text="Identifiants des messages"
+    )
+    filter = serializers.DictField(
+        child=serializers.CharField(),
+        required=False,
+        help_text="Filtre : website, status, start_date, end_date"
+    )
+
+    def validate_filter(self, value):
+        """
+        Seuls les filtres de la liste des messages sont acceptés, avec au moins
+        un critère : un filtre vide porterait sur tous les messages
+        """
+        unknown = set(value) - self.FILTER_KEYS
+        if unknown:
+            raise serializers.ValidationError(f"Filtres inconnus : {', '.join(sorted(unknown))}.")
+        value = {key: item for key, item in value.items() if item}
+        if not value:
+            raise serializers.ValidationError("Le filtre doit comporter au moins un critère.")
+        if 'website' in value:
+            try:
+                value['website'] = int(value['website'])
+            except ValueError:
+                raise serializers.ValidationError("website : identifiant de site web invalide.")
+        if 'status' in value and value['status'] not in dict(ContactMessage.STATUS_CHOICES):
+            raise serializers.ValidationError(f"status : statut inconnu ({value['status']}).")
+        return value
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError("Fournir soit ids, soit filter.")
+        return attrs
@@ -0,0 +1,16 @@
+"""
+Signals pour l'invalidation du validateur de formulaire en cache
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import ContactFormField
+from .validation import invalidate_validator
+
+
+@receiver(post_save, sender=ContactFormField)
+@receiver(post_delete, sender=ContactFormField)
+def invalidate_form_validator(sender, instance, **kwargs):
+    """
+    Invalide le validateur compilé du site web du champ modifié
+    """
+    invalidate_validator(instance.website_id)
@@ -0,0 +1,349 @@
+"""
+Détection du spam des soumissions de contact
+
+Les soumissions passent, avant la création du message, par les vérifications
+listées dans CONTACT_SPAM_CHECKS (chemins de classes, comme les middlewares).
+Chaque vérification retourne un score dans [0, 1] et un motif, ou None ;
+les scores sont combinés en « ou bruité » : 1 - Π(1 - score). Au-delà de
+CONTACT_SPAM_THRESHOLD, le message est classé en spam dès sa création.
+
+Vérifications fournies (aucune requête en base par soumission) :
+- HoneypotCheck : champ caché rempli par les robots ;
+- TimingTokenCheck : jeton signé obtenu à l'affichage du formulaire
+  (GET /api/public/contact/token/), rejeté s'il est soumis trop vite,
+  périmé, invalide ou destiné à un autre site ;
+- DuplicateCheck : empreintes de contenu (shingles de mots hachés) des
+  derniers messages de chaque site, dans un cache local borné ;
+- BayesCheck : modèle bayésien naïf entraîné sur les messages marqués spam
+  (commande train_spam_filter), rechargé au plus toutes les
+  CONTACT_SPAM_MODEL_RELOAD secondes.
+
+Les clés réservées (jeton, honeypot) sont retirées de form_data.
+"""
+import math
+import re
+import threading
+import time
+from collections import Counter, deque, namedtuple
+
+from django.conf import settings
+from django.core import signing
+from django.utils.module_loading import import_string
+
+from core.cache import LocalLRUCache
+
+Submission = namedtuple('Submission', ['website_id', 'form_data', 'text'])
+Verdict = namedtuple('Verdict', ['is_spam', 'score', 'reasons'])
+
+AUTO_NOTE = 'Spam détecté automatiquement'
+TOKEN_FIELD = '_hm_token'
+TOKEN_SALT = 'contacts.spam.timing'
+
+DEFAULT_CHECKS = [
+    'contacts.spam.HoneypotCheck',
+    'contacts.spam.TimingTokenCheck',
+    'contacts.spam.DuplicateCheck',
+    'contacts.spam.BayesCheck',
+]
+
+TEXT_FIELDS = ('name', 'full_name', 'email', 'subject', 'message')
+WORD_RE = re.compile(r'https?://[^\s/?#]+|[^\W\d_]{2,24}')
+SHINGLE_WORD_RE = re.compile(r'\w+')
+
+
+def message_text(form_data):
+    """Texte analysé : champs standards puis valeurs texte des autres champs"""
+    parts = [form_data.get(name) for name in TEXT_FIELDS]
+    parts += [value for key, value in form_data.items() if key not in TEXT_FIELDS]
+    return ' '.join(part for part in parts if isinstance(part, str))
+
+
+def spam_note(verdict):
+    """Note interne du message classé automatiquement (exclu de l'entraînement)"""
+    return f"{AUTO_NOTE} (score {verdict.score} : {', '.join(verdict.reasons)})"
+
+
+def tokenize(text):
+    """Tokens distincts d'un texte (mots en minuscules, domaines des liens)"""
+    return set(WORD_RE.findall(text.lower()))
+
+
+class SpamCheck:
+    """Vérification de base : check() retourne (score, motif) ou None"""
+
+    reserved_fields = ()
+
+    def check(self, submission):
+        raise NotImplementedError
+
+
+class HoneypotCheck(SpamCheck):
+    """Champs invisibles pour un humain : toute valeur signe un robot"""
+
+    def __init__(self):
+        self.reserved_fields = tuple(getattr(settings, 'CONTACT_SPAM_HONEYPOT_FIELDS', ['_hm_website']))
+
+    def check(self, submission):
+        for name in self.reserved_fields:
+            if submission.form_data.get(name) not in (None, ''):
+                return 1.0, 'honeypot'
+        return None
+
+
+def issue_timing_token(website_id):
+    """Jeton signé (site web, horodatage) à inclure dans form_data[TOKEN_FIELD]"""
+    return signing.Signer(salt=TOKEN_SALT).sign(f'{website_id}:{int(time.time())}')
+
+
+class TimingTokenCheck(SpamCheck):
+    """Délai entre l'affichage du formulaire et la soumission"""
+
+    reserved_fields = (TOKEN_FIELD,)
+
+    def __init__(self):
+        self.signer = signing.Signer(salt=TOKEN_SALT)
+        self.min_seconds = getattr(settings, 'CONTACT_SPAM_MIN_SECONDS', 3)
+        self.max_age = getattr(settings, 'CONTACT_SPAM_TOKEN_MAX_AGE', 86400)
+        self.missing_score = getattr(settings, 'CONTACT_SPAM_MISSING_TOKEN_SCORE', 0.1)
+
+    def check(self, submission):
+        token = submission.form_data.get(TOKEN_FIELD)
+        if not token:
+            # Intégrations existantes sans jeton : indice faible
+            return (self.missing_score, 'token_missing') if self.missing_score else None
+        try:
+            website_id, issued_at = self.signer.unsign(str(token)).split(':')
+            age = time.time() - int(issued_at)
+        except (signing.BadSignature, ValueError):
+            return 0.8, 'token_invalid'
+        if website_id != str(submission.website_id):
+            return 0.8, 'token_invalid'
+        if age < self.min_seconds:
+            return 0.8, 'too_fast'
+        if age > self.max_age:
+            return 0.3, 'token_expired'
+        return None
+
+
+class _FingerprintHistory:
+    """Dernières empreintes d'un site, indexées par hachage (recherche en O(k))"""
+
+    __slots__ = ('entries', 'index', 'lengths', 'next_id', 'size')
+
+    def __init__(self, size):
+        self.entries = deque()
+        self.index = {}
+        self.lengths = {}
+        self.next_id = 0
+        self.size = size
+
+    def best_similarity(self, fingerprint):
+        overlaps = Counter()
+        for value in fingerprint:
+            overlaps.update(self.index.get(value, ()))
+        if not overlaps:
+            return 0.0
+        length = len(fingerprint)
+        return max(
+            common / (length + self.lengths[entry_id] - common)
+            for entry_id, common in overlaps.items()
+        )
+
+    def add(self, fingerprint):
+        entry_id = self.next_id
+        self.next_id += 1
+        self.entries.append((entry_id, fingerprint))
+        self.lengths[entry_id] = len(fingerprint)
+        for value in fingerprint:
+            self.index.setdefault(value, set()).add(entry_id)
+        if len(self.entries) > self.size:
+            old_id, old = self.entries.popleft()
+            del self.lengths[old_id]
+            for value in old:
+                ids = self.index[value]
+                ids.discard(old_id)
+                if not ids:
+                    del self.index[value]
+
+
+class DuplicateCheck(SpamCheck):
+    """
+    Contenu quasi identique aux derniers messages du site : empreinte
+    bottom-k des shingles de mots, similarité de Jaccard estimée.
+    Les hachages (hash() du processus) ne quittent pas la mémoire locale.
+    """
+
+    shingle_size = 3
+    sketch_size = 32
+    min_words = 8
+
+    def __init__(self):
+        self.history_size = getattr(settings, 'CONTACT_SPAM_DUPLICATE_HISTORY', 200)
+        self.similarity = getattr(settings, 'CONTACT_SPAM_DUPLICATE_SIMILARITY', 0.8)
+        self.recent = LocalLRUCache(
+            maxsize=getattr(settings, 'CONTACT_SPAM_DUPLICATE_WEBSITES', 1024),
+            ttl=getattr(settings, 'CONTACT_SPAM_DUPLICATE_TTL', 3600),
+        )
+        self.lock = threading.Lock()
+
+    def fingerprint(self, text):
+        words = SHINGLE_WORD_RE.findall(text.lower())
+        if len(words) < self.min_words:
+            return None
+        shingles = set(map(hash, zip(*(words[offset:] for offset in range(self.shingle_size)))))
+        return frozenset(sorted(shingles)[:self.sketch_size])
+
+    def check(self, submission):
+        fingerprint = self.fingerprint(submission.text)
+        if fingerprint is None:
+            return None
+
+        with self.lock:
+            history = self.recent.get(submission.website_id)
+            if history is None:
+                history = _FingerprintHistory(self.history_size)
+            best = history.best_similarity(fingerprint)
+            history.add(fingerprint)
+            self.recent.set(submission.website_id, history)
+
+        if best >= self.similarity:
+            return 0.6, 'duplicate'
+        return None
+
+
+class BayesModel:
+    """Modèle bayésien naïf : log-rapport de vraisemblance par token"""
+
+    interesting = 15
+
+    def __init__(self, tokens, spam_count, ham_count):
+        self.spam_count = spam_count
+        self.ham_count = ham_count
+        self.weights = {}
+        for token, (spam, ham) in tokens.items():
+            spam_ratio = (spam + 1) / (spam_count + 2)
+            ham_ratio = (ham + 1) / (ham_count + 2)
+            self.weights[token] = math.log(spam_ratio / ham_ratio)
+
+    @classmethod
+    def train(cls, spam_texts, ham_texts, vocabulary=20000):
+        """Compte les messages contenant chaque token ; retourne (tokens, spam_count, ham_count)"""
+        counts = {}
+        spam_count = ham_count = 0
+        for texts, column in ((spam_texts, 0), (ham_texts, 1)):
+            for text in texts:
+                for token in tokenize(text):
+                    counts.setdefault(token, [0, 0])[column] += 1
+                if column:
+                    ham_count += 1
+                else:
+                    spam_count += 1
+        # Tokens observés au moins deux fois, les plus fréquents d'abord
+        kept = sorted(
+            (item for item in counts.items() if sum(item[1]) > 1),
+            key=lambda item: sum(item[1]), reverse=True
+        )[:vocabulary]
+        return dict(kept), spam_count, ham_count
+
+    def probability(self, text):
+        """Probabilité de spam, d'après les tokens les plus discriminants"""
+        weights = sorted(
+            (self.weights[token] for token in tokenize(text) if token in self.weights),
+            key=abs, reverse=True
+        )[:self.interesting]
+        log_odds = sum(weights)
+        return 1 / (1 + math.exp(-max(min(log_odds, 50), -50)))
+
+
+class BayesCheck(SpamCheck):
+    """Probabilité de spam selon le dernier modèle entraîné"""
+
+    def __init__(self):
+        self.reload_interval = getattr(settings, 'CONTACT_SPAM_MODEL_RELOAD', 300)
+        self.min_training = getattr(settings, 'CONTACT_SPAM_MIN_TRAINING', 20)
+        self.model = None
+        self.model_id = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def get_model(self):
+        """Modèle en mémoire ; la base n'est consultée qu'une fois par intervalle"""
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.reload_interval:
+            return self.model
+        with self.lock:
+            if self.checked_at is None or now - self.checked_at >= self.reload_interval:
+                self.checked_at = now
+                self._reload()
+        return self.model
+
+    def _reload(self):
+        from .models import SpamModel
+
+        latest_id = SpamModel.objects.values_list('id', flat=True).order_by('-id').first()
+        if latest_id == self.model_id:
+            return
+        row = SpamModel.objects.filter(id=latest_id).values('tokens', 'spam_count', 'ham_count').first()
+        self.model_id = latest_id
+        if row is None or min(row['spam_count'], row['ham_count']) < self.min_training:
+            self.model = None
+        else:
+            self.model = BayesModel(row['tokens'], row['spam_count'], row['ham_count'])
+
+    def check(self, submission):
+        model = self.get_model()
+        if model is None:
+            return None
+        probability = model.probability(submission.text)
+        if probability > 0.5:
+            return probability, 'bayes'
+        return None
+
+
+_checks = None
+_checks_lock = threading.Lock()
+
+
+def get_checks():
+    """Instances des vérifications configurées (créées une fois par processus)"""
+    global _checks
+    if _checks is None:
+        with _checks_lock:
+            if _checks is None:
+                _checks = [
+                    import_string(path)()
+                    for path in getattr(settings, 'CONTACT_SPAM_CHECKS', DEFAULT_CHECKS)
+                ]
+    return _checks
+
+
+def reset_checks():
+    """Recrée les vérifications au prochain appel (changement de réglages, tests)"""
+    global _checks
+    _checks = None
+
+
+def score_submission(website_id, form_data, checks=None):
+    """
+    Évalue une soumission ; retourne (form_data sans les clés réservées, Verdict)
+    """
+    checks = get_checks() if checks is None else checks
+    reserved = {name for check in checks for name in check.reserved_fields}
+    cleaned = {key: value for key, value in form_data.items() if key not in reserved}
+    submission = Submission(website_id, form_data, message_text(cleaned))
+
+    keep = 1.0
+    reasons = []
+    for check in checks:
+        result = check.check(submission)
+        if result is None:
+            continue
+        score, reason = result
+        keep *= 1 - min(max(score, 0.0), 1.0)
+        reasons.append(reason)
+        if keep == 0:
+            break
+
+    score = 1 - keep
+    threshold = getattr(settings, 'CONTACT_SPAM_THRESHOLD', 0.9)
+    return cleaned, Verdict(score >= threshold, round(score, 3), reasons)
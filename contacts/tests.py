@@ -1,3 +1,579 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends import locmem
+from django.core.mail.backends.base import BaseEmailBackend
+from rest_framework.test import APIClient
+from rest_framework import status
+from websites.cache import clear_local_cache
+from websites.models import Website
+from .models import ContactFormField, ContactMessage, ContactNotification
+
+User = get_user_model()
+
+
+@override_settings(ANALYTICS_FLUSH_INTERVAL=0)
+class ContactSubmitPublicTests(TestCase):
+    """Tests pour la soumission publique de messages de contact"""
+
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+        self.url = '/api/public/contact/submit/'
+        self.payload = {'form_data': {'email': 'visitor@example.com', 'name': 'Visitor', 'message': 'Bonjour'}}
+
+    def submit(self, payload=None):
+        return self.client.post(
+            self.url, payload or self.payload, format='json',
+            HTTP_X_API_KEY=self.website.api_key,
+            REMOTE_ADDR='10.0.0.1'
+        )
+
+    def test_submit_increments_counters(self):
+        """Test que la soumission incrémente les compteurs de façon atomique"""
+        response = self.submit()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.user.subscription.refresh_from_db()
+        self.website.refresh_from_db()
+        self.assertEqual(self.user.subscription.current_month_contacts, 1)
+        self.assertEqual(self.website.total_contacts, 1)
+        self.assertEqual(ContactMessage.objects.get().email, 'visitor@example.com')
+
+    def test_quota_reached(self):
+        """Test que le quota mensuel renvoie 429 sans créer de message"""
+        subscription = self.user.subscription
+        subscription.current_month_contacts = subscription.contacts_per_month
+        subscription.save(update_fields=['current_month_contacts'])
+
+        response = self.submit()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response.data['limit'], subscription.contacts_per_month)
+        self.assertFalse(ContactMessage.objects.exists())
+
+    def test_invalid_payload_does_not_consume_quota(self):
+        """Test qu'une soumission invalide ne consomme pas de quota"""
+        response = self.submit({'form_data': 'invalide'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.subscription.refresh_from_db()
+        self.assertEqual(self.user.subscription.current_month_contacts, 0)
+
+
+class ContactMessageCursorPaginationTests(TestCase):
+    """Tests pour la pagination par curseur de la boîte de réception"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+        self.client.force_authenticate(self.user)
+
+        ContactMessage.objects.bulk_create([
+            ContactMessage(website=self.website, form_data={}, email=f'visitor{i}@example.com')
+            for i in range(45)
+        ])
+        # Des dates identiques par paires pour vérifier le départage par id
+        now = timezone.now()
+        for index, pk in enumerate(ContactMessage.objects.order_by('id').values_list('id', flat=True)):
+            ContactMessage.objects.filter(pk=pk).update(created_at=now - timedelta(minutes=index // 2))
+        self.expected = list(ContactMessage.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def ids(self, response):
+        return [message['id'] for message in response.data['results']]
+
+    def test_page_number_is_default(self):
+        """Test que la pagination par numéro de page reste la valeur par défaut"""
+        response = self.client.get('/api/v1/contacts/messages/')
+        self.assertEqual(response.data['count'], 45)
+
+    def test_walk_forward_and_back(self):
+        """Test du parcours complet vers l'avant puis vers l'arrière"""
+        response = self.client.get('/api/v1/contacts/messages/', {'pagination': 'cursor'})
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+
+        pages = [self.ids(response)]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pages.append(self.ids(response))
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+        self.assertEqual(sum(pages, []), self.expected)
+
+        back = []
+        while response.data['previous']:
+            response = self.client.get(response.data['previous'])
+            back.append(self.ids(response))
+        self.assertEqual(back, [pages[1], pages[0]])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/contacts/messages/', {'cursor': 'invalide'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ContactMessageExportTests(TestCase):
+    """Tests pour l'export en flux des messages"""
+
+    url = '/api/v1/contacts/messages/export/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+        self.client.force_authenticate(self.user)
+
+        ContactFormField.objects.create(website=self.website, name='company', label='Société', order=1)
+        ContactFormField.objects.create(website=self.website, name='budget', label='Budget', order=0)
+        ContactMessage.objects.create(
+            website=self.website, email='a@example.com', name='Alice',
+            form_data={'email': 'a@example.com', 'company': 'ACME', 'budget': ['1k', '5k'], 'utm': 'ads'}
+        )
+        ContactMessage.objects.create(
+            website=self.website, email='b@example.com', status='spam', form_data={'company': 'Évrard'}
+        )
+        other = User.objects.create_user(email='other@example.com', password='password123')
+        other_site = Website.objects.create(user=other, name='Autre', domain='other.com')
+        ContactMessage.objects.create(website=other_site, email='x@example.com', form_data={})
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8-sig')
+
+    def test_csv_flattens_form_fields(self):
+        """Test que les champs de formulaire deviennent des colonnes"""
+        response = self.client.get(self.url, {'status': 'new'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+
+        rows = list(csv.DictReader(io.StringIO(self.content(response))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(list(rows[0])[-3:], ['budget', 'company', 'other_fields'])
+        self.assertEqual(rows[0]['company'], 'ACME')
+        self.assertEqual(rows[0]['budget'], '1k, 5k')
+        self.assertEqual(json.loads(rows[0]['other_fields']), {'utm': 'ads'})
+
+    def test_ndjson(self):
+        """Test de l'export NDJSON limité aux sites de l'utilisateur"""
+        response = self.client.get(self.url, {'output': 'ndjson'})
+        lines = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual({line['email'] for line in lines}, {'a@example.com', 'b@example.com'})
+        self.assertEqual(lines[0]['company'], 'Évrard')
+
+    def test_date_filters(self):
+        """Test des filtres de date partagés avec la liste"""
+        ContactMessage.objects.filter(email='b@example.com').update(created_at=timezone.now() - timedelta(days=10))
+        day = (timezone.localdate() - timedelta(days=10)).isoformat()
+        response = self.client.get(self.url, {'output': 'ndjson', 'start_date': day, 'end_date': day})
+        self.assertEqual([json.loads(line)['email'] for line in self.content(response).splitlines()], ['b@example.com'])
+
+        response = self.client.get('/api/v1/contacts/messages/', {'start_date': 'hier'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_format(self):
+        response = self.client.get(self.url, {'output': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ContactMessageBulkStatusTests(TestCase):
+    """Tests pour les changements de statut groupés"""
+
+    url = '/api/v1/contacts/messages/bulk-status/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+        self.client.force_authenticate(self.user)
+        self.messages = ContactMessage.objects.bulk_create([
+            ContactMessage(website=self.website, form_data={}, email=f'visitor{i}@example.com')
+            for i in range(5)
+        ])
+        other = User.objects.create_user(email='other@example.com', password='password123')
+        other_site = Website.objects.create(user=other, name='Autre', domain='other.com')
+        self.foreign = ContactMessage.objects.create(website=other_site, form_data={})
+
+    def post(self, data):
+        return self.client.post(self.url, data, format='json')
+
+    def test_ids_single_update(self):
+        """Test qu'une liste d'ids est traitée en un UPDATE limité aux messages de l'utilisateur"""
+        ids = [message.id for message in self.messages[:3]] + [self.foreign.id]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post({'ids': ids, 'status': 'spam'})
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 1)
+        self.assertEqual(ContactMessage.objects.filter(status='spam').count(), 3)
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.status, 'new')
+
+    def test_filter_sets_dates(self):
+        """Test du filtre et des dates de lecture / réponse"""
+        read_at = timezone.now() - timedelta(days=2)
+        ContactMessage.objects.filter(pk=self.messages[0].pk).update(status='replied', read_at=read_at)
+
+        response = self.post({'filter': {'status': 'new'}, 'status': 'read'})
+        self.assertEqual(response.data['updated'], 4)
+        self.assertFalse(ContactMessage.objects.filter(website=self.website, read_at=None).exists())
+
+        response = self.post({'filter': {'website': str(self.website.id)}, 'status': 'read'})
+        self.assertEqual(response.data['updated'], 1)
+        first = ContactMessage.objects.get(pk=self.messages[0].pk)
+        self.assertEqual(first.read_at, read_at)
+
+        response = self.post({'ids': [self.messages[1].id], 'status': 'replied'})
+        self.assertIsNotNone(ContactMessage.objects.get(pk=self.messages[1].pk).replied_at)
+
+    def test_webhooks_notified(self):
+        """Test que les abonnés contact.read sont notifiés"""
+        from webhooks.models import Webhook
+        Webhook.objects.create(website=self.website, name='Hook', url='https://hooks.example.com', events=['contact.read'])
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.post({'ids': [message.id for message in self.messages[:2]], 'status': 'read'})
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(len(callbacks), 2)
+
+    def test_validation(self):
+        self.assertEqual(self.post({'status': 'read'}).status_code, status.HTTP_400_BAD_REQUEST)
+        for invalid in ({'email': 'x'}, {}, {'website': 'abc'}, {'status': 'inconnu'}):
+            self.assertEqual(
+                self.post({'filter': invalid, 'status': 'read'}).status_code, status.HTTP_400_BAD_REQUEST, invalid
+            )
+        self.assertFalse(ContactMessage.objects.filter(status='read').exists())
+
+
+@override_settings(ANALYTICS_FLUSH_INTERVAL=0)
+class ContactMessageSearchTests(TestCase):
+    """Tests pour la recherche plein texte (FTS5 sous SQLite)"""
+
+    url = '/api/v1/contacts/messages/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+        self.client.force_authenticate(self.user)
+        # bulk_create : l'index est alimenté par les triggers, pas par save()
+        self.devis, self.facture, self.mixte = ContactMessage.objects.bulk_create([
+            ContactMessage(website=self.website, form_data={}, subject='Demande de devis',
+                           message='Un devis pour un site vitrine, merci.'),
+            ContactMessage(website=self.website, form_data={'societe': 'Boulangerie Dupont'},
+                           subject='Facture', message='Erreur sur la facture de mars.'),
+            ContactMessage(website=self.website, form_data={}, subject='Question',
+                           message='Faut-il un devis avant la facture ?'),
+        ])
+        other = User.objects.create_user(email='other@example.com', password='password123')
+        other_site = Website.objects.create(user=other, name='Autre', domain='other.com')
+        ContactMessage.objects.create(website=other_site, form_data={}, subject='Devis', message='devis devis')
+
+    def search(self, terms, **params):
+        response = self.client.get(self.url, {'search': terms, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_ranked_and_scoped(self):
+        """Test du classement par pertinence, limité aux sites de l'utilisateur"""
+        self.assertEqual(self.search('devis'), [self.devis.id, self.mixte.id])
+        self.assertEqual(self.search('devis facture'), [self.mixte.id])
+
+    def test_prefix_accents_and_form_data(self):
+        self.assertEqual(self.search('boulang'), [self.facture.id])
+        self.assertEqual(self.search('DEMANDE'), [self.devis.id])
+        self.assertEqual(self.search('"vitrine'), [self.devis.id])
+
+    def test_index_follows_updates_and_filters(self):
+        ContactMessage.objects.filter(pk=self.facture.pk).update(subject='Devis urgent')
+        self.assertEqual(set(self.search('devis')), {self.devis.id, self.facture.id, self.mixte.id})
+        self.assertEqual(self.search('devis', status='read'), [])
+        ContactMessage.objects.filter(pk=self.devis.pk).delete()
+        self.assertEqual(len(self.search('devis')), 2)
+
+
+@override_settings(ANALYTICS_FLUSH_INTERVAL=0)
+class ContactFormValidationTests(TestCase):
+    """Tests pour la validation de form_data selon les champs du site"""
+
+    url = '/api/public/contact/submit/'
+
+    def setUp(self):
+        from .validation import clear_local_cache as clear_validators
+        cache.clear()
+        clear_local_cache()
+        clear_validators()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+        fields = [
+            ('full_name', 'text', True, None),
+            ('budget', 'number', False, None),
+            ('service', 'select', True, ['Site vitrine', 'E-commerce']),
+            ('date', 'date', False, None),
+            ('rgpd', 'checkbox', True, None),
+        ]
+        for order, (name, field_type, required, options) in enumerate(fields):
+            ContactFormField.objects.create(
+                website=self.website, name=name, label=name, field_type=field_type,
+                required=required, options=options, order=order
+            )
+
+    def submit(self, form_data):
+        return self.client.post(
+            self.url, {'form_data': form_data}, format='json',
+            HTTP_X_API_KEY=self.website.api_key, REMOTE_ADDR='10.0.0.1'
+        )
+
+    def test_valid_submission_is_coerced(self):
+        response = self.submit({
+            'full_name': ' Jean Dupont ', 'budget': '1500,50', 'service': 'E-commerce',
+            'date': '2025-03-01', 'rgpd': 'on', 'email': 'jean@example.com', 'source': 'salon',
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        message = ContactMessage.objects.get()
+        self.assertEqual(message.name, 'Jean Dupont')
+        self.assertEqual(message.form_data['budget'], 1500.5)
+        self.assertIs(message.form_data['rgpd'], True)
+        self.assertEqual(message.form_data['source'], 'salon')
+
+    def test_errors_by_field(self):
+        response = self.submit({
+            'budget': 'beaucoup', 'service': 'Autre', 'date': '2025-02-30', 'rgpd': False,
+            'email': 'pas-un-email', 'subject': 'x' * 300, 'extra': {'nested': True},
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            set(response.data['form_data']),
+            {'full_name', 'budget', 'service', 'date', 'rgpd', 'email', 'subject', 'extra'}
+        )
+        self.assertFalse(ContactMessage.objects.exists())
+
+    def test_cached_and_invalidated(self):
+        """Test que le validateur est compilé une fois puis invalidé à la modification d'un champ"""
+        from .validation import get_validator
+        get_validator(self.website.id)
+        with self.assertNumQueries(0):
+            get_validator(self.website.id)
+
+        field = ContactFormField.objects.get(website=self.website, name='service')
+        field.options = ['Site vitrine', 'E-commerce', 'Autre']
+        field.save()
+        valid = {'full_name': 'Jean', 'service': 'Autre', 'rgpd': True}
+        self.assertEqual(get_validator(self.website.id).validate(valid)['service'], 'Autre')
+
+        ContactFormField.objects.filter(website=self.website, name='full_name').get().delete()
+        del valid['full_name']
+        get_validator(self.website.id).validate(valid)
+
+
+@override_settings(ANALYTICS_FLUSH_INTERVAL=0)
+class ContactSpamTests(TestCase):
+    """Tests pour le classement automatique du spam"""
+
+    url = '/api/public/contact/submit/'
+    long_message = 'Bonjour, nous proposons des backlinks de qualité pour améliorer votre référencement rapidement.'
+
+    def setUp(self):
+        from .spam import reset_checks
+        from .validation import clear_local_cache as clear_validators
+        cache.clear()
+        clear_local_cache()
+        clear_validators()
+        reset_checks()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+
+    def submit(self, form_data):
+        return self.client.post(
+            self.url, {'form_data': form_data}, format='json',
+            HTTP_X_API_KEY=self.website.api_key, REMOTE_ADDR='10.0.0.1'
+        )
+
+    def test_honeypot_files_as_spam_without_quota(self):
+        from webhooks.models import Webhook
+        Webhook.objects.create(website=self.website, name='Hook', url='https://hooks.example.com', events=['contact.received'])
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.submit({'email': 'bot@example.com', 'message': 'Promo', '_hm_website': 'http://spam.example'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        message = ContactMessage.objects.get()
+        self.assertEqual(message.status, 'spam')
+        self.assertIn('honeypot', message.notes)
+        self.assertNotIn('_hm_website', message.form_data)
+        self.assertEqual(callbacks, [])
+        self.user.subscription.refresh_from_db()
+        self.assertEqual(self.user.subscription.current_month_contacts, 0)
+
+    def test_timing_token(self):
+        from .spam import TimingTokenCheck, score_submission
+        response = self.client.get('/api/public/contact/token/', HTTP_X_API_KEY=self.website.api_key)
+        token = response.data['token']
+        checks = [TimingTokenCheck()]
+
+        form_data, verdict = score_submission(self.website.id, {'message': 'Bonjour', '_hm_token': token}, checks)
+        self.assertEqual(verdict.reasons, ['too_fast'])
+        self.assertEqual(form_data, {'message': 'Bonjour'})
+        self.assertEqual(score_submission(self.website.id + 1, {'_hm_token': token}, checks)[1].reasons, ['token_invalid'])
+        with override_settings(CONTACT_SPAM_MIN_SECONDS=0):
+            self.assertEqual(score_submission(self.website.id, {'_hm_token': token}, [TimingTokenCheck()])[1].reasons, [])
+
+    def test_duplicates_combine_with_fast_token(self):
+        """Test qu'un doublon soumis trop vite dépasse le seuil"""
+        from .spam import issue_timing_token
+        response = self.submit({'email': 'a@example.com', 'message': self.long_message})
+        self.assertEqual(ContactMessage.objects.get(pk=response.data['id']).status, 'new')
+
+        response = self.submit({
+            'email': 'b@example.com', 'message': self.long_message,
+            '_hm_token': issue_timing_token(self.website.id)
+        })
+        message = ContactMessage.objects.get(pk=response.data['id'])
+        self.assertEqual(message.status, 'spam')
+        self.assertIn('duplicate', message.notes)
+
+    def test_bayes_model_trained_from_marked_messages(self):
+        from django.core.management import call_command
+        from .spam import BayesCheck, score_submission
+        ContactMessage.objects.bulk_create(
+            [ContactMessage(website=self.website, status='spam', form_data={
+                'message': f'Casino crypto bonus gratuit offre {i} cliquez https://promo.example'
+            }) for i in range(25)]
+            + [ContactMessage(website=self.website, status='read', form_data={
+                'message': f'Bonjour, je souhaite un devis pour notre site vitrine {i}'
+            }) for i in range(25)]
+        )
+        call_command('train_spam_filter', stdout=io.StringIO())
+
+        checks = [BayesCheck()]
+        verdict = score_submission(self.website.id, {'message': 'Offre casino crypto gratuit'}, checks)[1]
+        self.assertTrue(verdict.is_spam)
+        verdict = score_submission(self.website.id, {'message': 'Un devis pour un site vitrine'}, checks)[1]
+        self.assertFalse(verdict.is_spam)
+
+
+class CountingEmailBackend(locmem.EmailBackend):
+    """Backend locmem qui compte les ouvertures de connexion"""
+
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return super().open()
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('SMTP indisponible')
+
+
+@override_settings(ANALYTICS_FLUSH_INTERVAL=0, EMAIL_BACKEND='contacts.tests.CountingEmailBackend')
+class ContactNotificationTests(TestCase):
+    """Tests pour l'outbox des notifications email"""
+
+    url = '/api/public/contact/submit/'
+
+    def setUp(self):
+        from .spam import reset_checks
+        cache.clear()
+        clear_local_cache()
+        reset_checks()
+        CountingEmailBackend.opened = 0
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+
+    def submit(self, index=0):
+        return self.client.post(self.url, {'form_data': {
+            'email': f'visitor{index}@example.com', 'name': f'Visiteur {index}', 'message': 'Bonjour'
+        }}, format='json', HTTP_X_API_KEY=self.website.api_key, REMOTE_ADDR='10.0.0.1')
+
+    def test_submit_enqueues_and_drain_sends_over_one_connection(self):
+        from .notifications import drain
+        for index in range(3):
+            self.submit(index)
+        self.assertEqual(ContactNotification.objects.filter(status='pending').count(), 3)
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(drain()['sent'], 3)
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ['owner@example.com'])
+        self.assertEqual(mail.outbox[0].reply_to, ['visitor0@example.com'])
+        self.assertEqual(ContactNotification.objects.filter(status='sent').count(), 3)
+        self.assertEqual(drain()['sent'], 0)
+
+    def test_digest_mode(self):
+        from .notifications import drain
+        self.website.notification_mode = 'digest'
+        self.website.notification_email = 'alerts@example.com'
+        self.website.save()
+        self.submit(0)
+        self.assertEqual(drain()['deferred'], 1)
+        self.submit(1)
+        self.assertEqual(drain()['deferred'], 1)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(ContactNotification.objects.values('next_attempt_at').distinct().count(), 1)
+
+        past = timezone.now() - timedelta(hours=2)
+        ContactNotification.objects.update(created_at=past, next_attempt_at=past)
+        self.assertEqual(drain()['sent'], 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['alerts@example.com'])
+        self.assertIn('2 nouveaux messages', mail.outbox[0].subject)
+
+    def test_digest_claims_later_messages(self):
+        """Test que le résumé reprend les messages en attente arrivés depuis, sans renvoi ultérieur"""
+        from .notifications import drain
+        self.website.notification_mode = 'digest'
+        self.website.save()
+        for index in range(2):
+            self.submit(index)
+        past = timezone.now() - timedelta(hours=2)
+        first, second = ContactNotification.objects.order_by('id')
+        ContactNotification.objects.filter(pk=first.pk).update(created_at=past, next_attempt_at=past)
+        ContactNotification.objects.filter(pk=second.pk).update(next_attempt_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(drain()['sent'], 1)
+        self.assertIn('2 nouveaux messages', mail.outbox[0].subject)
+        self.assertEqual(ContactNotification.objects.filter(status='sent').count(), 2)
+
+    @override_settings(CONTACT_NOTIFICATION_CLAIM_TIMEOUT=60)
+    def test_stale_claim_is_taken_over(self):
+        """Test qu'une ligne restée 'sending' (worker interrompu) est reprise"""
+        from .notifications import drain
+        self.submit()
+        ContactNotification.objects.update(status='sending', claimed_at=timezone.now() - timedelta(seconds=30))
+        self.assertEqual(drain()['sent'], 0)
+
+        ContactNotification.objects.update(claimed_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(drain()['sent'], 1)
+        self.assertEqual(ContactNotification.objects.get().status, 'sent')
+
+    @override_settings(EMAIL_BACKEND='contacts.tests.FailingEmailBackend', CONTACT_NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_retry_with_backoff(self):
+        from .notifications import drain
+        self.submit()
+        self.assertEqual(drain()['failed'], 1)
+        notification = ContactNotification.objects.get()
+        self.assertEqual((notification.status, notification.attempts), ('pending', 1))
+        self.assertGreater(notification.next_attempt_at, timezone.now() + timedelta(seconds=30))
+        self.assertIn('SMTP indisponible', notification.last_error)
+
+        ContactNotification.objects.update(next_attempt_at=timezone.now())
+        drain()
+        self.assertEqual(ContactNotification.objects.get().status, 'failed')
+
+    def test_off_mode(self):
+        from .notifications import drain
+        self.website.notification_mode = 'off'
+        self.website.save()
+        self.submit()
+        self.assertEqual(drain()['skipped'], 1)
+        self.assertEqual(mail.outbox, [])
@@ -0,0 +1,300 @@
+"""
+Validation des données de formulaire (form_data) selon les ContactFormField
+
+Les champs d'un site web sont compilés une fois en un plan de vérification
+plat : pour chaque clé, une fonction qui contrôle le type, convertit la
+valeur (nombre, date, booléen...), vérifie l'appartenance aux options et la
+longueur. La validation d'une soumission est alors en O(champs), sans requête.
+
+Mise en cache à deux niveaux, comme pour les API keys (websites.cache) :
+- la définition des champs (tuples simples) dans le cache Django partagé ;
+- le validateur compilé dans un LRU local au processus (TTL court).
+Les signaux de ContactFormField invalident les deux niveaux à l'enregistrement
+et à la suppression ; les autres processus voient le changement au plus tard
+après CONTACT_FORM_VALIDATOR_LOCAL_TTL secondes.
+
+Les clés standards (email, name, full_name, subject, message) sont extraites
+dans des colonnes du message : si le site ne les déclare pas, elles sont
+vérifiées avec un type par défaut. Les autres clés non déclarées restent
+acceptées, limitées à des valeurs simples de taille bornée.
+"""
+import math
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import URLValidator, validate_email
+from django.utils.dateparse import parse_date
+
+from core.cache import LocalLRUCache, invalidate_two_tier
+
+CACHE_KEY = 'hostmail:contact-form:%s'
+
+# Longueur maximale par type de champ (caractères)
+MAX_LENGTHS = {
+    'text': 255,
+    'email': 254,
+    'tel': 32,
+    'textarea': 5000,
+    'url': 2000,
+    'select': 255,
+    'radio': 255,
+    'checkbox': 255,
+}
+
+# Colonnes de ContactMessage alimentées par form_data
+STANDARD_FIELDS = {
+    'email': 'email',
+    'name': 'text',
+    'full_name': 'text',
+    'subject': 'text',
+    'message': 'textarea',
+}
+
+TRUE_VALUES = {'1', 'true', 'on', 'yes', 'oui'}
+FALSE_VALUES = {'', '0', 'false', 'off', 'no', 'non'}
+TEL_CHARACTERS = set('0123456789 +-.()/')
+
+REQUIRED = "Ce champ est obligatoire."
+
+_local_cache = LocalLRUCache(
+    maxsize=getattr(settings, 'CONTACT_FORM_VALIDATOR_LOCAL_MAXSIZE', 4096),
+    ttl=getattr(settings, 'CONTACT_FORM_VALIDATOR_LOCAL_TTL', 5),
+)
+_url_validator = URLValidator(schemes=['http', 'https'])
+
+
+class FormDataError(Exception):
+    """Erreurs de validation, par nom de champ"""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _is_empty(value):
+    return value is None or value == '' or value == []
+
+
+def _string(value, max_length):
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError("Valeur texte attendue.")
+    value = str(value).strip()
+    if len(value) > max_length:
+        raise ValueError(f"{max_length} caractères maximum.")
+    return value
+
+
+def _option_values(options):
+    """Valeurs autorisées : ['A', 'B'] ou [{'value': 'A', 'label': ...}]"""
+    values = []
+    for option in options or []:
+        if isinstance(option, dict):
+            option = option.get('value', option.get('label'))
+        if option is not None:
+            values.append(str(option))
+    return frozenset(values)
+
+
+def _compile_check(field_type, options):
+    """Fonction de vérification / conversion d'une valeur non vide"""
+    max_length = MAX_LENGTHS.get(field_type, MAX_LENGTHS['text'])
+    allowed = _option_values(options)
+
+    if field_type == 'email':
+        def check(value):
+            value = _string(value, max_length)
+            try:
+                validate_email(value)
+            except DjangoValidationError:
+                raise ValueError("Adresse email invalide.")
+            return value
+
+    elif field_type == 'url':
+        def check(value):
+            value = _string(value, max_length)
+            try:
+                _url_validator(value)
+            except DjangoValidationError:
+                raise ValueError("URL invalide.")
+            return value
+
+    elif field_type == 'tel':
+        def check(value):
+            value = _string(value, max_length)
+            if not TEL_CHARACTERS.issuperset(value):
+                raise ValueError("Numéro de téléphone invalide.")
+            return value
+
+    elif field_type == 'number':
+        def check(value):
+            if isinstance(value, bool):
+                raise ValueError("Nombre attendu.")
+            if isinstance(value, str):
+                text = value.strip().replace(',', '.')
+                try:
+                    value = int(text)
+                except ValueError:
+                    try:
+                        value = float(text)
+                    except ValueError:
+                        raise ValueError("Nombre attendu.")
+            if not isinstance(value, (int, float)) or (isinstance(value, float) and not math.isfinite(value)):
+                raise ValueError("Nombre attendu.")
+            return value
+
+    elif field_type == 'date':
+        def check(value):
+            try:
+                day = parse_date(value) if isinstance(value, str) and len(value) <= 10 else None
+            except ValueError:  # format correct, date inexistante (2024-02-30)
+                day = None
+            if not isinstance(day, date):
+                raise ValueError("Date invalide (format attendu AAAA-MM-JJ).")
+            return day.isoformat()
+
+    elif field_type in ('select', 'radio') and allowed:
+        def check(value):
+            value = _string(value, max_length)
+            if value not in allowed:
+                raise ValueError("Choix invalide.")
+            return value
+
+    elif field_type == 'checkbox' and allowed:
+        # Cases multiples : liste de valeurs parmi les options
+        def check(value):
+            values = value if isinstance(value, list) else [value]
+            if len(values) > len(allowed):
+                raise ValueError("Trop de choix.")
+            values = [_string(item, max_length) for item in values]
+            if not allowed.issuperset(values):
+                raise ValueError("Choix invalide.")
+            return list(dict.fromkeys(values))
+
+    elif field_type == 'checkbox':
+        # Case unique : booléen
+        def check(value):
+            if isinstance(value, bool):
+                return value
+            text = str(value).strip().lower() if isinstance(value, (str, int)) else None
+            if text in TRUE_VALUES:
+                return True
+            if text in FALSE_VALUES:
+                return False
+            raise ValueError("Booléen attendu.")
+
+    else:
+        def check(value):
+            return _string(value, max_length)
+
+    return check
+
+
+class FormValidator:
+    """Plan de validation compilé pour un site web"""
+
+    __slots__ = ('checks', 'declared', 'max_fields', 'max_value_length')
+
+    def __init__(self, definitions):
+        definitions = list(definitions)
+        declared = {name for name, _, _, _ in definitions}
+        definitions += [
+            (name, field_type, False, None)
+            for name, field_type in STANDARD_FIELDS.items() if name not in declared
+        ]
+        # Case unique requise : doit être cochée
+        self.checks = tuple(
+            (name, required, field_type == 'checkbox' and not options, _compile_check(field_type, options))
+            for name, field_type, required, options in definitions
+        )
+        self.declared = frozenset(name for name, _, _, _ in definitions)
+        self.max_fields = getattr(settings, 'CONTACT_FORM_MAX_FIELDS', 50)
+        self.max_value_length = getattr(settings, 'CONTACT_FORM_MAX_VALUE_LENGTH', 5000)
+
+    def _check_extra(self, value):
+        """Clé non déclarée : valeur simple (ou liste de valeurs simples) de taille bornée"""
+        if isinstance(value, list):
+            if len(value) > self.max_fields:
+                raise ValueError("Trop de valeurs.")
+            return [self._check_extra(item) for item in value if not isinstance(item, list)]
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        return _string(value, self.max_value_length)
+
+    def validate(self, data):
+        """Retourne form_data vérifié et converti ; lève FormDataError"""
+        if not isinstance(data, dict):
+            raise FormDataError(["form_data doit être un objet JSON."])
+        if len(data) > self.max_fields:
+            raise FormDataError([f"{self.max_fields} champs maximum."])
+
+        cleaned = dict(data)
+        errors = {}
+        for name, required, must_be_true, check in self.checks:
+            value = data.get(name)
+            if _is_empty(value):
+                if required:
+                    errors[name] = [REQUIRED]
+                continue
+            try:
+                cleaned[name] = value = check(value)
+            except ValueError as exc:
+                errors[name] = [str(exc)]
+                continue
+            if required and ((must_be_true and value is False) or _is_empty(value)):
+                errors[name] = [REQUIRED]
+
+        for name, value in data.items():
+            if name in self.declared:
+                continue
+            try:
+                cleaned[name] = self._check_extra(value)
+            except ValueError as exc:
+                errors[name] = [str(exc)]
+
+        if errors:
+            raise FormDataError(errors)
+        return cleaned
+
+
+def _load_definitions(website_id):
+    """Définition des champs d'un site (une requête, valeurs sérialisables)"""
+    from .models import ContactFormField
+
+    return tuple(
+        (name, field_type, required, tuple(options) if isinstance(options, list) else None)
+        for name, field_type, required, options in ContactFormField.objects.filter(
+            website_id=website_id
+        ).values_list('name', 'field_type', 'required', 'options')
+    )
+
+
+def get_validator(website_id):
+    """Validateur compilé d'un site web (cache local, puis partagé, puis base)"""
+    key = CACHE_KEY % website_id
+    validator = _local_cache.get(key)
+    if validator is not None:
+        return validator
+
+    definitions = cache.get(key)
+    if definitions is None:
+        definitions = _load_definitions(website_id)
+        cache.set(key, definitions, getattr(settings, 'CONTACT_FORM_VALIDATOR_CACHE_TTL', 3600))
+    validator = FormValidator(definitions)
+    _local_cache.set(key, validator)
+    return validator
+
+
+def invalidate_validator(website_id):
+    """
+    Invalide le validateur d'un site web (rejoué après le commit, voir
+    core.cache.invalidate_two_tier)
+    """
+    if website_id:
+        invalidate_two_tier(_local_cache, [CACHE_KEY % website_id])
+
+
+def clear_local_cache():
+    """Vide le cache local du processus (utile pour les tests)"""
+    _local_cache.clear()
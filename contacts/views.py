@@ -1,15 +1,31 @@
+from datetime import datetime, timedelta
+
 from rest_framework import viewsets, status, views
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django_ratelimit.decorators import ratelimit
-from django.utils.decorators import method_decorator
-from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from analytics import track
+from core.pagination import KeysetPagination
 from core.permissions import IsWebsiteOwner
+from subscriptions.quota import (
+    reserve_contact,
+    release_contact,
+    increment_website_contacts,
+    get_contact_usage
+)
 from websites.models import Website
+from .bulk import bulk_update_status
+from .export import FORMATS as EXPORT_FORMATS, export_response
 from .models import ContactFormField, ContactMessage
+from .notifications import enqueue as enqueue_notification
+from .search import search_messages
+from .spam import TOKEN_FIELD, issue_timing_token
 from .serializers import (
     ContactFormFieldSerializer,
+    ContactMessageBulkStatusSerializer,
     ContactMessageSerializer,
     ContactMessageSubmitSerializer,
     ContactMessageUpdateStatusSerializer
@@ -40,21 +56,88 @@ class ContactMessageViewSet(viewsets.ModelViewSet):
 
     serializer_class = ContactMessageSerializer
     permission_classes = [IsAuthenticated, IsWebsiteOwner]
+    pagination_class = KeysetPagination  # ?pagination=cursor pour paginer par curseur
 
     def get_queryset(self):
         """Retourne les messages des sites web de l'utilisateur"""
         queryset = ContactMessage.objects.filter(website__user=self.request.user)
-
-        # Filtres optionnels
-        website_id = self.request.query_params.get('website')
-        status_filter = self.request.query_params.get('status')
+        queryset = self.apply_filters(queryset, self.request.query_params)
+        queryset = queryset.select_related('website').order_by('-created_at')
+
+        # Recherche plein texte : tri par pertinence (chronologique en mode curseur)
+        terms = self.request.query_params.get('search', '')
+        if terms.strip():
+            queryset = search_messages(queryset, terms)
+        return queryset
+
+    def apply_filters(self, queryset, params):
+        """Filtres optionnels : website, status, start_date, end_date"""
+        website_id = params.get('website')
+        status_filter = params.get('status')
+        start_date_param = params.get('start_date')
+        end_date_param = params.get('end_date')
 
         if website_id:
             queryset = queryset.filter(website_id=website_id)
         if status_filter:
             queryset = queryset.filter(status=status_filter)
 
-        return queryset.select_related('website').order_by('-created_at')
+        # Filtrer par période (AAAA-MM-JJ, bornes incluses)
+        if start_date_param:
+            queryset = queryset.filter(created_at__gte=self._day_start(start_date_param, 'start_date'))
+        if end_date_param:
+            queryset = queryset.filter(
+                created_at__lt=self._day_start(end_date_param, 'end_date') + timedelta(days=1)
+            )
+        return queryset
+
+    @staticmethod
+    def _day_start(value, param):
+        day = parse_date(value) if value else None
+        if day is None:
+            raise ValidationError({param: 'Date invalide (format attendu AAAA-MM-JJ).'})
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Exporte les messages filtrés en flux (?output=csv ou ?output=ndjson)
+        Les champs de formulaire du site deviennent des colonnes.
+        """
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response({
+                'error': 'Format d\'export invalide',
+                'formats': list(EXPORT_FORMATS)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset().select_related(None)
+        website_ids = Website.objects.filter(user=request.user).values_list('id', flat=True)
+        if request.query_params.get('website'):
+            website_ids = website_ids.filter(id=request.query_params['website'])
+        return export_response(queryset, list(website_ids), output)
+
+    @action(detail=False, methods=['post'], url_path='bulk-status')
+    def bulk_status(self, request):
+        """
+        Change le statut de plusieurs messages en une requête UPDATE
+        Cible : une liste d'ids ou un filtre (website, status, start_date, end_date)
+        """
+        serializer = ContactMessageBulkStatusSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = ContactMessage.objects.filter(website__user=request.user)
+        if 'ids' in serializer.validated_data:
+            queryset = queryset.filter(pk__in=serializer.validated_data['ids'])
+        else:
+            queryset = self.apply_filters(queryset, serializer.validated_data['filter'])
+
+        updated = bulk_update_status(queryset, serializer.validated_data['status'])
+        return Response({
+            'message': f'{updated} message(s) mis à jour',
+            'updated': updated
+        })
 
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
@@ -105,11 +188,11 @@ class ContactMessageViewSet(viewsets.ModelViewSet):
         })
 
 
-@method_decorator(ratelimit(key='ip', rate=settings.RATELIMIT_CONTACT_SUBMIT, method='POST'), name='post')
 class ContactSubmitPublicView(views.APIView):
     """
     Vue publique pour soumettre un message de contact
     Nécessite une API key valide dans les headers
+    Débit limité par core.middleware.PublicRateLimitMiddleware (RATELIMIT_CONTACT_SUBMIT par IP)
     """
 
     permission_classes = [AllowAny]
@@ -117,38 +200,66 @@ class ContactSubmitPublicView(views.APIView):
     def post(self, request):
         """Soumet un message de contact"""
         # L'API key est validée par le middleware
-        website = request.website  # Injecté par le middleware
+        snapshot = request.website_snapshot  # Injecté par le middleware
 
-        # Vérifier la limite de contacts
-        subscription = website.user.subscription
-        if not subscription.can_receive_contact():
-            return Response({
-                'error': 'Limite de contacts mensuelle atteinte',
-                'limit': subscription.contacts_per_month,
-                'current': subscription.current_month_contacts
-            }, status=status.HTTP_429_TOO_MANY_REQUESTS)
-
-        # Valider et créer le message
+        # Valider le message
         serializer = ContactMessageSubmitSerializer(
             data=request.data,
-            context={'website': website, 'request': request}
+            context={'website': snapshot, 'request': request}
         )
 
-        if serializer.is_valid():
-            message = serializer.save()
-
-            # Incrémenter le compteur
-            subscription.increment_contact_count()
-            website.total_contacts += 1
-            website.save(update_fields=['total_contacts'])
-
-            # TODO: Envoyer email de notification
-            # TODO: Trigger webhooks
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+        # Spam détecté (contacts.spam) : classé sans consommer de quota, réponse identique
+        if serializer.verdict.is_spam:
+            message = serializer.save()
             return Response({
                 'success': True,
                 'message': 'Message envoyé avec succès',
                 'id': message.id
             }, status=status.HTTP_201_CREATED)
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # Réserver une place dans le quota (UPDATE atomique, sans verrou)
+        if not reserve_contact(snapshot.user_id, snapshot.contacts_per_month):
+            limit, current = get_contact_usage(snapshot.user_id)
+            return Response({
+                'error': 'Limite de contacts mensuelle atteinte',
+                'limit': limit,
+                'current': current
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+        try:
+            message = serializer.save()
+        except Exception:
+            release_contact(snapshot.user_id)
+            raise
+
+        increment_website_contacts(snapshot.id)
+        track(snapshot, 'contact_received', request, {'message_id': message.id})
+
+        # Notification email mise en file (envoyée par le worker, voir contacts.notifications)
+        # Les webhooks contact.received sont déclenchés par signal (webhooks.signals)
+        enqueue_notification(message)
+
+        return Response({
+            'success': True,
+            'message': 'Message envoyé avec succès',
+            'id': message.id
+        }, status=status.HTTP_201_CREATED)
+
+
+class ContactTokenPublicView(views.APIView):
+    """
+    Vue publique fournissant le jeton anti-spam du formulaire
+    À demander à l'affichage du formulaire et à renvoyer dans form_data['_hm_token']
+    """
+
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        """Retourne un jeton signé et horodaté pour le site web de l'API key"""
+        return Response({
+            'token': issue_timing_token(request.website_snapshot.id),
+            'field': TOKEN_FIELD
+        })
@@ -0,0 +1,133 @@
+"""
+Tampons d'écriture en mémoire, vidés périodiquement en base
+
+Un BufferedWriter accumule des données par processus et les écrit par lots :
+- toutes les `interval` secondes, via un thread d'arrière-plan ;
+- dès que `max_pending` éléments sont en attente.
+Avec un intervalle à 0, aucun thread n'est démarré et le flush a lieu dans
+l'appel qui atteint le seuil ; de même sous les commandes de gestion autres
+que runserver (migrate, test...), où un thread écrirait hors de la
+transaction des tests. En cas d'échec d'écriture, le lot est réintégré.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .workers import background_threads_allowed
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedWriter:
+    """Classe de base des tampons d'écriture"""
+
+    interval_setting = None
+    max_pending_setting = None
+    default_interval = 10
+    default_max_pending = 500
+    thread_name = 'buffered-writer'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pending = 0
+        self.reset()
+        atexit.register(self.flush)
+
+    @property
+    def interval(self):
+        return getattr(settings, self.interval_setting, self.default_interval)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, self.max_pending_setting, self.default_max_pending)
+
+    @property
+    def threaded(self):
+        """Flush par thread d'arrière-plan (sinon dans l'appel qui atteint le seuil)"""
+        return self.interval > 0 and background_threads_allowed()
+
+    # À implémenter par les sous-classes
+
+    def reset(self):
+        """Initialise des tampons vides (appelé sous verrou)"""
+        raise NotImplementedError
+
+    def snapshot(self):
+        """Retourne le contenu courant des tampons (appelé sous verrou)"""
+        raise NotImplementedError
+
+    def merge(self, batch):
+        """Réintègre un lot non écrit (appelé sous verrou)"""
+        raise NotImplementedError
+
+    def write(self, batch):
+        """Écrit un lot en base"""
+        raise NotImplementedError
+
+    # Mécanique commune
+
+    def pending(self):
+        """Nombre d'éléments en attente d'écriture"""
+        return self._pending
+
+    def added(self):
+        """
+        À appeler hors verrou après l'ajout d'éléments.
+        Les sous-classes incrémentent self._pending sous verrou avec leurs tampons.
+        """
+        threshold_reached = self._pending >= self.max_pending
+
+        if self.threaded:
+            self._ensure_thread()
+            if threshold_reached:
+                self._wakeup.set()
+        elif threshold_reached:
+            self.flush()
+
+    def discard(self):
+        """Vide les tampons sans rien écrire (utile pour les tests)"""
+        with self._lock:
+            self.reset()
+            self._pending = 0
+
+    def flush(self):
+        """Écrit les éléments en attente ; retourne le nombre d'éléments écrits"""
+        with self._flush_lock:
+            with self._lock:
+                count = self._pending
+                if not count:
+                    return 0
+                batch = self.snapshot()
+                self.reset()
+                self._pending = 0
+            try:
+                self.write(batch)
+            except Exception:
+                logger.exception('Échec du flush %s, réintégration du lot', self.thread_name)
+                with self._lock:
+                    self.merge(batch)
+                    self._pending += count
+                return 0
+            return count
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval or 1)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
@@ -0,0 +1,82 @@
+"""
+Caches en mémoire (par processus) pour HostMail
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+_MISSING = object()
+
+
+class LocalLRUCache:
+    """
+    Cache LRU borné avec expiration (TTL), local au processus et thread-safe.
+    Sert de premier niveau devant le cache Django configuré.
+    """
+
+    def __init__(self, maxsize=1024, ttl=5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Retourne la valeur associée à la clé si elle n'a pas expiré"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Stocke une valeur en évinçant l'entrée la moins récemment utilisée"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """Supprime une entrée du cache"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Vide entièrement le cache"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def delete_two_tier(local_cache, keys):
+    """Supprime des clés du cache local et du cache Django"""
+    for key in keys:
+        local_cache.delete(key)
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate_two_tier(local_cache, keys):
+    """
+    Invalide des clés des deux niveaux, puis à nouveau après le commit de la
+    transaction : une lecture concurrente ne remet pas en cache un état non
+    encore validé
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    delete_two_tier(local_cache, keys)
+    transaction.on_commit(lambda: delete_two_tier(local_cache, keys))
@@ -1,14 +1,107 @@
 """
 Middleware personnalisés pour HostMail
 """
-from django.http import JsonResponse
-from websites.models import Website
+import logging
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import SimpleLazyObject
+from analytics import track
+from subscriptions.entitlements import attach_entitlements
+from websites.cache import resolve_api_key
+from websites.models import Website, origin_allowed
+from . import ratelimit
+
+logger = logging.getLogger(__name__)
+
+
+def _load_website(website_id):
+    """Charge le site web complet (uniquement si une vue en a besoin)"""
+    return Website.objects.select_related('user', 'user__subscription').get(pk=website_id)
+
+
+PUBLIC_PREFIX = '/api/public/'
+PUBLIC_CORS_METHODS = 'GET, POST, OPTIONS'
+PUBLIC_CORS_HEADERS = 'accept, content-type, x-api-key, if-none-match, if-modified-since'
+PUBLIC_CORS_EXPOSE = 'ETag, Last-Modified, Retry-After, X-RateLimit-Limit, X-RateLimit-Remaining, X-RateLimit-Reset'
+
+
+class EntitlementsMiddleware:
+    """
+    Attache request.entitlements (limites, fonctionnalités et utilisation de
+    l'abonnement), chargé une seule fois au premier accès dans la requête
+    Voir subscriptions.entitlements
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        attach_entitlements(request)
+        return self.get_response(request)
+
+
+class PublicCorsMiddleware:
+    """
+    CORS des endpoints publics, par site web (Website.allowed_origins)
+
+    Placé avant APIKeyMiddleware (corsheaders ignore /api/public/, voir CORS_URLS_REGEX) :
+    - preflight OPTIONS : réponse directe, sans vue ni base. Le navigateur
+      n'envoie pas X-API-Key en preflight : le site n'est pas connu, la
+      vérification de l'origine se fait sur la requête réelle. La réponse est
+      mise en cache par le navigateur (PUBLIC_CORS_MAX_AGE) ;
+    - requête réelle : l'origine est comparée au frozenset précalculé du
+      snapshot en cache (process_view, après la résolution de l'API key) ;
+      une origine refusée reçoit une 403 avant la vue.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.max_age = str(getattr(settings, 'PUBLIC_CORS_MAX_AGE', 86400))
+
+    def __call__(self, request):
+        origin = request.headers.get('Origin')
+        if not origin or not request.path.startswith(PUBLIC_PREFIX):
+            return self.get_response(request)
+
+        if request.method == 'OPTIONS' and 'Access-Control-Request-Method' in request.headers:
+            response = HttpResponse(status=204)
+            response['Access-Control-Allow-Origin'] = origin
+            response['Access-Control-Allow-Methods'] = PUBLIC_CORS_METHODS
+            response['Access-Control-Allow-Headers'] = PUBLIC_CORS_HEADERS
+            response['Access-Control-Max-Age'] = self.max_age
+            patch_vary_headers(response, ['Origin'])
+            return response
+
+        response = self.get_response(request)
+        snapshot = getattr(request, 'website_snapshot', None)
+        # Sans snapshot : erreur d'API key, lisible par le script appelant
+        if snapshot is None or origin_allowed(snapshot.allowed_origins, origin):
+            response['Access-Control-Allow-Origin'] = origin
+            response['Access-Control-Expose-Headers'] = PUBLIC_CORS_EXPOSE
+        patch_vary_headers(response, ['Origin'])
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        origin = request.headers.get('Origin')
+        snapshot = getattr(request, 'website_snapshot', None)
+        if origin and snapshot is not None and not origin_allowed(snapshot.allowed_origins, origin):
+            return JsonResponse({
+                'error': 'Origine non autorisée',
+                'detail': f"L'origine {origin} n'est pas autorisée pour ce site"
+            }, status=403)
+        return None
 
 
 class APIKeyMiddleware:
     """
     Middleware pour valider l'API key sur les endpoints publics
     L'API key doit être fournie dans le header: X-API-Key
+
+    La résolution passe par un cache à deux niveaux (voir websites.cache) :
+    request.website_snapshot contient les informations utiles au chemin chaud,
+    request.website n'est chargé depuis la base qu'au premier accès.
     """
 
     def __init__(self, get_response):
@@ -27,27 +120,78 @@ class APIKeyMiddleware:
                 }, status=401)
 
             # Valider l'API key
-            try:
-                website = Website.objects.select_related('user', 'user__subscription').get(
-                    api_key=api_key,
-                    is_active=True
-                )
-
-                # Vérifier que l'abonnement est actif
-                if website.user.subscription.status != 'active':
-                    return JsonResponse({
-                        'error': 'Abonnement inactif',
-                        'detail': 'Votre abonnement n\'est pas actif'
-                    }, status=403)
-
-                # Injecter le website dans la requête
-                request.website = website
-
-            except Website.DoesNotExist:
+            snapshot = resolve_api_key(api_key)
+
+            if snapshot is None or not snapshot.is_active:
                 return JsonResponse({
                     'error': 'API key invalide',
                     'detail': 'L\'API key fournie est invalide ou le site est désactivé'
                 }, status=401)
 
+            # Vérifier que l'abonnement est actif
+            if snapshot.subscription_status != 'active':
+                return JsonResponse({
+                    'error': 'Abonnement inactif',
+                    'detail': 'Votre abonnement n\'est pas actif'
+                }, status=403)
+
+            # Injecter le website dans la requête
+            request.website_snapshot = snapshot
+            request.website = SimpleLazyObject(lambda: _load_website(snapshot.id))
+
         response = self.get_response(request)
+
+        # Événement analytics (tampon en mémoire, écrit par lots), une fois la
+        # limitation de débit passée : une requête refusée (429) n'est pas un appel
+        snapshot = getattr(request, 'website_snapshot', None)
+        if snapshot is not None and response.status_code != 429:
+            track(snapshot, 'api_call', request, {'path': request.path, 'method': request.method})
+        return response
+
+
+class PublicRateLimitMiddleware:
+    """
+    Limitation de débit des endpoints publics, par API key (budget du plan)
+    et par IP (budget de la route) : voir core.ratelimit
+
+    Placé après APIKeyMiddleware (utilise request.website_snapshot). Toutes
+    les réponses publiques portent les en-têtes X-RateLimit-Limit,
+    X-RateLimit-Remaining et X-RateLimit-Reset (secondes) du budget le plus
+    restrictif ; une requête refusée reçoit une 429 avec Retry-After.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        snapshot = getattr(request, 'website_snapshot', None)
+        if snapshot is None or not getattr(settings, 'RATELIMIT_ENABLE', True):
+            return self.get_response(request)
+
+        try:
+            decision = ratelimit.check_request(request, snapshot, ratelimit.client_ip(request))
+        except Exception:
+            logger.exception('Limitation de débit indisponible')
+            if getattr(settings, 'RATELIMIT_FAIL_OPEN', True):
+                return self.get_response(request)
+            return JsonResponse({
+                'error': 'Service temporairement indisponible',
+                'detail': 'Veuillez réessayer dans quelques instants'
+            }, status=503)
+
+        if decision is None:
+            return self.get_response(request)
+
+        if decision.allowed:
+            response = self.get_response(request)
+        else:
+            response = JsonResponse({
+                'error': 'Trop de requêtes',
+                'detail': f'Limite de {decision.limit} requêtes atteinte, réessayez dans {decision.retry_after} s'
+            }, status=429)
+            response['Retry-After'] = str(decision.retry_after)
+
+        response['X-RateLimit-Limit'] = str(decision.limit)
+        response['X-RateLimit-Remaining'] = str(decision.remaining)
+        response['X-RateLimit-Reset'] = str(decision.reset)
         return response
@@ -0,0 +1,113 @@
+"""
+Pagination des listes volumineuses
+
+KeysetPagination pagine par numéro de page par défaut (réponse inchangée).
+Avec ?pagination=cursor, ou dès qu'un paramètre cursor est fourni, elle
+pagine par curseur sur (created_at, id) : pas de COUNT(*) ni d'OFFSET, le
+coût d'une page ne dépend pas de sa profondeur.
+
+Les curseurs sont opaques (base64) et encodent la position de la dernière
+ligne vue et le sens de lecture.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """Pagination par numéro de page, ou par curseur (created_at, id) sur demande"""
+
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    invalid_cursor_message = 'Curseur invalide'
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.use_cursor(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        position = self.decode_cursor(request)
+        reverse = position is not None and position[2]
+
+        if position is not None:
+            created_at, pk = position[0], position[1]
+            if reverse:
+                queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+            else:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+
+        ordering = ('created_at', 'pk') if reverse else ('-created_at', '-pk')
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # Lecture vers l'avant : la page suivante existe si une ligne de plus a été lue,
+        # la précédente dès qu'un curseur a été fourni (et inversement)
+        self.next_position = self.previous_position = None
+        if rows:
+            first, last = rows[0], rows[-1]
+            if has_more or reverse:
+                self.next_position = (last.created_at, last.pk, False)
+            if position is not None and (has_more or not reverse):
+                self.previous_position = (first.created_at, first.pk, True)
+        elif position is not None:
+            # Page vide : permettre de revenir en arrière depuis la position demandée
+            self.previous_position = (position[0], position[1], True) if not reverse else None
+            self.next_position = (position[0], position[1], False) if reverse else None
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_cursor_link(self.next_position),
+            'previous': self.get_cursor_link(self.previous_position),
+            'results': data,
+        })
+
+    # Curseurs
+
+    def encode_cursor(self, position):
+        created_at, pk, reverse = position
+        payload = json.dumps({'t': created_at.isoformat(), 'i': pk, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            created_at = parse_datetime(payload['t'])
+            pk = int(payload['i'])
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk, reverse
+
+    def get_cursor_link(self, position):
+        if position is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position))
@@ -1,4 +1,5 @@
 from rest_framework import permissions
+from subscriptions.entitlements import get_entitlements
 
 
 class IsOwner(permissions.BasePermission):
@@ -39,11 +40,7 @@ class HasActiveSubscription(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
 
-        try:
-            subscription = request.user.subscription
-            return subscription.status == 'active'
-        except:
-            return False
+        return get_entitlements(request).is_active
 
 
 class HasAnalyticsFeature(permissions.BasePermission):
@@ -55,8 +52,4 @@ class HasAnalyticsFeature(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
 
-        try:
-            subscription = request.user.subscription
-            return subscription.analytics and subscription.status == 'active'
-        except:
-            return False
+        return get_entitlements(request).has_feature('analytics')
@@ -0,0 +1,218 @@
+"""
+Limitation de débit des endpoints publics (/api/public/)
+
+Deux budgets sont vérifiés pour chaque requête :
+- par site web (API key), selon le plan de l'abonnement
+  (api_rate_limit du catalogue des plans) ;
+- par adresse IP, selon la route (RATELIMIT_CONTACT_SUBMIT pour l'envoi de
+  message, RATELIMIT_PROJECT_VIEW pour les projets, RATELIMIT_API_DEFAULT sinon).
+
+Algorithme GCRA (seau à jetons sans tâche de remplissage) : chaque clé ne
+stocke que la date théorique d'arrivée (TAT) de la prochaine requête. Une
+requête refusée ne consomme rien.
+
+Un seul aller-retour au cache par requête :
+- Redis : un script Lua (EVALSHA) vérifie et met à jour les deux clés
+  atomiquement ;
+- autres backends (locmem...) : get_many / set_many sous verrou.
+
+En cas d'erreur du cache, la requête passe (RATELIMIT_FAIL_OPEN = True) ou
+reçoit une 503.
+"""
+import functools
+import logging
+import math
+import re
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from subscriptions.plans import get_catalog
+
+logger = logging.getLogger(__name__)
+
+Rate = namedtuple('Rate', ['limit', 'period'])
+Bucket = namedtuple('Bucket', ['key', 'rate'])
+Decision = namedtuple('Decision', ['allowed', 'limit', 'remaining', 'reset', 'retry_after'])
+
+KEY_PREFIX = 'hostmail:ratelimit:'
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+RATE_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*([smhd])\w*\s*$')
+
+# KEYS : clés des seaux ; ARGV : maintenant (ms), puis intervalle et tolérance (ms) par clé.
+# Retourne par clé : autorisé (1/0), TAT (ms)
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local result = {}
+local allowed = 1
+local tats = {}
+for i, key in ipairs(KEYS) do
+    local interval = tonumber(ARGV[i * 2])
+    local tolerance = tonumber(ARGV[i * 2 + 1])
+    local tat = tonumber(redis.call('GET', key) or now)
+    if tat < now then tat = now end
+    local new_tat = tat + interval
+    if new_tat - now > tolerance then
+        allowed = 0
+        tats[i] = tat
+    else
+        tats[i] = new_tat
+    end
+end
+for i, key in ipairs(KEYS) do
+    if allowed == 1 then
+        redis.call('SET', key, tats[i], 'PX', math.max(math.ceil(tats[i] - now), 1))
+    end
+    result[i * 2 - 1] = allowed
+    result[i * 2] = tats[i]
+end
+return result
+"""
+
+
+@functools.lru_cache(maxsize=64)
+def parse_rate(value):
+    """'10/m', '100/5m', '1000/h' -> Rate(limite, période en secondes) ; None si vide"""
+    if not value:
+        return None
+    match = RATE_RE.match(str(value))
+    if not match:
+        raise ValueError(f'Débit invalide : {value!r}')
+    count, multiplier, unit = match.groups()
+    return Rate(int(count), int(multiplier or 1) * UNITS[unit])
+
+
+def _decide(rate, tat, now, allowed):
+    """Décision pour un seau à partir de sa TAT (secondes)"""
+    interval = rate.period / rate.limit
+    tolerance = rate.period
+    if allowed:
+        remaining = int((tolerance - (tat - now)) / interval + 1e-9)
+        return Decision(True, rate.limit, max(remaining, 0), math.ceil(tat - now), 0)
+    retry_after = tat + interval - tolerance - now
+    return Decision(False, rate.limit, 0, math.ceil(tat - now), max(math.ceil(retry_after), 1))
+
+
+class CacheBackend:
+    """
+    Autres backends de cache : lecture et écriture groupées (get_many / set_many)
+    sous verrou. Atomique pour un cache local au processus (locmem) ; approximatif
+    pour un cache partagé sans script (memcached, base de données).
+    """
+
+    def __init__(self, backend_cache):
+        self.cache = backend_cache
+        self.lock = threading.Lock()
+
+    def hit(self, buckets, now):
+        """Consomme un jeton dans chaque seau si tous en ont un ; retourne une Decision par seau"""
+        with self.lock:
+            stored = self.cache.get_many([bucket.key for bucket in buckets])
+            tats = []
+            allowed = True
+            for bucket in buckets:
+                tat = max(stored.get(bucket.key, now), now)
+                new_tat = tat + bucket.rate.period / bucket.rate.limit
+                if new_tat - now > bucket.rate.period:
+                    allowed = False
+                    tats.append(tat)
+                else:
+                    tats.append(new_tat)
+            if allowed:
+                self.cache.set_many(
+                    {bucket.key: tat for bucket, tat in zip(buckets, tats)},
+                    max(math.ceil(max(tats) - now), 1)
+                )
+        return [_decide(bucket.rate, tat, now, allowed) for bucket, tat in zip(buckets, tats)]
+
+
+class RedisBackend:
+    """Script Lua GCRA : un seul EVALSHA pour toutes les clés de la requête"""
+
+    def __init__(self, redis_cache):
+        self.cache = redis_cache
+        self.script = None
+
+    def hit(self, buckets, now):
+        client = self.cache._cache.get_client(write=True)
+        if self.script is None:
+            self.script = client.register_script(GCRA_SCRIPT)
+        now_ms = int(now * 1000)
+        args = [now_ms]
+        for bucket in buckets:
+            args += [bucket.rate.period * 1000 / bucket.rate.limit, bucket.rate.period * 1000]
+        result = self.script(
+            keys=[self.cache.make_key(bucket.key) for bucket in buckets], args=args, client=client
+        )
+        return [
+            _decide(bucket.rate, float(result[index * 2 + 1]) / 1000, now, bool(result[index * 2]))
+            for index, bucket in enumerate(buckets)
+        ]
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if cache.__class__.__name__ == 'RedisCache':
+            _backend = RedisBackend(cache)
+        else:
+            _backend = CacheBackend(cache)
+    return _backend
+
+
+def plan_rate(plan):
+    return parse_rate(get_catalog().get(plan).limits.get('api_rate_limit'))
+
+
+def route_rate(request):
+    """Budget par IP selon la route : (portée, Rate)"""
+    path = request.path
+    if path.startswith('/api/public/contact/submit') and request.method == 'POST':
+        return 'submit', parse_rate(getattr(settings, 'RATELIMIT_CONTACT_SUBMIT', None))
+    if path.startswith('/api/public/projects'):
+        return 'projects', parse_rate(getattr(settings, 'RATELIMIT_PROJECT_VIEW', None))
+    return 'api', parse_rate(getattr(settings, 'RATELIMIT_API_DEFAULT', None))
+
+
+def client_ip(request):
+    """
+    Adresse du client pour le budget par IP : REMOTE_ADDR, ou, derrière
+    RATELIMIT_TRUSTED_PROXIES proxies de confiance, l'adresse ajoutée à
+    X-Forwarded-For par le plus éloigné d'entre eux. Les valeurs plus à
+    gauche sont fournies par le client et ne sont jamais utilisées.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR')
+    proxies = getattr(settings, 'RATELIMIT_TRUSTED_PROXIES', 0)
+    if not proxies:
+        return remote_addr
+    forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+    chain = forwarded + [remote_addr]
+    return chain[max(len(chain) - proxies - 1, 0)]
+
+
+def check_request(request, snapshot, ip):
+    """
+    Vérifie les budgets de la requête ; retourne la Decision la plus restrictive,
+    ou None si aucun budget ne s'applique. Lève l'erreur du cache le cas échéant.
+    """
+    buckets = []
+    rate = plan_rate(snapshot.plan)
+    if rate:
+        buckets.append(Bucket(f'{KEY_PREFIX}site:{snapshot.id}', rate))
+    scope, rate = route_rate(request)
+    if rate and ip:
+        buckets.append(Bucket(f'{KEY_PREFIX}ip:{scope}:{ip}', rate))
+    if not buckets:
+        return None
+
+    decisions = get_backend().hit(buckets, time.time())
+    denied = [decision for decision in decisions if not decision.allowed]
+    if denied:
+        return max(denied, key=lambda decision: decision.retry_after)
+    return min(decisions, key=lambda decision: decision.remaining)
@@ -73,7 +73,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.EntitlementsMiddleware',  # Droits de l'abonnement, chargés une fois par requête
+    'core.middleware.PublicCorsMiddleware',  # CORS par site web des endpoints publics
     'core.middleware.APIKeyMiddleware',  # Validation API key pour endpoints publics
+    'core.middleware.PublicRateLimitMiddleware',  # Budgets par API key (plan) et par IP
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -232,6 +235,10 @@ CORS_ALLOWED_ORIGINS = config(
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Les endpoints publics (/api/public/) ont leur CORS par site web : core.middleware.PublicCorsMiddleware
+CORS_URLS_REGEX = r'^(?!/api/public/).*$'
+PUBLIC_CORS_MAX_AGE = config('PUBLIC_CORS_MAX_AGE', default=86400, cast=int)  # Cache des preflights (secondes)
+
 CORS_ALLOW_METHODS = [
     'DELETE',
     'GET',
@@ -399,9 +406,110 @@ RATELIMIT_USE_CACHE = 'default'
 RATELIMIT_CONTACT_SUBMIT = config('RATELIMIT_CONTACT_SUBMIT', default='10/m')  # 10 par minute
 RATELIMIT_PROJECT_VIEW = config('RATELIMIT_PROJECT_VIEW', default='100/m')  # 100 par minute
 RATELIMIT_API_DEFAULT = config('RATELIMIT_API_DEFAULT', default='60/m')  # 60 par minute
+RATELIMIT_TRUSTED_PROXIES = config('RATELIMIT_TRUSTED_PROXIES', default=0, cast=int)  # Proxies devant l'application (X-Forwarded-For) : IP des budgets, analytics et messages
+RATELIMIT_FAIL_OPEN = config('RATELIMIT_FAIL_OPEN', default=True, cast=bool)  # Cache indisponible : laisser passer (False = 503)
+# Budgets par API key : HOSTMAIL_PLANS[plan]['api_rate_limit']
+
+
+# Cache de résolution des API keys (middleware des endpoints publics)
+APIKEY_CACHE_LOCAL_TTL = config('APIKEY_CACHE_LOCAL_TTL', default=5, cast=int)  # LRU en mémoire (secondes)
+APIKEY_CACHE_LOCAL_MAXSIZE = config('APIKEY_CACHE_LOCAL_MAXSIZE', default=4096, cast=int)
+APIKEY_CACHE_TTL = config('APIKEY_CACHE_TTL', default=300, cast=int)  # Cache partagé (secondes)
+APIKEY_CACHE_NEGATIVE_TTL = config('APIKEY_CACHE_NEGATIVE_TTL', default=30, cast=int)  # Clés inconnues
+
 
+# Compteur de vues des projets (écriture par lots)
+PROJECT_VIEWS_FLUSH_INTERVAL = config('PROJECT_VIEWS_FLUSH_INTERVAL', default=10, cast=int)  # secondes, 0 = sans thread
+PROJECT_VIEWS_FLUSH_MAX_HITS = config('PROJECT_VIEWS_FLUSH_MAX_HITS', default=500, cast=int)
 
-# HostMail Plans Configuration
+
+# Validateurs de formulaire de contact compilés (par site web)
+CONTACT_FORM_VALIDATOR_LOCAL_TTL = config('CONTACT_FORM_VALIDATOR_LOCAL_TTL', default=5, cast=int)  # LRU en mémoire (secondes)
+CONTACT_FORM_VALIDATOR_CACHE_TTL = config('CONTACT_FORM_VALIDATOR_CACHE_TTL', default=3600, cast=int)  # Cache partagé (secondes)
+CONTACT_FORM_MAX_FIELDS = config('CONTACT_FORM_MAX_FIELDS', default=50, cast=int)  # Clés par soumission
+CONTACT_FORM_MAX_VALUE_LENGTH = config('CONTACT_FORM_MAX_VALUE_LENGTH', default=5000, cast=int)  # Champs non déclarés
+
+
+# Détection du spam des soumissions de contact (voir contacts.spam)
+CONTACT_SPAM_CHECKS = [
+    'contacts.spam.HoneypotCheck',
+    'contacts.spam.TimingTokenCheck',
+    'contacts.spam.DuplicateCheck',
+    'contacts.spam.BayesCheck',
+]
+CONTACT_SPAM_THRESHOLD = config('CONTACT_SPAM_THRESHOLD', default=0.9, cast=float)  # Score combiné (0 à 1)
+CONTACT_SPAM_HONEYPOT_FIELDS = config('CONTACT_SPAM_HONEYPOT_FIELDS', default='_hm_website', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+CONTACT_SPAM_MIN_SECONDS = config('CONTACT_SPAM_MIN_SECONDS', default=3, cast=int)  # Délai minimal affichage -> envoi
+CONTACT_SPAM_TOKEN_MAX_AGE = config('CONTACT_SPAM_TOKEN_MAX_AGE', default=86400, cast=int)  # secondes
+CONTACT_SPAM_MISSING_TOKEN_SCORE = config('CONTACT_SPAM_MISSING_TOKEN_SCORE', default=0.1, cast=float)
+CONTACT_SPAM_DUPLICATE_HISTORY = config('CONTACT_SPAM_DUPLICATE_HISTORY', default=200, cast=int)  # Empreintes par site
+CONTACT_SPAM_DUPLICATE_WEBSITES = config('CONTACT_SPAM_DUPLICATE_WEBSITES', default=1024, cast=int)
+CONTACT_SPAM_DUPLICATE_TTL = config('CONTACT_SPAM_DUPLICATE_TTL', default=3600, cast=int)  # secondes
+CONTACT_SPAM_DUPLICATE_SIMILARITY = config('CONTACT_SPAM_DUPLICATE_SIMILARITY', default=0.8, cast=float)
+CONTACT_SPAM_MODEL_RELOAD = config('CONTACT_SPAM_MODEL_RELOAD', default=300, cast=int)  # secondes
+CONTACT_SPAM_MIN_TRAINING = config('CONTACT_SPAM_MIN_TRAINING', default=20, cast=int)  # Messages par classe
+CONTACT_SPAM_TRAINING_LIMIT = config('CONTACT_SPAM_TRAINING_LIMIT', default=50000, cast=int)
+
+
+# Notifications email des nouveaux messages (outbox, voir contacts.notifications)
+CONTACT_NOTIFICATION_WORKER = config('CONTACT_NOTIFICATION_WORKER', default=False, cast=bool)  # worker en processus (sinon : send_contact_notifications --loop)
+CONTACT_NOTIFICATION_INTERVAL = config('CONTACT_NOTIFICATION_INTERVAL', default=30, cast=int)  # secondes entre deux passages
+CONTACT_NOTIFICATION_BATCH_SIZE = config('CONTACT_NOTIFICATION_BATCH_SIZE', default=100, cast=int)
+CONTACT_NOTIFICATION_MAX_ATTEMPTS = config('CONTACT_NOTIFICATION_MAX_ATTEMPTS', default=5, cast=int)
+CONTACT_NOTIFICATION_RETRY_BACKOFF = config('CONTACT_NOTIFICATION_RETRY_BACKOFF', default=60, cast=int)  # délai initial (secondes), doublé à chaque tentative
+CONTACT_NOTIFICATION_CLAIM_TIMEOUT = config('CONTACT_NOTIFICATION_CLAIM_TIMEOUT', default=600, cast=int)  # secondes
+
+
+# Remise à zéro des compteurs mensuels des abonnements (voir subscriptions.billing)
+SUBSCRIPTION_RESET_BATCH_SIZE = config('SUBSCRIPTION_RESET_BATCH_SIZE', default=10000, cast=int)  # identifiants d'abonnements par UPDATE
+SUBSCRIPTION_RESET_LOCK_TIMEOUT = config('SUBSCRIPTION_RESET_LOCK_TIMEOUT', default=600, cast=int)  # secondes
+SUBSCRIPTION_RESET_SCHEDULER = config('SUBSCRIPTION_RESET_SCHEDULER', default=False, cast=bool)  # planificateur en processus
+SUBSCRIPTION_RESET_INTERVAL = config('SUBSCRIPTION_RESET_INTERVAL', default=3600, cast=int)  # secondes
+
+
+# Cache des réponses de l'API publique des projets (secondes)
+PUBLIC_PROJECTS_CACHE_TTL = config('PUBLIC_PROJECTS_CACHE_TTL', default=300, cast=int)
+
+
+# Livraison des webhooks
+WEBHOOK_ASYNC = config('WEBHOOK_ASYNC', default=True, cast=bool)  # False = livraison dans le thread appelant
+WEBHOOK_WORKERS = config('WEBHOOK_WORKERS', default=4, cast=int)
+WEBHOOK_QUEUE_SIZE = config('WEBHOOK_QUEUE_SIZE', default=10000, cast=int)
+WEBHOOK_TIMEOUT = config('WEBHOOK_TIMEOUT', default=10, cast=int)  # secondes
+WEBHOOK_ALLOW_PRIVATE_NETWORKS = config('WEBHOOK_ALLOW_PRIVATE_NETWORKS', default=False, cast=bool)  # True : développement uniquement
+WEBHOOK_RETRY_BACKOFF = config('WEBHOOK_RETRY_BACKOFF', default=2, cast=float)  # délai initial (secondes), doublé à chaque tentative
+WEBHOOK_RETRY_WORKER = config('WEBHOOK_RETRY_WORKER', default=True, cast=bool)  # worker des nouvelles tentatives en processus
+WEBHOOK_RETRY_INTERVAL = config('WEBHOOK_RETRY_INTERVAL', default=5, cast=int)  # secondes entre deux passages
+WEBHOOK_STATS_FLUSH_INTERVAL = config('WEBHOOK_STATS_FLUSH_INTERVAL', default=5, cast=int)  # secondes, 0 = sans thread
+WEBHOOK_STATS_FLUSH_MAX_CALLS = config('WEBHOOK_STATS_FLUSH_MAX_CALLS', default=1000, cast=int)
+
+
+# Ingestion des événements analytics (tampon en mémoire + bulk_create)
+ANALYTICS_BUFFER_SIZE = config('ANALYTICS_BUFFER_SIZE', default=100000, cast=int)
+ANALYTICS_FLUSH_INTERVAL = config('ANALYTICS_FLUSH_INTERVAL', default=5, cast=int)  # secondes, 0 = sans thread
+ANALYTICS_FLUSH_BATCH_SIZE = config('ANALYTICS_FLUSH_BATCH_SIZE', default=5000, cast=int)
+ANALYTICS_OVERFLOW = config('ANALYTICS_OVERFLOW', default='drop')  # 'drop', 'block' ou 'spill'
+ANALYTICS_BLOCK_TIMEOUT = config('ANALYTICS_BLOCK_TIMEOUT', default=1, cast=float)  # secondes
+ANALYTICS_SPILL_DIR = config('ANALYTICS_SPILL_DIR', default=str(BASE_DIR / 'var' / 'analytics_spill'))
+ANALYTICS_MAX_WRITE_ATTEMPTS = config('ANALYTICS_MAX_WRITE_ATTEMPTS', default=5, cast=int)  # base indisponible
+
+# Agrégation incrémentale des événements dans DailyStats
+ANALYTICS_ROLLUP_BATCH_SIZE = config('ANALYTICS_ROLLUP_BATCH_SIZE', default=50000, cast=int)  # identifiants d'événements par fenêtre
+ANALYTICS_ROLLUP_LAG = config('ANALYTICS_ROLLUP_LAG', default=300, cast=int)  # secondes, événements récents ignorés
+ANALYTICS_ROLLUP_LOCK_TIMEOUT = config('ANALYTICS_ROLLUP_LOCK_TIMEOUT', default=600, cast=int)  # secondes
+ANALYTICS_ROLLUP_SCHEDULER = config('ANALYTICS_ROLLUP_SCHEDULER', default=False, cast=bool)  # planificateur en processus
+ANALYTICS_ROLLUP_INTERVAL = config('ANALYTICS_ROLLUP_INTERVAL', default=300, cast=int)  # secondes
+
+# Partitionnement mensuel et rétention des événements (durée par plan : HOSTMAIL_PLANS)
+ANALYTICS_PARTITIONS_AHEAD = config('ANALYTICS_PARTITIONS_AHEAD', default=3, cast=int)  # mois
+ANALYTICS_EXPIRED_PARTITIONS = config('ANALYTICS_EXPIRED_PARTITIONS', default='drop')  # 'drop' ou 'detach'
+ANALYTICS_RETENTION_CHUNK_SIZE = config('ANALYTICS_RETENTION_CHUNK_SIZE', default=5000, cast=int)
+
+# Export en flux des messages de contact
+CONTACT_EXPORT_CHUNK_SIZE = config('CONTACT_EXPORT_CHUNK_SIZE', default=2000, cast=int)  # lignes lues par paquet
+
+
+# HostMail Plans Configuration (catalogue immuable chargé au démarrage, voir subscriptions.plans)
 HOSTMAIL_PLANS = {
     'free': {
         'name': 'Free',
@@ -416,6 +524,8 @@ HOSTMAIL_PLANS = {
         'custom_domain': False,
         'white_label': False,
         'priority_support': False,
+        'analytics_retention_days': 30,
+        'api_rate_limit': '120/m',  # Requêtes publiques par site web
     },
     'pro': {
         'name': 'Pro',
@@ -430,6 +540,8 @@ HOSTMAIL_PLANS = {
         'custom_domain': False,
         'white_label': False,
         'priority_support': False,
+        'analytics_retention_days': 365,
+        'api_rate_limit': '1200/m',
     },
     'agency': {
         'name': 'Agency',
@@ -444,5 +556,7 @@ HOSTMAIL_PLANS = {
         'custom_domain': True,
         'white_label': True,
         'priority_support': True,
+        'analytics_retention_days': 730,
+        'api_rate_limit': '6000/m',
     },
 }
\ No newline at end of file
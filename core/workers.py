@@ -0,0 +1,75 @@
+"""
+Workers périodiques en processus
+
+Un PeriodicWorker exécute run_once() dans un thread d'arrière-plan toutes les
+`interval` secondes, ou dès que wake() est appelé. Les threads ne démarrent
+que dans un serveur : sous les commandes de gestion autres que runserver
+(migrate, test, commandes planifiées...), start() ne fait rien.
+"""
+import logging
+import sys
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+def background_threads_allowed():
+    """Threads d'arrière-plan : serveurs uniquement, pas pour les commandes de gestion"""
+    return not (sys.argv[0].endswith('manage.py') and 'runserver' not in sys.argv)
+
+
+class PeriodicWorker:
+    """Classe de base des workers périodiques"""
+
+    interval_setting = None
+    default_interval = 60
+    thread_name = 'periodic-worker'
+    error_message = 'Échec du worker périodique'
+
+    def __init__(self):
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    @property
+    def interval(self):
+        return getattr(settings, self.interval_setting, self.default_interval)
+
+    def run_once(self):
+        """Un passage du worker (à implémenter par les sous-classes)"""
+        raise NotImplementedError
+
+    def start(self):
+        """Démarre le thread si le processus le permet ; retourne True s'il tourne"""
+        if not background_threads_allowed():
+            return False
+        if self._thread is not None and self._thread.is_alive():
+            return True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Déclenche un passage immédiat (sans effet si le worker ne tourne pas)"""
+        if self._thread is not None:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                close_old_connections()
+                self.run_once()
+            except Exception:
+                logger.exception(self.error_message)
@@ -77,15 +77,12 @@ class SubscriptionPaymentSerializer(serializers.Serializer):
 
     def get_amount(self):
         """Calcule le montant selon le plan et la période"""
-        from django.conf import settings
+        from subscriptions.plans import get_catalog
 
-        plan = self.validated_data['plan']
+        plan = get_catalog().get(self.validated_data['plan'])
         billing_period = self.validated_data['billing_period']
 
-        plans = settings.HOSTMAIL_PLANS
-        plan_config = plans.get(plan, {})
-
         if billing_period == 'monthly':
-            return plan_config.get('price_monthly', 0)
+            return plan.price_monthly
         else:
-            return plan_config.get('price_yearly', 0)
+            return plan.price_yearly
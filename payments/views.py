@@ -65,14 +65,13 @@ class PayPalCreateOrderView(views.APIView):
             billing_period = serializer.validated_data['billing_period']
 
             # Calculer le montant
-            from django.conf import settings
-            plans = settings.HOSTMAIL_PLANS
-            plan_config = plans.get(plan, {})
+            from subscriptions.plans import get_catalog
+            plan_config = get_catalog().get(plan)
 
             if billing_period == 'monthly':
-                amount = plan_config.get('price_monthly', 0)
+                amount = plan_config.price_monthly
             else:
-                amount = plan_config.get('price_yearly', 0)
+                amount = plan_config.price_yearly
 
             # TODO: Créer la commande PayPal via l'API
             # import paypalrestsdk
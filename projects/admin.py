@@ -4,7 +4,7 @@ from .models import Category, Tag, Project, ProjectImage
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'website', 'order']
+    list_display = ['name', 'slug', 'website', 'order', 'projects_count']
     list_filter = ['website']
     search_fields = ['name', 'slug']
     prepopulated_fields = {'slug': ('name',)}
@@ -12,7 +12,7 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'color', 'website']
+    list_display = ['name', 'slug', 'color', 'website', 'projects_count']
     list_filter = ['website']
     search_fields = ['name', 'slug']
     prepopulated_fields = {'slug': ('name',)}
@@ -0,0 +1,81 @@
+"""
+Cache des réponses de l'API publique des projets
+
+Les corps JSON rendus sont mis en cache par site web et par paramètres de
+requête. Chaque site web possède un numéro de version : toute modification
+d'un projet, d'une catégorie, d'un tag ou d'une image change la version, ce
+qui rend obsolètes toutes les entrées du site sans avoir à les énumérer.
+
+Les réponses portent un ETag et un Last-Modified ; une requête conditionnelle
+valide reçoit un 304 sans aucune sérialisation.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, urlencode
+from rest_framework.renderers import JSONRenderer
+
+VERSION_KEY = 'hostmail:public-projects:version:%s'
+ENTRY_KEY = 'hostmail:public-projects:%s:%s:%s'
+
+
+def _get_version(website_id):
+    """Version courante du cache d'un site web"""
+    key = VERSION_KEY % website_id
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_public_projects(website_id):
+    """Invalide toutes les réponses publiques en cache d'un site web"""
+    if website_id:
+        cache.set(VERSION_KEY % website_id, time.time_ns(), None)
+
+
+def _entry_key(request, website_id, version):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    return ENTRY_KEY % (website_id, version, digest)
+
+
+def get_public_entry(request, website_id, build):
+    """
+    Retourne l'entrée en cache pour la requête, en la construisant si besoin.
+    build() retourne les données à sérialiser (peut lever Http404).
+    """
+    key = _entry_key(request, website_id, _get_version(website_id))
+    entry = cache.get(key)
+    if entry is None:
+        data = build()
+        body = JSONRenderer().render(data)
+        entry = {
+            'body': body,
+            'etag': '"%s"' % hashlib.md5(body).hexdigest(),
+            'last_modified': int(time.time()),
+            'object_id': data.get('id') if isinstance(data, dict) else None,
+        }
+        cache.set(key, entry, getattr(settings, 'PUBLIC_PROJECTS_CACHE_TTL', 300))
+    return entry
+
+
+def entry_response(request, entry):
+    """Construit la réponse HTTP (304 si la requête conditionnelle est satisfaite)"""
+    not_modified = get_conditional_response(
+        request,
+        etag=entry['etag'],
+        last_modified=entry['last_modified'],
+    )
+    if not_modified is None:
+        response = HttpResponse(entry['body'], content_type='application/json')
+    else:
+        response = not_modified
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
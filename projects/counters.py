@@ -0,0 +1,78 @@
+"""
+Agrégation en mémoire des vues de projets
+
+Les vues sont accumulées par processus puis écrites par lots :
+- UPDATE projects SET views_count = views_count + n (une requête par valeur de n)
+- DailyStats.projects_views incrémenté par (site web, jour)
+
+Le flush est déclenché toutes les PROJECT_VIEWS_FLUSH_INTERVAL secondes ou dès
+que PROJECT_VIEWS_FLUSH_MAX_HITS vues sont en attente (voir core.buffers).
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.buffers import BufferedWriter
+
+
+class ViewCounter(BufferedWriter):
+    """Compteur de vues bufferisé, thread-safe"""
+
+    interval_setting = 'PROJECT_VIEWS_FLUSH_INTERVAL'
+    max_pending_setting = 'PROJECT_VIEWS_FLUSH_MAX_HITS'
+    thread_name = 'project-views-flusher'
+
+    def reset(self):
+        self._projects = defaultdict(int)
+        self._daily = defaultdict(int)
+
+    def snapshot(self):
+        return self._projects, self._daily
+
+    def merge(self, batch):
+        projects, daily = batch
+        for project_id, count in projects.items():
+            self._projects[project_id] += count
+        for key, count in daily.items():
+            self._daily[key] += count
+
+    def record(self, project_id, website_id):
+        """Enregistre une vue (aucune requête SQL)"""
+        with self._lock:
+            self._projects[project_id] += 1
+            self._daily[(website_id, timezone.localdate())] += 1
+            self._pending += 1
+        self.added()
+
+    def write(self, batch):
+        from analytics.models import DailyStats
+        from .models import Project
+
+        projects, daily = batch
+
+        # Regrouper les projets par incrément pour limiter le nombre d'UPDATE
+        by_increment = defaultdict(list)
+        for project_id, count in projects.items():
+            by_increment[count].append(project_id)
+
+        with transaction.atomic():
+            for count, project_ids in by_increment.items():
+                Project.objects.filter(pk__in=project_ids).update(views_count=F('views_count') + count)
+
+            for (website_id, date), count in daily.items():
+                updated = DailyStats.objects.filter(website_id=website_id, date=date).update(
+                    projects_views=F('projects_views') + count
+                )
+                if not updated:
+                    try:
+                        with transaction.atomic():
+                            DailyStats.objects.create(website_id=website_id, date=date, projects_views=count)
+                    except IntegrityError:
+                        DailyStats.objects.filter(website_id=website_id, date=date).update(
+                            projects_views=F('projects_views') + count
+                        )
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,154 @@
+"""
+Compteurs dénormalisés des projets
+
+- Category.projects_count / Tag.projects_count : projets publiés ;
+- Website.total_projects : tous les projets du site (limite du plan).
+
+Ils sont tenus à jour dans la transaction de l'écriture, par des UPDATE
+relatifs (F() + delta) :
+- Project.save() : création, changement de statut (publish / archive) ou de
+  catégorie d'un projet publié ;
+- suppression d'un projet (signaux pre_delete / post_delete) ;
+- modification des tags d'un projet (signal m2m_changed, dans les deux sens).
+
+Les écritures qui contournent l'ORM (QuerySet.update, SQL brut) peuvent créer
+un écart : la commande reconcile_project_counts recalcule tout en bloc.
+
+Les réponses publiques en cache (projects.cache) contiennent projects_count :
+tout changement de ces compteurs change la version du cache du site, après
+le commit (une réponse reconstruite avant le commit serait déjà périmée).
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from websites.models import Website
+from .cache import invalidate_public_projects
+from .models import Category, Tag, Project, published_projects_count
+
+PUBLISHED = 'published'
+
+
+def _invalidate_after_commit(website_ids):
+    """Change la version du cache public des sites après le commit de la transaction"""
+    for website_id in set(website_ids):
+        transaction.on_commit(lambda website_id=website_id: invalidate_public_projects(website_id))
+
+
+def _shift_published(website_id, category_id, tags, delta):
+    """Ajoute delta au compteur de la catégorie et des tags (ids) d'un site web"""
+    if category_id:
+        Category.objects.filter(pk=category_id).update(projects_count=F('projects_count') + delta)
+    if tags:
+        Tag.objects.filter(pk__in=tags).update(projects_count=F('projects_count') + delta)
+    if category_id or tags:
+        _invalidate_after_commit([website_id])
+
+
+def _tag_ids(project_id):
+    return list(Project.tags.through.objects.filter(project_id=project_id).values_list('tag_id', flat=True))
+
+
+def project_saved(project_id, website_id, previous, current):
+    """
+    Applique la sauvegarde d'un projet aux compteurs
+    previous / current : (statut, catégorie) avant et après, previous None pour une création
+    """
+    status, category_id = current
+    if previous is None:
+        Website.objects.filter(pk=website_id).update(total_projects=F('total_projects') + 1)
+        if status == PUBLISHED:
+            _shift_published(website_id, category_id, [], 1)
+        return
+
+    old_status, old_category_id = previous
+    was_published = old_status == PUBLISHED
+    is_published = status == PUBLISHED
+    if was_published and is_published:
+        if old_category_id != category_id:
+            _shift_published(website_id, old_category_id, [], -1)
+            _shift_published(website_id, category_id, [], 1)
+    elif was_published:
+        _shift_published(website_id, old_category_id, _tag_ids(project_id), -1)
+    elif is_published:
+        _shift_published(website_id, category_id, _tag_ids(project_id), 1)
+
+
+def project_deleting(project):
+    """Avant suppression : mémorise les tags (les liaisons sont supprimées avant le projet)"""
+    if project.status == PUBLISHED:
+        project._counted_tag_ids = _tag_ids(project.pk)
+
+
+def project_deleted(project):
+    """Après suppression : décrémente le site web, la catégorie et les tags"""
+    Website.objects.filter(pk=project.website_id).update(total_projects=F('total_projects') - 1)
+    if project.status == PUBLISHED:
+        _shift_published(project.website_id, project.category_id, getattr(project, '_counted_tag_ids', []), -1)
+
+
+def tags_changing(instance, action, reverse, pk_set):
+    """
+    Avant modification des tags : mémorise les liaisons réellement retirées
+    (pk_set de remove contient aussi les ids non liés)
+    """
+    through = Project.tags.through.objects
+    if reverse:
+        links = through.filter(tag_id=instance.pk)
+        if action == 'pre_remove':
+            links = links.filter(project_id__in=pk_set)
+        instance._counted_links = list(links.filter(project__status=PUBLISHED).values_list('project_id', flat=True))
+    elif instance.status == PUBLISHED:
+        links = through.filter(project_id=instance.pk)
+        if action == 'pre_remove':
+            links = links.filter(tag_id__in=pk_set)
+        instance._counted_links = list(links.values_list('tag_id', flat=True))
+    else:
+        instance._counted_links = []
+
+
+def tags_changed(instance, action, reverse, pk_set):
+    """Après modification des tags d'un projet (ou des projets d'un tag)"""
+    if action == 'post_add':
+        if reverse:
+            added = Project.objects.filter(pk__in=pk_set, status=PUBLISHED).count()
+            if added:
+                _shift_published(instance.website_id, None, [instance.pk], added)
+        elif instance.status == PUBLISHED:
+            _shift_published(instance.website_id, None, pk_set, 1)
+        return
+
+    removed = getattr(instance, '_counted_links', [])
+    instance._counted_links = []
+    if reverse:
+        if removed:
+            _shift_published(instance.website_id, None, [instance.pk], -len(removed))
+    else:
+        _shift_published(instance.website_id, None, removed, -1)
+
+
+def reconcile(website_ids=None):
+    """
+    Recalcule en bloc les compteurs qui ont dérivé (un UPDATE par table, limité
+    aux lignes en écart) ; retourne le nombre de lignes corrigées par table
+    """
+    total_projects = Coalesce(Subquery(
+        Project.objects.filter(website_id=OuterRef('pk')).order_by().values('website_id')
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+    targets = [
+        ('categories', Category, 'projects_count', published_projects_count('category'), 'website_id'),
+        ('tags', Tag, 'projects_count', published_projects_count('tags'), 'website_id'),
+        ('websites', Website, 'total_projects', total_projects, 'pk'),
+    ]
+
+    fixed = {}
+    for name, model, field, actual, website_field in targets:
+        queryset = model.objects.all()
+        if website_ids:
+            queryset = queryset.filter(**{f'{website_field}__in': website_ids})
+        drifted = queryset.annotate(actual=actual).exclude(**{field: F('actual')})
+        if field == 'projects_count':
+            _invalidate_after_commit(drifted.values_list('website_id', flat=True))
+        fixed[name] = drifted.update(**{field: actual})
+    return fixed
@@ -0,0 +1,27 @@
+"""
+Recalcul des compteurs de projets dénormalisés
+
+Usage: python manage.py reconcile_project_counts [--website 12]
+
+Corrige en bloc Category.projects_count, Tag.projects_count et
+Website.total_projects (écarts dus aux écritures hors ORM, voir projects.counts).
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from projects.counts import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs de projets des catégories, des tags et des sites web"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--website', type=int, action='append', dest='websites',
+                            help='Limiter le recalcul à ce site web (répétable)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = reconcile(website_ids=options['websites'])
+        for name, rows in fixed.items():
+            self.stdout.write(f'{name} : {rows} compteur(s) corrigé(s)')
+        self.stdout.write(self.style.SUCCESS('Compteurs de projets à jour'))
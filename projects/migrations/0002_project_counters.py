@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:04
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    """Initialise les compteurs à partir des projets existants"""
+    Project = apps.get_model('projects', 'Project')
+    published = Project.objects.filter(status='published')
+    apps.get_model('projects', 'Category').objects.update(projects_count=_count(published, 'category'))
+    apps.get_model('projects', 'Tag').objects.update(projects_count=_count(published, 'tags'))
+    apps.get_model('websites', 'Website').objects.update(total_projects=_count(Project.objects.all(), 'website'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+        ('websites', '0002_website_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='projects_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Projets publiés'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='projects_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Projets publiés'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
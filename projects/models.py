@@ -1,9 +1,22 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 from django.utils.text import slugify
 from websites.models import Website
 
 
+def published_projects_count(relation):
+    """
+    Nombre réel de projets publiés d'une catégorie (relation='category') ou d'un
+    tag (relation='tags') : sous-requête corrélée à annoter ou à écrire en bloc
+    (recalcul des compteurs, voir projects.counts)
+    """
+    projects = Project.objects.filter(
+        status='published', **{relation: models.OuterRef('pk')}
+    ).order_by().values(relation).annotate(total=models.Count('pk')).values('total')
+    return Coalesce(models.Subquery(projects), 0)
+
+
 class Category(models.Model):
     """Modèle pour les catégories de projets"""
 
@@ -31,6 +44,13 @@ class Category(models.Model):
         verbose_name=_("Ordre")
     )
 
+    # Projets publiés (tenu à jour par projects.counts)
+    projects_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_("Projets publiés")
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -75,6 +95,13 @@ class Tag(models.Model):
         help_text=_("Code hexadécimal (ex: #3B82F6)")
     )
 
+    # Projets publiés (tenu à jour par projects.counts)
+    projects_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_("Projets publiés")
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -250,12 +277,53 @@ class Project(models.Model):
             from django.utils import timezone
             self.published_at = timezone.now()
 
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        previous = self._counted_state()
+        if previous is not None and update_fields is not None:
+            # Seuls les champs sauvegardés changent en base
+            update_fields = set(update_fields)
+            current = (
+                self.status if 'status' in update_fields else previous[0],
+                self.category_id if update_fields & {'category', 'category_id'} else previous[1],
+            )
+        else:
+            current = (self.status, self.category_id)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            from .counts import project_saved
+            project_saved(self.pk, self.website_id, previous, current)
+        self._counted = current
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._counted = (instance.__dict__.get('status'), instance.__dict__.get('category_id'))
+        return instance
+
+    def _counted_state(self):
+        """(statut, catégorie) enregistrés en base avant la sauvegarde, None pour une création"""
+        counted = getattr(self, '_counted', None)
+        if counted is not None and counted[0] is not None:
+            return counted
+        if self.pk is None:
+            return None
+        return Project.objects.filter(pk=self.pk).values_list('status', 'category_id').first()
+
+    def publish(self):
+        """Publie le projet"""
+        self.status = 'published'
+        self.save()
+
+    def archive(self):
+        """Archive le projet"""
+        self.status = 'archived'
+        self.save()
 
     def increment_views(self):
         """Incrémente le compteur de vues"""
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+        Project.objects.filter(pk=self.pk).update(views_count=models.F('views_count') + 1)
+        self.refresh_from_db(fields=['views_count'])
 
 
 class ProjectImage(models.Model):
@@ -1,27 +1,23 @@
 from rest_framework import serializers
+from subscriptions.entitlements import get_entitlements
 from .models import Category, Tag, Project, ProjectImage
 
 
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer pour les catégories de projets"""
 
-    projects_count = serializers.SerializerMethodField()
-
     class Meta:
         model = Category
         fields = [
             'id', 'website', 'name', 'slug', 'description', 'order',
             'projects_count', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['slug', 'created_at', 'updated_at']
-
-    def get_projects_count(self, obj):
-        return obj.projects.filter(status='published').count()
+        read_only_fields = ['slug', 'projects_count', 'created_at', 'updated_at']
 
     def validate_website(self, value):
         """Vérifie que l'utilisateur possède ce site web"""
         request = self.context.get('request')
-        if request and value.user != request.user:
+        if request and value.user_id != request.user.pk:
             raise serializers.ValidationError("Ce site web ne vous appartient pas.")
         return value
 
@@ -29,23 +25,18 @@ class CategorySerializer(serializers.ModelSerializer):
 class TagSerializer(serializers.ModelSerializer):
     """Serializer pour les tags de projets"""
 
-    projects_count = serializers.SerializerMethodField()
-
     class Meta:
         model = Tag
         fields = [
             'id', 'website', 'name', 'slug', 'color',
             'projects_count', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['slug', 'created_at', 'updated_at']
-
-    def get_projects_count(self, obj):
-        return obj.projects.filter(status='published').count()
+        read_only_fields = ['slug', 'projects_count', 'created_at', 'updated_at']
 
     def validate_website(self, value):
         """Vérifie que l'utilisateur possède ce site web"""
         request = self.context.get('request')
-        if request and value.user != request.user:
+        if request and value.user_id != request.user.pk:
             raise serializers.ValidationError("Ce site web ne vous appartient pas.")
         return value
 
@@ -92,7 +83,7 @@ class ProjectSerializer(serializers.ModelSerializer):
     def validate_website(self, value):
         """Vérifie que l'utilisateur possède ce site web"""
         request = self.context.get('request')
-        if request and value.user != request.user:
+        if request and value.user_id != request.user.pk:
             raise serializers.ValidationError("Ce site web ne vous appartient pas.")
         return value
 
@@ -110,10 +101,10 @@ class ProjectSerializer(serializers.ModelSerializer):
         if request and not self.instance:  # Création uniquement
             website = attrs.get('website')
             if website:
-                subscription = request.user.subscription
-                if not subscription.can_add_project(website):
+                entitlements = get_entitlements(request)
+                if not entitlements.can_add_project(website):
                     raise serializers.ValidationError(
-                        f"Limite de projets atteinte ({subscription.projects_limit}). "
+                        f"Limite de projets atteinte ({entitlements.projects_limit}). "
                         f"Passez à un plan supérieur pour créer plus de projets."
                     )
 
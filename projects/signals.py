@@ -0,0 +1,67 @@
+"""
+Signals pour l'invalidation du cache de l'API publique des projets
+et la tenue des compteurs de projets (voir projects.counts)
+"""
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from . import counts
+from .cache import invalidate_public_projects
+from .models import Category, Tag, Project, ProjectImage
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_website_projects(sender, instance, **kwargs):
+    """
+    Invalide le cache public du site web de l'objet modifié
+    """
+    invalidate_public_projects(instance.website_id)
+
+
+@receiver(post_save, sender=ProjectImage)
+@receiver(post_delete, sender=ProjectImage)
+def invalidate_project_image(sender, instance, **kwargs):
+    """
+    Invalide le cache public lors de la modification d'une image de projet
+    """
+    website_id = Project.objects.filter(pk=instance.project_id).values_list('website_id', flat=True).first()
+    invalidate_public_projects(website_id)
+
+
+@receiver(m2m_changed, sender=Project.tags.through)
+def invalidate_project_tags(sender, instance, action, **kwargs):
+    """
+    Invalide le cache public lors de la modification des tags d'un projet
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # instance est un Project (ou un Tag si la relation est modifiée côté tag)
+    invalidate_public_projects(instance.website_id)
+
+
+@receiver(pre_delete, sender=Project)
+def project_deleting(sender, instance, **kwargs):
+    counts.project_deleting(instance)
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    """
+    Décrémente les compteurs du projet supprimé
+    """
+    counts.project_deleted(instance)
+
+
+@receiver(m2m_changed, sender=Project.tags.through)
+def count_project_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Met à jour le nombre de projets publiés des tags ajoutés ou retirés
+    """
+    if action in ('pre_remove', 'pre_clear'):
+        counts.tags_changing(instance, action, reverse, pk_set)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        counts.tags_changed(instance, action, reverse, pk_set)
@@ -1,3 +1,294 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+from analytics.ingestion import analytics_buffer
+from analytics.models import DailyStats
+from websites.cache import clear_local_cache
+from websites.models import Website
+from .counters import view_counter
+from .counts import reconcile
+from .models import Category, Project, Tag
+
+User = get_user_model()
+
+
+class PublicProjectsTestMixin:
+    """Données communes aux tests de l'API publique des projets"""
+
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        view_counter.discard()
+        analytics_buffer.discard()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+        self.project = Project.objects.create(
+            website=self.website,
+            title='Portfolio',
+            description='Description',
+            status='published'
+        )
+
+    def get(self, url, **extra):
+        return self.client.get(url, HTTP_X_API_KEY=self.website.api_key, **extra)
+
+
+@override_settings(PROJECT_VIEWS_FLUSH_INTERVAL=0, PROJECT_VIEWS_FLUSH_MAX_HITS=1000, ANALYTICS_FLUSH_INTERVAL=0)
+class ProjectViewCounterTests(PublicProjectsTestMixin, TestCase):
+    """Tests pour le compteur de vues bufferisé"""
+
+    def test_detail_view_is_read_only(self):
+        """Test que la consultation d'un projet n'écrit pas en base"""
+        self.get(f'/api/public/projects/{self.project.slug}/')
+        with self.assertNumQueries(0):
+            view_counter.record(self.project.id, self.website.id)
+        self.assertEqual(view_counter.pending(), 2)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.views_count, 0)
+
+    def test_flush_updates_project_and_daily_stats(self):
+        """Test que le flush écrit les vues dans Project et DailyStats"""
+        for _ in range(3):
+            self.get(f'/api/public/projects/{self.project.slug}/')
+        self.assertEqual(view_counter.flush(), 3)
+
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.views_count, 3)
+        stats = DailyStats.objects.get(website=self.website, date=timezone.localdate())
+        self.assertEqual(stats.projects_views, 3)
+
+        self.get(f'/api/public/projects/{self.project.slug}/')
+        view_counter.flush()
+        stats.refresh_from_db()
+        self.assertEqual(stats.projects_views, 4)
+
+    @override_settings(PROJECT_VIEWS_FLUSH_MAX_HITS=2)
+    def test_flush_on_threshold(self):
+        """Test que le seuil de vues déclenche le flush"""
+        self.get(f'/api/public/projects/{self.project.slug}/')
+        self.get(f'/api/public/projects/{self.project.slug}/')
+        self.assertEqual(view_counter.pending(), 0)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.views_count, 2)
+
+
+@override_settings(PROJECT_VIEWS_FLUSH_INTERVAL=0, PROJECT_VIEWS_FLUSH_MAX_HITS=1000, ANALYTICS_FLUSH_INTERVAL=0)
+class PublicProjectsCacheTests(PublicProjectsTestMixin, TestCase):
+    """Tests pour le cache des réponses de l'API publique"""
+
+    def test_list_cached_with_etag(self):
+        """Test que la liste est servie depuis le cache avec un ETag"""
+        response = self.get('/api/public/projects/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            cached = self.get('/api/public/projects/')
+        self.assertEqual(cached.content, response.content)
+
+    def test_not_modified(self):
+        """Test qu'une requête conditionnelle valide renvoie 304"""
+        etag = self.get('/api/public/projects/')['ETag']
+        response = self.get('/api/public/projects/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        detail_etag = self.get(f'/api/public/projects/{self.project.slug}/')['ETag']
+        response = self.get(f'/api/public/projects/{self.project.slug}/', HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 304)
+        # Seule la réponse complète compte comme une vue
+        self.assertEqual(view_counter.pending(), 1)
+
+    def test_project_save_invalidates(self):
+        """Test que la modification d'un projet invalide le cache"""
+        etag = self.get('/api/public/projects/')['ETag']
+        self.project.title = 'Nouveau titre'
+        self.project.save()
+
+        response = self.get('/api/public/projects/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['title'], 'Nouveau titre')
+
+    def test_tags_change_invalidates(self):
+        """Test que la modification des tags d'un projet invalide le cache"""
+        from .models import Tag
+        tag = Tag.objects.create(website=self.website, name='Django')
+        self.get('/api/public/projects/')
+        self.project.tags.add(tag)
+
+        response = self.get('/api/public/projects/')
+        self.assertEqual(response.json()['results'][0]['tags_data'][0]['name'], 'Django')
+
+    def test_counts_change_invalidates(self):
+        """Test que la correction des compteurs (projects_count) invalide le cache après le commit"""
+        tag = Tag.objects.create(website=self.website, name='Django')
+        self.project.tags.add(tag)
+        Tag.objects.filter(pk=tag.pk).update(projects_count=5)
+        self.assertEqual(self.get('/api/public/projects/').json()['results'][0]['tags_data'][0]['projects_count'], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reconcile()
+        response = self.get('/api/public/projects/')
+        self.assertEqual(response.json()['results'][0]['tags_data'][0]['projects_count'], 1)
+
+    def test_unknown_project(self):
+        """Test qu'un projet inexistant renvoie 404"""
+        response = self.get('/api/public/projects/inconnu/')
+        self.assertEqual(response.status_code, 404)
+
+
+class ProjectCountsQueryTests(PublicProjectsTestMixin, TestCase):
+    """Tests du nombre de requêtes des listes (projects_count sans N+1)"""
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(website=self.website, name='Web')
+        self.project.category = self.category
+        self.project.save()
+        self.tags = [Tag.objects.create(website=self.website, name=f'Tag {i}') for i in range(3)]
+        self.project.tags.set(self.tags)
+        self.client.force_authenticate(self.user)
+
+    def add_projects(self, count):
+        for index in range(count):
+            project = Project.objects.create(
+                website=self.website, title=f'Projet {index}', description='Description',
+                category=self.category, status='published' if index % 2 else 'draft'
+            )
+            project.tags.set(self.tags)
+
+    def count_queries(self, url, **extra):
+        cache.clear()
+        clear_local_cache()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_list_endpoints_constant_queries(self):
+        """Test que le nombre de requêtes ne dépend pas du nombre de projets ni de tags"""
+        urls = [
+            ('/api/v1/projects/projects/', {}),
+            ('/api/v1/projects/tags/', {}),
+            ('/api/v1/projects/categories/', {}),
+            ('/api/public/projects/', {'HTTP_X_API_KEY': self.website.api_key}),
+        ]
+        before = {url: self.count_queries(url, **extra)[0] for url, extra in urls}
+        self.add_projects(6)
+        for url, extra in urls:
+            self.assertEqual(self.count_queries(url, **extra)[0], before[url], url)
+
+    def test_projects_count_values(self):
+        """Test que les compteurs ne comptent que les projets publiés"""
+        self.add_projects(4)
+        _, data = self.count_queries('/api/v1/projects/tags/')
+        results = data['results'] if isinstance(data, dict) else data
+        self.assertEqual({tag['projects_count'] for tag in results}, {3})
+
+        _, data = self.count_queries('/api/v1/projects/categories/')
+        results = data['results'] if isinstance(data, dict) else data
+        self.assertEqual(results[0]['projects_count'], 3)
+
+        _, data = self.count_queries('/api/public/projects/', HTTP_X_API_KEY=self.website.api_key)
+        self.assertEqual(data['results'][0]['tags_data'][0]['projects_count'], 3)
+
+
+class ProjectCountersTests(PublicProjectsTestMixin, TestCase):
+    """Tests des compteurs dénormalisés (projects.counts)"""
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(website=self.website, name='Web')
+        self.other_category = Category.objects.create(website=self.website, name='Mobile')
+        self.tag = Tag.objects.create(website=self.website, name='Django')
+        self.other_tag = Tag.objects.create(website=self.website, name='React')
+        self.draft = Project.objects.create(
+            website=self.website, title='Brouillon', description='Description', category=self.category
+        )
+        self.draft.tags.set([self.tag, self.other_tag])
+
+    def assertCounts(self, category, tag, other_tag, total):
+        self.category.refresh_from_db()
+        self.tag.refresh_from_db()
+        self.other_tag.refresh_from_db()
+        self.website.refresh_from_db()
+        self.assertEqual(
+            (self.category.projects_count, self.tag.projects_count,
+             self.other_tag.projects_count, self.website.total_projects),
+            (category, tag, other_tag, total)
+        )
+
+    def test_publish_archive_delete(self):
+        """Test des transitions de statut et de la suppression"""
+        self.assertCounts(0, 0, 0, 2)
+        self.draft.publish()
+        self.assertCounts(1, 1, 1, 2)
+        self.draft.publish()
+        self.assertCounts(1, 1, 1, 2)
+        self.draft.archive()
+        self.assertCounts(0, 0, 0, 2)
+
+        self.draft.publish()
+        Project.objects.get(pk=self.draft.pk).delete()
+        self.assertCounts(0, 0, 0, 1)
+
+    def test_category_change(self):
+        """Test du changement de catégorie d'un projet publié"""
+        self.draft.publish()
+        self.draft.category = self.other_category
+        self.draft.save(update_fields=['category'])
+        self.other_category.refresh_from_db()
+        self.assertEqual(self.other_category.projects_count, 1)
+        self.assertCounts(0, 1, 1, 2)
+
+    def test_update_fields_without_status(self):
+        """Test qu'un statut modifié mais non sauvegardé ne change pas les compteurs"""
+        project = Project.objects.get(pk=self.draft.pk)
+        project.status = 'published'
+        project.save(update_fields=['title'])
+        self.assertCounts(0, 0, 0, 2)
+
+    def test_tags_changes(self):
+        """Test des ajouts et retraits de tags, dans les deux sens"""
+        self.draft.publish()
+        self.draft.tags.remove(self.other_tag, Tag.objects.create(website=self.website, name='Vue'))
+        self.assertCounts(1, 1, 0, 2)
+        self.draft.tags.clear()
+        self.assertCounts(1, 0, 0, 2)
+
+        self.tag.projects.add(self.project, self.draft)
+        self.assertCounts(1, 2, 0, 2)
+        self.tag.projects.remove(self.draft)
+        self.assertCounts(1, 1, 0, 2)
+        self.tag.projects.clear()
+        self.assertCounts(1, 0, 0, 2)
+
+    def test_reconcile(self):
+        """Test que la commande corrige les écarts en bloc"""
+        self.draft.publish()
+        Project.objects.filter(pk=self.draft.pk).update(status='draft')
+        Tag.objects.filter(pk=self.tag.pk).update(projects_count=7)
+
+        call_command('reconcile_project_counts', stdout=StringIO())
+        self.assertCounts(0, 0, 0, 2)
+        self.assertEqual(reconcile(), {'categories': 0, 'tags': 0, 'websites': 0})
+
+    def test_can_add_project_reads_counter(self):
+        """Test que la limite de projets lit la colonne total_projects"""
+        subscription = self.user.subscription
+        subscription.projects_limit = 3
+        self.website.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertTrue(subscription.can_add_project(self.website))
+        Project.objects.create(website=self.website, title='Troisième', description='Description')
+        self.website.refresh_from_db()
+        self.assertFalse(subscription.can_add_project(self.website))
@@ -1,10 +1,12 @@
-from rest_framework import viewsets, status, views
+from rest_framework import viewsets, views
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
+from analytics import track
 from core.permissions import IsWebsiteOwner
-from websites.models import Website
+from .cache import get_public_entry, entry_response
+from .counters import view_counter
 from .models import Category, Tag, Project, ProjectImage
 from .serializers import (
     CategorySerializer,
@@ -77,8 +79,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
     def publish(self, request, pk=None):
         """Publie un projet"""
         project = self.get_object()
-        project.status = 'published'
-        project.save()
+        project.publish()
 
         return Response({
             'message': 'Projet publié avec succès',
@@ -89,8 +90,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
     def archive(self, request, pk=None):
         """Archive un projet"""
         project = self.get_object()
-        project.status = 'archived'
-        project.save()
+        project.archive()
 
         return Response({
             'message': 'Projet archivé avec succès',
@@ -126,21 +126,27 @@ class ProjectPublicView(views.APIView):
     """
     Vue publique pour récupérer les projets publiés
     Nécessite une API key valide
+    Les réponses sont mises en cache par site web et paramètres (ETag / Last-Modified)
     """
 
     permission_classes = [AllowAny]
 
     def get(self, request):
         """Liste les projets publiés d'un site web"""
-        website = request.website  # Injecté par le middleware
+        website_id = request.website_snapshot.id  # Injecté par le middleware
+
+        entry = get_public_entry(request, website_id, lambda: self.build_data(request, website_id))
+        return entry_response(request, entry)
 
+    def build_data(self, request, website_id):
+        """Sérialise la liste des projets publiés"""
         # Filtres
         category_slug = request.query_params.get('category')
         tag_slug = request.query_params.get('tag')
         featured_only = request.query_params.get('featured') == 'true'
 
         queryset = Project.objects.filter(
-            website=website,
+            website_id=website_id,
             status='published'
         ).select_related('category').prefetch_related('tags', 'images')
 
@@ -151,36 +157,43 @@ class ProjectPublicView(views.APIView):
         if featured_only:
             queryset = queryset.filter(is_featured=True)
 
-        serializer = ProjectPublicSerializer(queryset, many=True)
-        return Response({
-            'count': queryset.count(),
-            'results': serializer.data
-        })
+        results = ProjectPublicSerializer(queryset, many=True).data
+        return {
+            'count': len(results),
+            'results': results
+        }
 
 
 class ProjectPublicDetailView(views.APIView):
     """
     Vue publique pour récupérer un projet spécifique par son slug
     Nécessite une API key valide
+    Les réponses sont mises en cache par site web (ETag / Last-Modified)
     """
 
     permission_classes = [AllowAny]
 
     def get(self, request, slug):
         """Récupère un projet par son slug"""
-        website = request.website  # Injecté par le middleware
+        website_id = request.website_snapshot.id  # Injecté par le middleware
+
+        entry = get_public_entry(request, website_id, lambda: self.build_data(website_id, slug))
+        response = entry_response(request, entry)
 
+        # Une revalidation du navigateur (304) n'est pas une nouvelle vue
+        if response.status_code == 200:
+            # Compteur de vues bufferisé, écrit par lots
+            view_counter.record(entry['object_id'], website_id)
+            track(website_id, 'project_viewed', request, {'project_id': entry['object_id'], 'slug': slug})
+
+        return response
+
+    def build_data(self, website_id, slug):
+        """Sérialise un projet publié"""
         project = get_object_or_404(
-            Project,
-            website=website,
+            Project.objects.select_related('category').prefetch_related('tags', 'images'),
+            website_id=website_id,
             slug=slug,
             status='published'
         )
-
-        # Incrémenter le compteur de vues
-        project.increment_views()
-
-        # TODO: Logger l'événement analytics
-
-        serializer = ProjectPublicSerializer(project)
-        return Response(serializer.data)
+        return ProjectPublicSerializer(project).data
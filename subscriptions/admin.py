@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Subscription
+from .models import CounterResetRun, Subscription
 
 
 @admin.register(Subscription)
@@ -7,7 +7,7 @@ class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ['user', 'plan', 'billing_period', 'status', 'started_at', 'expires_at']
     list_filter = ['plan', 'status', 'billing_period']
     search_fields = ['user__email', 'user__username']
-    readonly_fields = ['created_at', 'updated_at','started_at', ]
+    readonly_fields = ['effective_limits', 'created_at', 'updated_at','started_at', ]
     fieldsets = (
         ('Utilisateur', {
             'fields': ('user',)
@@ -16,14 +16,8 @@ class SubscriptionAdmin(admin.ModelAdmin):
             'fields': ('plan', 'billing_period', 'status')
         }),
         ('Limites', {
-            'fields': (
-                'websites_limit', 'contacts_per_month', 'projects_limit', 'storage_mb'
-            )
-        }),
-        ('Fonctionnalités', {
-            'fields': (
-                'analytics', 'integrations', 'custom_domain', 'white_label', 'priority_support'
-            )
+            'fields': ('effective_limits', 'limit_overrides'),
+            'description': 'Limites du plan (catalogue) ; les exceptions ne listent que les valeurs modifiées.'
         }),
         ('Utilisation', {
             'fields': ('current_month_contacts', 'current_storage_mb')
@@ -32,3 +26,14 @@ class SubscriptionAdmin(admin.ModelAdmin):
             'fields': ('expires_at', 'cancelled_at', 'created_at', 'updated_at')
         }),
     )
+
+    @admin.display(description='Limites effectives')
+    def effective_limits(self, obj):
+        return ', '.join(f'{name} = {value}' for name, value in obj.limits.items())
+
+
+@admin.register(CounterResetRun)
+class CounterResetRunAdmin(admin.ModelAdmin):
+    list_display = ['as_of', 'last_subscription_id', 'high_subscription_id', 'reset_count', 'completed_at']
+    readonly_fields = ['as_of', 'last_subscription_id', 'high_subscription_id', 'reset_count', 'completed_at',
+                       'created_at', 'updated_at']
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class SubscriptionsConfig(AppConfig):
@@ -7,3 +8,10 @@ class SubscriptionsConfig(AppConfig):
 
     def ready(self):
         import subscriptions.signals  # noqa
+        from .plans import load_catalog
+        load_catalog()
+
+        # Remise à zéro planifiée des compteurs mensuels (serveurs uniquement, voir core.workers)
+        if getattr(settings, 'SUBSCRIPTION_RESET_SCHEDULER', False):
+            from .billing import scheduler
+            scheduler.start()
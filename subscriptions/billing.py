@@ -0,0 +1,114 @@
+"""
+Remise à zéro des compteurs mensuels des abonnements
+
+Chaque abonnement suit son propre cycle : la période commence chaque mois au
+jour anniversaire de started_at (billing_anchor_day, ramené au dernier jour
+des mois plus courts), à minuit dans le fuseau TIME_ZONE. Un abonnement est
+dû si counters_reset_at précède le début de sa période en cours.
+
+Un passage (CounterResetRun) parcourt les abonnements par fenêtres de
+SUBSCRIPTION_RESET_BATCH_SIZE identifiants. Chaque fenêtre est traitée par un seul
+UPDATE ensembliste (début de période calculé par un CASE sur le jour
+anniversaire), dans la même transaction que l'avancement du point de
+reprise. Un passage interrompu reprend à la fenêtre suivante, avec la même
+date de référence ; rejouer une fenêtre est sans effet.
+
+Un seul passage par jour suffit : les périodes ne commencent qu'à minuit.
+"""
+import calendar
+import logging
+from datetime import datetime, time as dt_time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Max, Value, When
+from django.utils import timezone
+
+from core.workers import PeriodicWorker
+from .models import CounterResetRun, Subscription
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'hostmail:subscription-reset:lock'
+
+
+def period_start(anchor_day, as_of):
+    """Début (aware) de la période en cours à la date as_of pour un jour anniversaire"""
+    today = timezone.localtime(as_of).date()
+    year, month = today.year, today.month
+    day = min(anchor_day, calendar.monthrange(year, month)[1])
+    if day > today.day:
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        day = min(anchor_day, calendar.monthrange(year, month)[1])
+    return timezone.make_aware(datetime.combine(today.replace(year=year, month=month, day=day), dt_time.min))
+
+
+def _period_case(as_of):
+    """Début de période de chaque ligne selon son jour anniversaire"""
+    return Case(
+        *[When(billing_anchor_day=day, then=Value(period_start(day, as_of))) for day in range(1, 32)],
+        output_field=DateTimeField(),
+    )
+
+
+def _current_run(now):
+    """Passage à reprendre, ou nouveau passage ; None si celui du jour est terminé"""
+    run = CounterResetRun.objects.order_by('-id').first()
+    if run is not None and run.completed_at is None:
+        return run
+    if run is not None and timezone.localtime(run.as_of).date() == timezone.localtime(now).date():
+        return None
+    high = Subscription.objects.aggregate(high=Max('id'))['high'] or 0
+    return CounterResetRun.objects.create(as_of=now, high_subscription_id=high)
+
+
+def run_reset(batch_size=None, now=None):
+    """
+    Remet à zéro les compteurs des abonnements dont la période a commencé.
+    Retourne le passage traité (None si aucun passage n'était nécessaire ou
+    si un autre processus est en cours).
+    """
+    batch_size = batch_size or getattr(settings, 'SUBSCRIPTION_RESET_BATCH_SIZE', 10000)
+    if not cache.add(LOCK_KEY, 1, getattr(settings, 'SUBSCRIPTION_RESET_LOCK_TIMEOUT', 600)):
+        logger.info('Remise à zéro des compteurs déjà en cours, passage ignoré')
+        return None
+
+    try:
+        run = _current_run(now or timezone.now())
+        if run is None:
+            return None
+
+        period = _period_case(run.as_of)
+        low = run.last_subscription_id
+        while low < run.high_subscription_id:
+            upper = min(low + batch_size, run.high_subscription_id)
+            with transaction.atomic():
+                reset = Subscription.objects.filter(
+                    id__gt=low, id__lte=upper, counters_reset_at__lt=period
+                ).update(current_month_contacts=0, counters_reset_at=period)
+                run.last_subscription_id = upper
+                run.reset_count += reset
+                run.save(update_fields=['last_subscription_id', 'reset_count', 'updated_at'])
+            low = upper
+
+        run.completed_at = timezone.now()
+        run.save(update_fields=['completed_at', 'updated_at'])
+        return run
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+class CounterResetScheduler(PeriodicWorker):
+    """Planificateur en processus : lance run_reset() à intervalle régulier"""
+
+    interval_setting = 'SUBSCRIPTION_RESET_INTERVAL'
+    default_interval = 3600
+    thread_name = 'subscription-reset'
+    error_message = 'Échec de la remise à zéro des compteurs mensuels'
+
+    def run_once(self):
+        run_reset()
+
+
+scheduler = CounterResetScheduler()
@@ -0,0 +1,106 @@
+"""
+Droits de l'utilisateur pour la durée d'une requête
+
+EntitlementsMiddleware attache request.entitlements : limites du plan,
+fonctionnalités et compteurs d'utilisation, chargés en une seule requête
+(abonnement + nombre de sites web + total des projets) au premier accès ;
+les limites sont résolues dans le catalogue des plans (subscriptions.plans).
+Le chargement est différé car l'authentification JWT n'a lieu que dans la
+vue DRF : le premier accès se fait dans les permissions ou les serializers,
+une fois request.user connu.
+
+Les permissions, serializers et vues lisent get_entitlements(request) au
+lieu de request.user.subscription.
+"""
+from collections import namedtuple
+
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils.functional import SimpleLazyObject
+
+from .models import Subscription
+from .plans import OVERRIDABLE, get_catalog
+
+SUBSCRIPTION_FIELDS = ('status', 'plan', 'limit_overrides', 'current_month_contacts', 'current_storage_mb')
+USAGE_FIELDS = ('websites_count', 'projects_count')
+
+
+def usage_annotations():
+    """Compteurs d'utilisation à annoter sur un queryset de Subscription"""
+    from websites.models import Website
+
+    websites = Website.objects.filter(user_id=OuterRef('user_id')).order_by().values('user_id')
+    return {
+        'websites_count': Coalesce(Subquery(websites.annotate(total=Count('pk')).values('total')), 0),
+        'projects_count': Coalesce(Subquery(websites.annotate(total=Sum('total_projects')).values('total')), 0),
+    }
+
+
+class Entitlements(namedtuple('Entitlements', (
+    'status', 'plan', *OVERRIDABLE, 'current_month_contacts', 'current_storage_mb', *USAGE_FIELDS
+))):
+    """Limites, fonctionnalités et utilisation de l'abonnement (lecture seule)"""
+
+    __slots__ = ()
+
+    @property
+    def is_active(self):
+        return self.status == 'active'
+
+    def has_feature(self, name):
+        """Fonctionnalité du plan, sur un abonnement actif"""
+        return self.is_active and bool(getattr(self, name))
+
+    def can_add_website(self):
+        return self.websites_limit == -1 or self.websites_count < self.websites_limit
+
+    def can_add_project(self, website):
+        """website.total_projects est tenu à jour par projects.counts"""
+        return self.projects_limit == -1 or website.total_projects < self.projects_limit
+
+    def can_receive_contact(self):
+        return self.current_month_contacts < self.contacts_per_month
+
+    def can_upload_file(self, file_size_mb):
+        return (self.current_storage_mb + file_size_mb) <= self.storage_mb
+
+
+# Utilisateur anonyme ou sans abonnement : aucun droit
+NO_ENTITLEMENTS = Entitlements(
+    status=None, plan=None,
+    websites_limit=0, contacts_per_month=0, projects_limit=0, storage_mb=0,
+    analytics=False, integrations=False, custom_domain=False, white_label=False, priority_support=False,
+    current_month_contacts=0, current_storage_mb=0,
+    websites_count=0, projects_count=0,
+)
+
+
+def load_entitlements(user):
+    """Charge les droits d'un utilisateur (une requête, aucun modèle instancié)"""
+    if user is None or not user.is_authenticated:
+        return NO_ENTITLEMENTS
+    row = Subscription.objects.filter(user_id=user.pk).annotate(
+        **usage_annotations()
+    ).values(*SUBSCRIPTION_FIELDS, *USAGE_FIELDS).first()
+    if row is None:
+        return NO_ENTITLEMENTS
+    limits = get_catalog().limits(row['plan'], row.pop('limit_overrides'))
+    return Entitlements(**row, **{name: limits[name] for name in OVERRIDABLE})
+
+
+def attach_entitlements(request):
+    """Attache request.entitlements, chargé au premier accès"""
+    request.entitlements = SimpleLazyObject(lambda: load_entitlements(getattr(request, 'user', None)))
+    return request.entitlements
+
+
+def get_entitlements(request):
+    """
+    Droits de la requête (Request DRF ou HttpRequest) ; chargés ici si le
+    middleware n'est pas passé (APIRequestFactory, appels internes)
+    """
+    request = getattr(request, '_request', request)
+    entitlements = request.__dict__.get('entitlements')
+    if entitlements is None:
+        entitlements = attach_entitlements(request)
+    return entitlements
@@ -0,0 +1,108 @@
+"""
+Benchmark de la remise à zéro des compteurs mensuels sur un grand volume
+
+Usage: python manage.py bench_counter_reset --rows 1000000 --batch-size 10000
+
+Crée --rows abonnements de test (jours anniversaires répartis sur le mois,
+tous dus), chronomètre un passage complet de run_reset puis un second
+passage où plus rien n'est dû, et vérifie que tous les compteurs ont été
+remis à zéro. Les données de test et les passages créés sont supprimés à la fin.
+
+À lancer sur une base PostgreSQL de test : le passage porte sur tous les
+abonnements de la base, et SQLite ne reflète pas le comportement en
+production.
+"""
+import math
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from subscriptions.billing import run_reset
+from subscriptions.models import CounterResetRun, Subscription
+
+CHUNK_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Mesure la durée de la remise à zéro des compteurs mensuels sur un grand nombre d'abonnements"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000,
+                            help="Nombre d'abonnements de test")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Nombre d'identifiants d'abonnements par UPDATE")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        batch_size = options['batch_size'] or getattr(settings, 'SUBSCRIPTION_RESET_BATCH_SIZE', 10000)
+        now = timezone.now()
+
+        latest = CounterResetRun.objects.order_by('-id').first()
+        if latest is not None and (
+            latest.completed_at is None
+            or timezone.localtime(latest.as_of).date() == timezone.localtime(now).date()
+        ):
+            raise CommandError(
+                'Un passage est en cours ou a déjà eu lieu aujourd\'hui : lancer le benchmark sur une base de test'
+            )
+        first_run_id = latest.id + 1 if latest is not None else 0
+
+        User = get_user_model()
+        prefix = f'bench-reset-{uuid.uuid4().hex[:8]}-'
+        password = make_password(None)
+        past = now - timedelta(days=62)
+        try:
+            started = time.perf_counter()
+            for low in range(0, rows, CHUNK_SIZE):
+                users = User.objects.bulk_create([
+                    User(email=f'{prefix}{index}@example.com', password=password)
+                    for index in range(low, min(low + CHUNK_SIZE, rows))
+                ])
+                Subscription.objects.bulk_create([
+                    Subscription(
+                        user=user, billing_anchor_day=index % 31 + 1,
+                        counters_reset_at=past, current_month_contacts=index % 50 + 1
+                    )
+                    for index, user in enumerate(users, start=low)
+                ])
+            self.stdout.write(f"Abonnements créés     : {rows} en {time.perf_counter() - started:.1f} s")
+
+            started = time.perf_counter()
+            run = run_reset(batch_size=batch_size, now=now)
+            elapsed = time.perf_counter() - started
+            if run is None:
+                raise CommandError('Remise à zéro déjà en cours dans un autre processus')
+            self.stdout.write(f"Passage complet       : {run.reset_count} remis à zéro en {elapsed:.2f} s "
+                              f"({run.reset_count / elapsed:,.0f} lignes/s)")
+            windows = math.ceil(run.high_subscription_id / batch_size)
+            self.stdout.write(f"Fenêtres              : {windows} de {batch_size} identifiants, "
+                              f"{elapsed / windows * 1000:.1f} ms en moyenne")
+
+            # Même date de référence : plus rien n'est dû, seul le parcours est mesuré
+            CounterResetRun.objects.filter(pk=run.pk).delete()
+            started = time.perf_counter()
+            second = run_reset(batch_size=batch_size, now=now)
+            self.stdout.write(f"Second passage        : {second.reset_count} remis à zéro en "
+                              f"{time.perf_counter() - started:.2f} s")
+
+            remaining = Subscription.objects.filter(
+                user__email__startswith=prefix
+            ).exclude(current_month_contacts=0).count()
+            if remaining or run.reset_count < rows or second.reset_count:
+                raise CommandError(
+                    f'Remise à zéro incomplète ou répétée : {remaining} compteur(s) non remis à zéro, '
+                    f'{second.reset_count} remis à zéro au second passage'
+                )
+            self.stdout.write(self.style.SUCCESS('Tous les compteurs remis à zéro une seule fois'))
+        finally:
+            CounterResetRun.objects.filter(id__gte=first_run_id).delete()
+            Subscription.objects.filter(user__email__startswith=prefix).delete()
+            ids = list(User.objects.filter(email__startswith=prefix).values_list('id', flat=True))
+            for low in range(0, len(ids), CHUNK_SIZE):
+                User.objects.filter(id__in=ids[low:low + CHUNK_SIZE]).delete()
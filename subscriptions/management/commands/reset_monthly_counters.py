@@ -0,0 +1,33 @@
+"""
+Remise à zéro des compteurs mensuels des abonnements
+
+Usage: python manage.py reset_monthly_counters [--batch-size 10000]
+
+À planifier au moins une fois par jour (ou SUBSCRIPTION_RESET_SCHEDULER) :
+chaque abonnement est remis à zéro au jour anniversaire de son début.
+Un passage interrompu reprend à son point de reprise.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from subscriptions.billing import run_reset
+
+
+class Command(BaseCommand):
+    help = "Remet à zéro les compteurs mensuels des abonnements arrivés à échéance"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Nombre d'identifiants d'abonnements par UPDATE")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        run = run_reset(batch_size=options['batch_size'])
+        if run is None:
+            self.stdout.write('Aucun passage nécessaire (déjà effectué aujourd\'hui ou en cours)')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'{run.reset_count} abonnement(s) remis à zéro jusqu\'à l\'identifiant {run.last_subscription_id} '
+            f'en {time.perf_counter() - started:.2f} s'
+        ))
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:09
+
+from django.db import migrations, models
+
+LIMITS = (
+    'websites_limit', 'contacts_per_month', 'projects_limit', 'storage_mb',
+    'analytics', 'integrations', 'custom_domain', 'white_label', 'priority_support',
+)
+
+# Limites des plans au moment de la migration (figées : le catalogue
+# HOSTMAIL_PLANS peut évoluer ensuite sans changer ce que la migration conserve)
+PLANS = {
+    'free': (1, 50, 5, 100, False, False, False, False, False),
+    'pro': (3, 500, -1, 1000, True, True, False, False, False),
+    'agency': (-1, 5000, -1, 10000, True, True, True, True, True),
+}
+
+
+def _plan_limits(plan):
+    return dict(zip(LIMITS, PLANS.get(plan, PLANS['free'])))
+
+
+def columns_to_overrides(apps, schema_editor):
+    """Ne conserve que les valeurs qui diffèrent du plan (exceptions)"""
+    Subscription = apps.get_model('subscriptions', 'Subscription')
+    rows = Subscription.objects.order_by('pk').values_list('pk', 'plan', *LIMITS)
+    for pk, plan, *values in rows.iterator(chunk_size=2000):
+        defaults = _plan_limits(plan)
+        overrides = {
+            name: value for name, value in zip(LIMITS, values)
+            if value != defaults[name]
+        }
+        if overrides:
+            Subscription.objects.filter(pk=pk).update(limit_overrides=overrides)
+
+
+def overrides_to_columns(apps, schema_editor):
+    Subscription = apps.get_model('subscriptions', 'Subscription')
+    for subscription in Subscription.objects.order_by('pk').iterator(chunk_size=2000):
+        limits = {**_plan_limits(subscription.plan), **(subscription.limit_overrides or {})}
+        Subscription.objects.filter(pk=subscription.pk).update(**limits)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='limit_overrides',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Exceptions aux limites du plan'),
+        ),
+        migrations.RunPython(columns_to_overrides, overrides_to_columns),
+        migrations.RemoveField(
+            model_name='subscription',
+            name='analytics',
+        ),
+        migrations.RemoveField(
+            model_name='subscription',
+            name='contacts_per_month',
+        ),
+        migrations.RemoveField(
+            model_name='subscription',
+            name='custom_domain',
+        ),
+        migrations.RemoveField(
+            model_name='subscription',
+            name='integrations',
+        ),
+        migrations.RemoveField(
+            model_name='subscription',
+            name='priority_support',
+        ),
+        migrations.RemoveField(
+            model_name='subscription',
+            name='projects_limit',
+        ),
+        migrations.RemoveField(
+            model_name='subscription',
+            name='storage_mb',
+        ),
+        migrations.RemoveField(
+            model_name='subscription',
+            name='websites_limit',
+        ),
+        migrations.RemoveField(
+            model_name='subscription',
+            name='white_label',
+        ),
+    ]
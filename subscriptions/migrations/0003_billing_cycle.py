@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:11
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models.functions import ExtractDay
+
+
+def fill_anchor_day(apps, schema_editor):
+    """Jour anniversaire des abonnements existants (un seul UPDATE)"""
+    apps.get_model('subscriptions', 'Subscription').objects.update(billing_anchor_day=ExtractDay('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0002_plan_catalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterResetRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField(verbose_name='Date de référence')),
+                ('last_subscription_id', models.BigIntegerField(default=0, verbose_name='Dernier abonnement traité')),
+                ('high_subscription_id', models.BigIntegerField(default=0, verbose_name='Dernier abonnement du passage')),
+                ('reset_count', models.IntegerField(default=0, verbose_name='Compteurs remis à zéro')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Remise à zéro des compteurs',
+                'verbose_name_plural': 'Remises à zéro des compteurs',
+                'db_table': 'subscription_counter_resets',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='billing_anchor_day',
+            field=models.PositiveSmallIntegerField(default=1, verbose_name='Jour de renouvellement'),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='counters_reset_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Début de la période en cours'),
+        ),
+        migrations.RunPython(fill_anchor_day, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
+import copy
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
+from .plans import OVERRIDABLE, PlanLimit, get_catalog
 
 
 class Subscription(models.Model):
@@ -50,47 +54,23 @@ class Subscription(models.Model):
         verbose_name=_("Statut")
     )
 
-    # Limites du plan
-    websites_limit = models.IntegerField(
-        default=1,
-        verbose_name=_("Limite de sites web"),
-        help_text=_("-1 pour illimité")
-    )
-    contacts_per_month = models.IntegerField(
-        default=50,
-        verbose_name=_("Messages de contact par mois")
-    )
-    projects_limit = models.IntegerField(
-        default=5,
-        verbose_name=_("Limite de projets"),
-        help_text=_("-1 pour illimité")
-    )
-    storage_mb = models.IntegerField(
-        default=100,
-        verbose_name=_("Stockage en MB")
+    # Exceptions aux limites du plan (catalogue : subscriptions.plans), ex: {"projects_limit": 20}
+    limit_overrides = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_("Exceptions aux limites du plan")
     )
 
-    # Fonctionnalités
-    analytics = models.BooleanField(
-        default=False,
-        verbose_name=_("Analytics activé")
-    )
-    integrations = models.BooleanField(
-        default=False,
-        verbose_name=_("Intégrations activées")
-    )
-    custom_domain = models.BooleanField(
-        default=False,
-        verbose_name=_("Domaine personnalisé")
-    )
-    white_label = models.BooleanField(
-        default=False,
-        verbose_name=_("White label")
-    )
-    priority_support = models.BooleanField(
-        default=False,
-        verbose_name=_("Support prioritaire")
-    )
+    # Limites et fonctionnalités effectives (plan du catalogue + exceptions)
+    websites_limit = PlanLimit()
+    contacts_per_month = PlanLimit()
+    projects_limit = PlanLimit()
+    storage_mb = PlanLimit()
+    analytics = PlanLimit()
+    integrations = PlanLimit()
+    custom_domain = PlanLimit()
+    white_label = PlanLimit()
+    priority_support = PlanLimit()
 
     # Compteurs d'utilisation du mois en cours
     current_month_contacts = models.IntegerField(
@@ -102,6 +82,17 @@ class Subscription(models.Model):
         verbose_name=_("Stockage utilisé (MB)")
     )
 
+    # Cycle de facturation : jour anniversaire de started_at, début de la
+    # période couverte par current_month_contacts (voir subscriptions.billing)
+    billing_anchor_day = models.PositiveSmallIntegerField(
+        default=1,
+        verbose_name=_("Jour de renouvellement")
+    )
+    counters_reset_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_("Début de la période en cours")
+    )
+
     # Dates
     started_at = models.DateTimeField(
         auto_now_add=True,
@@ -127,56 +118,63 @@ class Subscription(models.Model):
         verbose_name_plural = _("Abonnements")
         ordering = ['-created_at']
 
+    def __init__(self, *args, **kwargs):
+        # Les anciennes colonnes de limites restent acceptées en argument
+        # nommé (Subscription(projects_limit=...), objects.create(...)) :
+        # elles deviennent des exceptions, une fois le plan connu
+        limits = {name: kwargs.pop(name) for name in OVERRIDABLE if name in kwargs}
+        super().__init__(*args, **kwargs)
+        for name, value in limits.items():
+            setattr(self, name, value)
+
     def __str__(self):
         return f"{self.user.email} - {self.get_plan_display()}"
 
+    # Champs repris dans le snapshot des sites web mis en cache par le middleware API key
+    SNAPSHOT_FIELDS = frozenset(['status', 'plan', 'limit_overrides'])
+
+    def clean(self):
+        """Seules les limites modifiables du catalogue peuvent faire l'objet d'une exception"""
+        unknown = set(self.limit_overrides or {}) - set(OVERRIDABLE)
+        if unknown:
+            raise ValidationError({'limit_overrides': f"Limites inconnues : {', '.join(sorted(unknown))}"})
+
     def save(self, *args, **kwargs):
-        """Définir les limites selon le plan sélectionné"""
-        if not self.pk:  # Nouvelle création
-            self.set_plan_limits()
+        """Invalide les snapshots des sites web si le statut, le plan ou ses exceptions changent"""
+        if self._state.adding:
+            self.billing_anchor_day = timezone.localtime(self.started_at or timezone.now()).day
         super().save(*args, **kwargs)
 
+        update_fields = kwargs.get('update_fields')
+        fields = self.SNAPSHOT_FIELDS if update_fields is None else self.SNAPSHOT_FIELDS & set(update_fields)
+        if not fields:
+            return
+        saved = getattr(self, '_saved_snapshot', None)
+        current = self._snapshot_state()
+        if saved is None or any(current[name] != saved[name] for name in fields):
+            from websites.cache import invalidate_user_websites
+            invalidate_user_websites(self.user_id)
+        # Seuls les champs sauvegardés changent en base
+        self._saved_snapshot = current if saved is None else {**saved, **{name: current[name] for name in fields}}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_snapshot = instance._snapshot_state()
+        return instance
+
+    def _snapshot_state(self):
+        """Valeurs des champs du snapshot (copiées : limit_overrides est un dict modifiable)"""
+        return {name: copy.deepcopy(self.__dict__.get(name)) for name in self.SNAPSHOT_FIELDS}
+
+    @property
+    def limits(self):
+        """Limites effectives (lecture seule)"""
+        return get_catalog().limits(self.plan, self.limit_overrides)
+
     def set_plan_limits(self):
-        """Configure les limites selon le plan"""
-        plans = {
-            'free': {
-                'websites_limit': 1,
-                'contacts_per_month': 50,
-                'projects_limit': 5,
-                'storage_mb': 100,
-                'analytics': False,
-                'integrations': False,
-                'custom_domain': False,
-                'white_label': False,
-                'priority_support': False,
-            },
-            'pro': {
-                'websites_limit': 3,
-                'contacts_per_month': 500,
-                'projects_limit': -1,
-                'storage_mb': 1000,
-                'analytics': True,
-                'integrations': True,
-                'custom_domain': False,
-                'white_label': False,
-                'priority_support': False,
-            },
-            'agency': {
-                'websites_limit': -1,
-                'contacts_per_month': 5000,
-                'projects_limit': -1,
-                'storage_mb': 10000,
-                'analytics': True,
-                'integrations': True,
-                'custom_domain': True,
-                'white_label': True,
-                'priority_support': True,
-            },
-        }
-
-        plan_config = plans.get(self.plan, plans['free'])
-        for key, value in plan_config.items():
-            setattr(self, key, value)
+        """Applique les limites du plan (retire les exceptions)"""
+        self.limit_overrides = {}
 
     def can_add_website(self):
         """Vérifie si l'utilisateur peut ajouter un site web"""
@@ -188,7 +186,7 @@ class Subscription(models.Model):
         """Vérifie si l'utilisateur peut ajouter un projet"""
         if self.projects_limit == -1:
             return True
-        return website.projects.count() < self.projects_limit
+        return website.total_projects < self.projects_limit
 
     def can_receive_contact(self):
         """Vérifie si l'utilisateur peut recevoir un nouveau contact"""
@@ -200,10 +198,53 @@ class Subscription(models.Model):
 
     def increment_contact_count(self):
         """Incrémente le compteur de contacts du mois"""
-        self.current_month_contacts += 1
-        self.save(update_fields=['current_month_contacts'])
+        Subscription.objects.filter(pk=self.pk).update(
+            current_month_contacts=models.F('current_month_contacts') + 1
+        )
+        self.refresh_from_db(fields=['current_month_contacts'])
 
     def reset_monthly_counters(self):
-        """Réinitialise les compteurs mensuels"""
+        """Réinitialise les compteurs mensuels (remise à zéro en masse : subscriptions.billing)"""
         self.current_month_contacts = 0
-        self.save(update_fields=['current_month_contacts'])
+        self.counters_reset_at = timezone.now()
+        self.save(update_fields=['current_month_contacts', 'counters_reset_at'])
+
+
+class CounterResetRun(models.Model):
+    """
+    Passage de remise à zéro des compteurs mensuels : date de référence et
+    point de reprise (dernier identifiant d'abonnement traité)
+    """
+
+    as_of = models.DateTimeField(
+        verbose_name=_("Date de référence")
+    )
+    last_subscription_id = models.BigIntegerField(
+        default=0,
+        verbose_name=_("Dernier abonnement traité")
+    )
+    high_subscription_id = models.BigIntegerField(
+        default=0,
+        verbose_name=_("Dernier abonnement du passage")
+    )
+    reset_count = models.IntegerField(
+        default=0,
+        verbose_name=_("Compteurs remis à zéro")
+    )
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Terminé le")
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'subscription_counter_resets'
+        verbose_name = _("Remise à zéro des compteurs")
+        verbose_name_plural = _("Remises à zéro des compteurs")
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"{self.as_of:%Y-%m-%d} - {self.last_subscription_id}/{self.high_subscription_id}"
@@ -0,0 +1,127 @@
+"""
+Catalogue des plans
+
+Les plans (settings.HOSTMAIL_PLANS) sont chargés une fois au démarrage
+(SubscriptionsConfig.ready) dans un catalogue immuable et versionné :
+- version : empreinte du contenu, change dès qu'un plan est modifié
+  (clés de cache des snapshots, ETag de la liste des plans) ;
+- limites d'un plan : MappingProxyType, résolues par simple lecture de dict.
+
+Les abonnements ne stockent que leur plan et, le cas échéant, des exceptions
+(Subscription.limit_overrides, dict creux). Modifier ou ajouter un plan ne
+réécrit donc aucune ligne de la table des abonnements.
+"""
+import hashlib
+import json
+from collections import namedtuple
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULT_PLAN = 'free'
+
+# Limites et fonctionnalités modifiables par abonnement (limit_overrides)
+OVERRIDABLE = (
+    'websites_limit', 'contacts_per_month', 'projects_limit', 'storage_mb',
+    'analytics', 'integrations', 'custom_domain', 'white_label', 'priority_support',
+)
+
+Plan = namedtuple('Plan', ['code', 'name', 'price_monthly', 'price_yearly', 'limits'])
+
+
+class PlanCatalog:
+    """Plans indexés par code (lecture seule)"""
+
+    __slots__ = ('version', 'plans', 'default')
+
+    def __init__(self, config, default=DEFAULT_PLAN):
+        payload = json.dumps(config, sort_keys=True, default=str)
+        self.version = hashlib.sha256(payload.encode()).hexdigest()[:12]
+        self.plans = MappingProxyType({
+            code: Plan(
+                code,
+                values.get('name', code),
+                values.get('price_monthly', 0),
+                values.get('price_yearly', 0),
+                MappingProxyType({
+                    key: value for key, value in values.items()
+                    if key not in ('name', 'price_monthly', 'price_yearly')
+                }),
+            )
+            for code, values in config.items()
+        })
+        self.default = self.plans.get(default)
+
+    def __contains__(self, code):
+        return code in self.plans
+
+    def get(self, code):
+        """Plan par code ; plan par défaut si le code est inconnu"""
+        return self.plans.get(code, self.default)
+
+    def limits(self, code, overrides=None):
+        """Limites effectives : celles du plan, sans copie s'il n'y a pas d'exception"""
+        limits = self.get(code).limits
+        if overrides:
+            limits = MappingProxyType({**limits, **overrides})
+        return limits
+
+    def as_dict(self):
+        """Représentation JSON de la liste des plans"""
+        return {
+            plan.code: {
+                'name': plan.name,
+                'price_monthly': plan.price_monthly,
+                'price_yearly': plan.price_yearly,
+                **plan.limits,
+            }
+            for plan in self.plans.values()
+        }
+
+
+_catalog = None
+
+
+def load_catalog():
+    """(Re)construit le catalogue depuis les réglages"""
+    global _catalog
+    _catalog = PlanCatalog(getattr(settings, 'HOSTMAIL_PLANS', {}))
+    return _catalog
+
+
+def get_catalog():
+    return _catalog or load_catalog()
+
+
+@receiver(setting_changed)
+def reload_on_setting_changed(setting, **kwargs):
+    """override_settings(HOSTMAIL_PLANS=...) dans les tests"""
+    if setting == 'HOSTMAIL_PLANS':
+        load_catalog()
+
+
+class PlanLimit:
+    """
+    Limite d'un abonnement lue dans le catalogue ; l'affectation enregistre
+    une exception (retirée si elle égale la valeur du plan)
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        overrides = instance.limit_overrides
+        if overrides and self.name in overrides:
+            return overrides[self.name]
+        return get_catalog().get(instance.plan).limits[self.name]
+
+    def __set__(self, instance, value):
+        overrides = dict(instance.limit_overrides or {})
+        overrides.pop(self.name, None)
+        if get_catalog().get(instance.plan).limits[self.name] != value:
+            overrides[self.name] = value
+        instance.limit_overrides = overrides
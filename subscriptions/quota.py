@@ -0,0 +1,48 @@
+"""
+Gestion atomique des quotas mensuels de contacts
+
+La réservation et l'incrément se font en un seul UPDATE conditionnel :
+aucune lecture préalable, aucun verrou explicite (select_for_update),
+et le quota ne peut pas être dépassé même sous forte concurrence.
+"""
+from django.db.models import F
+from websites.models import Website
+from .models import Subscription
+from .plans import get_catalog
+
+
+def reserve_contact(user_id, limit):
+    """
+    Réserve une place dans le quota mensuel de contacts de l'utilisateur.
+    limit : quota mensuel résolu dans le catalogue des plans (snapshot du site web).
+    Retourne True si la réservation a réussi, False si le quota est atteint.
+    """
+    updated = Subscription.objects.filter(
+        user_id=user_id,
+        current_month_contacts__lt=limit,
+    ).update(current_month_contacts=F('current_month_contacts') + 1)
+    return updated == 1
+
+
+def release_contact(user_id):
+    """Libère une réservation (ex: la création du message a échoué)"""
+    Subscription.objects.filter(
+        user_id=user_id,
+        current_month_contacts__gt=0,
+    ).update(current_month_contacts=F('current_month_contacts') - 1)
+
+
+def increment_website_contacts(website_id):
+    """Incrémente atomiquement le total de contacts du site web"""
+    Website.objects.filter(pk=website_id).update(total_contacts=F('total_contacts') + 1)
+
+
+def get_contact_usage(user_id):
+    """Retourne (limite, utilisation courante) du quota de contacts"""
+    row = Subscription.objects.filter(user_id=user_id).values_list(
+        'plan', 'limit_overrides', 'current_month_contacts'
+    ).first()
+    if row is None:
+        return 0, 0
+    plan, overrides, current = row
+    return get_catalog().limits(plan, overrides)['contacts_per_month'], current
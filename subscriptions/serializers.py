@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .entitlements import get_entitlements, usage_annotations
 from .models import Subscription
 from django.contrib.auth import get_user_model
 
@@ -36,13 +37,27 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             'started_at', 'created_at', 'updated_at'
         ]
 
+    def get_usage(self, obj, name):
+        """
+        Compteur annoté sur l'abonnement (usage_annotations), sinon les droits
+        de la requête s'il s'agit de l'abonnement de l'utilisateur connecté
+        """
+        if hasattr(obj, name):
+            return getattr(obj, name)
+        request = self.context.get('request')
+        if request and request.user.pk == obj.user_id:
+            return getattr(get_entitlements(request), name)
+        return Subscription.objects.filter(pk=obj.pk).annotate(**usage_annotations()).values_list(
+            name, flat=True
+        ).first()
+
     def get_websites_count(self, obj):
         """Retourne le nombre de sites web de l'utilisateur"""
-        return obj.user.websites.count()
+        return self.get_usage(obj, 'websites_count')
 
     def get_projects_count(self, obj):
         """Retourne le nombre total de projets de l'utilisateur"""
-        return sum(website.projects.count() for website in obj.user.websites.all())
+        return self.get_usage(obj, 'projects_count')
 
 
 class SubscriptionUpgradeSerializer(serializers.Serializer):
@@ -54,6 +69,6 @@ class SubscriptionUpgradeSerializer(serializers.Serializer):
     def validate_plan(self, value):
         """Valide que le nouveau plan est différent de l'actuel"""
         request = self.context.get('request')
-        if request and request.user.subscription.plan == value:
+        if request and get_entitlements(request).plan == value:
             raise serializers.ValidationError("Vous êtes déjà sur ce plan.")
         return value
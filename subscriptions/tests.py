@@ -1,3 +1,230 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from analytics.ingestion import analytics_buffer
+from projects.models import Project
+from websites.models import Website
+from .billing import period_start, run_reset
+from .entitlements import NO_ENTITLEMENTS, load_entitlements
+from .models import CounterResetRun, Subscription
+from .plans import get_catalog
 
-# Create your tests here.
+User = get_user_model()
+
+
+class EntitlementsTests(TestCase):
+    """Tests des droits chargés une fois par requête (subscriptions.entitlements)"""
+
+    def setUp(self):
+        cache.clear()
+        analytics_buffer.discard()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.user.subscription.analytics = True
+        self.user.subscription.save()
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+        Project.objects.create(website=self.website, title='Portfolio', description='Description')
+        self.client.force_authenticate(self.user)
+
+    def request(self, method, url, data=None):
+        """Exécute la requête ; retourne (réponse, requêtes SQL, requêtes sur subscriptions)"""
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+        statements = [query['sql'] for query in queries]
+        return response, len(statements), sum('FROM "subscriptions"' in sql for sql in statements)
+
+    def test_load_in_one_query(self):
+        """Test que limites, fonctionnalités et utilisation sont chargées en une requête"""
+        with self.assertNumQueries(1):
+            entitlements = load_entitlements(self.user)
+        self.assertEqual(entitlements.plan, 'free')
+        self.assertTrue(entitlements.has_feature('analytics'))
+        self.assertEqual((entitlements.websites_count, entitlements.projects_count), (1, 1))
+        self.assertFalse(entitlements.can_add_website())
+        self.website.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertTrue(entitlements.can_add_project(self.website))
+
+    def test_anonymous(self):
+        """Test qu'un utilisateur anonyme n'a aucun droit"""
+        from django.contrib.auth.models import AnonymousUser
+        with self.assertNumQueries(0):
+            self.assertIs(load_entitlements(AnonymousUser()), NO_ENTITLEMENTS)
+        self.assertFalse(NO_ENTITLEMENTS.has_feature('analytics'))
+
+    def test_query_budget_per_endpoint(self):
+        """Test du nombre de requêtes par endpoint : l'abonnement n'est lu qu'une fois"""
+        budgets = [
+            ('get', '/api/v1/analytics/stats/', None, 200, 7),
+            ('get', '/api/v1/analytics/daily/', None, 200, 2),
+            ('get', '/api/v1/subscriptions/me/', None, 200, 1),
+            ('post', '/api/v1/subscriptions/upgrade/', {'plan': 'free', 'billing_period': 'monthly'}, 400, 1),
+            ('post', '/api/v1/websites/', {'name': 'Autre', 'domain': 'other.com'}, 400, 1),
+            ('post', '/api/v1/projects/projects/',
+             {'website': self.website.pk, 'title': 'Nouveau', 'description': 'Description'}, 201, 9),
+        ]
+        for method, url, data, status_code, budget in budgets:
+            response, total, subscription_queries = self.request(method, url, data)
+            self.assertEqual(response.status_code, status_code, url)
+            self.assertEqual(subscription_queries, 1, url)
+            self.assertEqual(total, budget, url)
+
+    def test_analytics_feature_denied(self):
+        """Test que l'accès aux analytics suit les droits de l'abonnement"""
+        self.user.subscription.analytics = False
+        self.user.subscription.save()
+        response, total, subscription_queries = self.request('get', '/api/v1/analytics/stats/')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual((total, subscription_queries), (1, 1))
+
+
+class PlanCatalogTests(TestCase):
+    """Tests du catalogue des plans et des exceptions par abonnement"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.subscription = Subscription.objects.get(user=self.user)
+
+    def test_catalog_is_immutable(self):
+        """Test que les limites du catalogue ne sont pas modifiables"""
+        with self.assertRaises(TypeError):
+            get_catalog().get('pro').limits['projects_limit'] = 1
+        self.assertEqual(get_catalog().get('inconnu').code, 'free')
+
+    def test_overrides_are_sparse(self):
+        """Test que seules les valeurs différentes du plan sont enregistrées"""
+        self.subscription.analytics = True
+        self.subscription.projects_limit = 5
+        self.assertEqual(self.subscription.limit_overrides, {'analytics': True})
+        self.subscription.save()
+
+        subscription = Subscription.objects.get(pk=self.subscription.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(subscription.analytics)
+            self.assertEqual(subscription.projects_limit, 5)
+        subscription.analytics = False
+        self.assertEqual(subscription.limit_overrides, {})
+
+    def test_limit_keyword_arguments(self):
+        """Test que les anciennes colonnes de limites restent acceptées à la création"""
+        other = User.objects.create_user(email='other@example.com', password='password123')
+        Subscription.objects.filter(user=other).delete()
+        subscription = Subscription.objects.create(user=other, plan='pro', projects_limit=7, analytics=True)
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.limit_overrides, {'projects_limit': 7})
+        self.assertEqual(subscription.projects_limit, 7)
+        self.assertTrue(subscription.analytics)
+
+    def test_plan_change_without_rewrite(self):
+        """Test qu'une modification du catalogue s'applique sans réécrire les abonnements"""
+        plans = {plan: dict(config) for plan, config in settings.HOSTMAIL_PLANS.items()}
+        plans['free']['projects_limit'] = 10
+        plans['starter'] = dict(plans['free'], name='Starter', price_monthly=4)
+        version = get_catalog().version
+
+        with override_settings(HOSTMAIL_PLANS=plans):
+            self.assertNotEqual(get_catalog().version, version)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.subscription.projects_limit, 10)
+            self.subscription.plan = 'starter'
+            self.subscription.save()
+            self.assertEqual(load_entitlements(self.user).projects_limit, 10)
+        self.assertEqual(get_catalog().version, version)
+
+    def test_plans_endpoint_etag(self):
+        """Test que la liste des plans porte la version du catalogue"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/subscriptions/plans/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['pro']['price_monthly'], settings.HOSTMAIL_PLANS['pro']['price_monthly'])
+        self.assertEqual(response['ETag'], f'"{get_catalog().version}"')
+
+        response = client.get('/api/v1/subscriptions/plans/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class CounterResetTests(TestCase):
+    """Tests de la remise à zéro des compteurs mensuels (subscriptions.billing)"""
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.make_aware(timezone.datetime(2026, 3, 10, 8, 0))
+        previous = timezone.make_aware(timezone.datetime(2026, 2, 28, 12, 0))
+        self.subscriptions = []
+        for index, anchor_day in enumerate((1, 10, 15, 31)):
+            user = User.objects.create_user(email=f'user{index}@example.com', password='password123')
+            Subscription.objects.filter(user=user).update(
+                billing_anchor_day=anchor_day,
+                current_month_contacts=7,
+                counters_reset_at=period_start(anchor_day, previous),
+            )
+            self.subscriptions.append(user.subscription.pk)
+
+    def counters(self):
+        return list(Subscription.objects.order_by('pk').values_list('current_month_contacts', flat=True))
+
+    def test_period_start(self):
+        """Test du début de période : jour anniversaire ramené à la fin des mois courts"""
+        def local(*args):
+            return timezone.make_aware(timezone.datetime(*args))
+
+        self.assertEqual(period_start(31, local(2026, 2, 28, 12)), local(2026, 2, 28))
+        self.assertEqual(period_start(31, local(2026, 2, 15)), local(2026, 1, 31))
+        self.assertEqual(period_start(15, local(2026, 1, 10)), local(2025, 12, 15))
+        self.assertEqual(period_start(10, self.now), local(2026, 3, 10))
+
+    def test_reset_follows_billing_anchor(self):
+        """Test que seuls les abonnements dont la période a commencé sont remis à zéro"""
+        run = run_reset(now=self.now)
+        self.assertEqual(run.reset_count, 2)
+        self.assertIsNotNone(run.completed_at)
+        self.assertEqual(self.counters(), [0, 0, 7, 7])
+
+        # Un seul passage par jour ; le lendemain, aucun abonnement n'est dû
+        self.assertIsNone(run_reset(now=self.now))
+        run = run_reset(now=self.now + timezone.timedelta(days=1))
+        self.assertEqual(run.reset_count, 0)
+
+    def test_one_update_per_batch(self):
+        """Test qu'une fenêtre d'identifiants est traitée par un seul UPDATE"""
+        with CaptureQueriesContext(connection) as queries:
+            run_reset(batch_size=2, now=self.now)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "subscriptions"')]
+        windows = -(-(max(self.subscriptions)) // 2)
+        self.assertEqual(len(updates), windows)
+
+    def test_resume_from_checkpoint(self):
+        """Test qu'un passage interrompu reprend après le dernier identifiant traité"""
+        checkpoint = self.subscriptions[1]
+        CounterResetRun.objects.create(
+            as_of=self.now, last_subscription_id=checkpoint,
+            high_subscription_id=max(self.subscriptions), reset_count=2,
+        )
+        run = run_reset(batch_size=1, now=self.now + timezone.timedelta(days=10))
+        # La date de référence du passage est conservée : abonnements 15 et 31 non dus
+        self.assertEqual(run.as_of, self.now)
+        self.assertEqual(run.reset_count, 2)
+        self.assertEqual(self.counters(), [7, 7, 7, 7])
+        self.assertEqual(CounterResetRun.objects.count(), 1)
+
+    def test_locked(self):
+        """Test qu'un passage en cours dans un autre processus est respecté"""
+        from .billing import LOCK_KEY
+        cache.add(LOCK_KEY, 1)
+        self.assertIsNone(run_reset(now=self.now))
+        self.assertFalse(CounterResetRun.objects.exists())
+
+    def test_command(self):
+        """Test de la commande reset_monthly_counters"""
+        from io import StringIO
+        out = StringIO()
+        call_command('reset_monthly_counters', '--batch-size', '2', stdout=out)
+        self.assertIn('abonnement(s) remis à zéro', out.getvalue())
+        self.assertTrue(CounterResetRun.objects.filter(completed_at__isnull=False).exists())
@@ -2,7 +2,9 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from .entitlements import usage_annotations
 from .models import Subscription
+from .plans import get_catalog
 from .serializers import SubscriptionSerializer, SubscriptionUpgradeSerializer
 
 
@@ -18,14 +20,16 @@ class SubscriptionViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        """Retourne uniquement l'abonnement de l'utilisateur connecté"""
-        return Subscription.objects.filter(user=self.request.user)
+        """Retourne uniquement l'abonnement de l'utilisateur connecté (avec son utilisation)"""
+        return Subscription.objects.filter(user=self.request.user).select_related('user').annotate(
+            **usage_annotations()
+        )
 
     @action(detail=False, methods=['get'])
     def me(self, request):
         """Récupère l'abonnement de l'utilisateur connecté"""
         try:
-            subscription = request.user.subscription
+            subscription = self.get_queryset().get()
             serializer = self.get_serializer(subscription)
             return Response(serializer.data)
         except Subscription.DoesNotExist:
@@ -96,8 +100,12 @@ class SubscriptionViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=['get'])
     def plans(self, request):
-        """Retourne la liste des plans disponibles"""
-        from django.conf import settings
-
-        plans = settings.HOSTMAIL_PLANS
-        return Response(plans)
+        """Retourne la liste des plans disponibles (ETag : version du catalogue)"""
+        catalog = get_catalog()
+        etag = f'"{catalog.version}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(catalog.as_dict())
+        response['ETag'] = etag
+        return response
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class WebhooksConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "webhooks"
+
+    def ready(self):
+        import webhooks.signals  # noqa
+
+        # Worker des nouvelles tentatives en processus (serveurs uniquement, voir core.workers)
+        if getattr(settings, 'WEBHOOK_RETRY_WORKER', False):
+            from .delivery import retry_worker
+            retry_worker.start()
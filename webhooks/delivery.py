@@ -0,0 +1,396 @@
+"""
+Moteur de livraison des webhooks
+
+- Les événements sont mis en file après le commit de la transaction et traités
+  par un pool borné de threads : le thread de la requête n'attend jamais le réseau.
+- Les appels HTTP passent par une session requests partagée (keep-alive, pool
+  de connexions par hôte).
+- Chaque requête est signée en HMAC-SHA256 avec le secret du webhook :
+  X-HostMail-Signature: sha256=HMAC(secret, "<timestamp>.<body>")
+- En cas d'échec, nouvelle tentative avec backoff exponentiel jusqu'à
+  max_retries tentatives ; chaque tentative est tracée dans WebhookLog.
+  Les tentatives à venir sont persistées (WebhookLog.next_attempt_at) et
+  exécutées par le worker des nouvelles tentatives (thread en processus, ou
+  commande retry_webhooks) : un redémarrage ne les perd pas et le thread
+  appelant n'attend jamais le backoff.
+  Chaque tentative relit le webhook : une URL ou un secret modifiés
+  s'appliquent, un webhook désactivé ou supprimé n'est plus appelé.
+- L'hôte est résolu avant chaque envoi et l'adresse réellement connectée est
+  vérifiée à l'ouverture de la connexion (parade au DNS rebinding) : les
+  adresses non publiques (boucle locale, réseaux privés, lien local...) sont
+  refusées, sauf si WEBHOOK_ALLOW_PRIVATE_NETWORKS (développement, tests).
+  Les redirections ne sont pas suivies, les proxies de l'environnement sont
+  ignorés.
+"""
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import queue
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from core.workers import PeriodicWorker
+from .stats import webhook_stats
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'HostMail-Webhooks/1.0'
+MAX_RESPONSE_BODY = 2000
+
+# Marge ajoutée au timeout avant qu'une tentative prise en charge mais non
+# terminée (processus interrompu) redevienne due
+RETRY_CLAIM_MARGIN = 60
+
+# En-têtes réservés que custom_headers ne peut pas écraser
+RESERVED_HEADERS = {
+    'content-type', 'user-agent', 'x-hostmail-event', 'x-hostmail-delivery',
+    'x-hostmail-timestamp', 'x-hostmail-signature',
+}
+
+
+class BlockedDestination(requests.RequestException):
+    """Destination de webhook refusée (adresse non publique ou URL invalide)"""
+
+
+def is_public_address(address):
+    """Vrai si l'adresse IP est publique (ni privée, ni locale, ni multicast)"""
+    ip = ipaddress.ip_address(address.split('%')[0])
+    return ip.is_global and not ip.is_multicast
+
+
+def check_destination(url):
+    """Résout l'hôte de l'URL ; lève BlockedDestination si une de ses adresses n'est pas publique"""
+    if getattr(settings, 'WEBHOOK_ALLOW_PRIVATE_NETWORKS', False):
+        return
+    parts = urlsplit(url)
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+    except ValueError:
+        raise BlockedDestination(f'URL de webhook invalide : {url}')
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise BlockedDestination(f'URL de webhook invalide : {url}')
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError) as exc:
+        raise BlockedDestination(f'Hôte introuvable : {parts.hostname} ({exc})')
+    for address in addresses:
+        if not is_public_address(address):
+            raise BlockedDestination(f'Destination refusée : {parts.hostname} ({address}) n\'est pas une adresse publique')
+
+
+class PeerCheckMixin:
+    """
+    Vérifie l'adresse de la connexion ouverte : la résolution DNS de
+    check_destination peut différer de celle faite à la connexion
+    """
+
+    def _new_conn(self):
+        sock = super()._new_conn()
+        if not getattr(settings, 'WEBHOOK_ALLOW_PRIVATE_NETWORKS', False):
+            address = sock.getpeername()[0]
+            if not is_public_address(address):
+                sock.close()
+                raise BlockedDestination(f'Destination refusée : {self.host} ({address}) n\'est pas une adresse publique')
+        return sock
+
+
+class CheckedHTTPConnection(PeerCheckMixin, HTTPConnection):
+    pass
+
+
+class CheckedHTTPSConnection(PeerCheckMixin, HTTPSConnection):
+    pass
+
+
+class CheckedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CheckedHTTPConnection
+
+
+class CheckedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CheckedHTTPSConnection
+
+
+class CheckedAdapter(HTTPAdapter):
+    """Adaptateur requests dont les connexions vérifient l'adresse connectée"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CheckedHTTPConnectionPool,
+            'https': CheckedHTTPSConnectionPool,
+        }
+
+
+def sign_payload(secret, timestamp, body):
+    """Calcule la signature HMAC-SHA256 d'un corps de requête"""
+    message = f'{timestamp}.'.encode() + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def build_payload(event_type, website_id, data):
+    """Construit le payload standard d'un événement (sérialisable en JSON)"""
+    payload = {
+        'event': event_type,
+        'website': website_id,
+        'timestamp': timezone.now().isoformat(),
+        'data': data,
+    }
+    return json.loads(json.dumps(payload, cls=DjangoJSONEncoder))
+
+
+class WebhookDispatcher:
+    """Répartit les événements vers les webhooks actifs et livre les requêtes"""
+
+    def __init__(self):
+        self._queue = None
+        self._threads = []
+        self._lock = threading.Lock()
+        self._session = None
+
+    # Configuration
+
+    @property
+    def is_async(self):
+        return getattr(settings, 'WEBHOOK_ASYNC', True)
+
+    @property
+    def workers(self):
+        return getattr(settings, 'WEBHOOK_WORKERS', 4)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'WEBHOOK_TIMEOUT', 10)
+
+    @property
+    def backoff(self):
+        return getattr(settings, 'WEBHOOK_RETRY_BACKOFF', 2)
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    # Connexion directe : via un proxy, l'adresse vérifiée serait celle du proxy
+                    session.trust_env = False
+                    adapter = CheckedAdapter(pool_connections=32, pool_maxsize=max(self.workers, 10))
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    # Entrée des événements
+
+    def dispatch(self, website_id, event_type, data):
+        """
+        Déclenche un événement pour un site web.
+        Les webhooks sont appelés après le commit de la transaction courante.
+        """
+        payload = build_payload(event_type, website_id, data)
+        transaction.on_commit(lambda: self._submit(('event', website_id, event_type, payload)))
+
+    def _submit(self, job):
+        if not self.is_async:
+            self._process(job)
+            return
+
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            logger.warning('File des webhooks pleine, événement abandonné : %s', job[2])
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._queue = queue.Queue(maxsize=getattr(settings, 'WEBHOOK_QUEUE_SIZE', 10000))
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'webhook-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                close_old_connections()
+                self._process(job)
+            except Exception:
+                logger.exception('Erreur lors du traitement du webhook')
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job):
+        _, website_id, event_type, payload = job
+        for webhook in self.get_webhooks(website_id, event_type):
+            self.deliver(webhook, event_type, payload)
+
+    def get_webhooks(self, website_id, event_type):
+        """Webhooks actifs du site abonnés à l'événement"""
+        from .models import Webhook
+
+        webhooks = Webhook.objects.filter(website_id=website_id, is_active=True)
+        return [webhook for webhook in webhooks if event_type in (webhook.events or [])]
+
+    def get_webhook(self, webhook_id, event_type):
+        """Webhook relu au moment d'une nouvelle tentative ; None s'il n'est plus actif ou abonné"""
+        from .models import Webhook
+
+        webhook = Webhook.objects.filter(pk=webhook_id, is_active=True).first()
+        if webhook is None or event_type not in (webhook.events or []):
+            return None
+        return webhook
+
+    # Nouvelles tentatives
+
+    def _claim_retry(self, now):
+        """Prend en charge la plus ancienne nouvelle tentative due ; retourne son log ou None"""
+        from .models import WebhookLog
+
+        with transaction.atomic():
+            due = WebhookLog.objects.filter(status='retrying', next_attempt_at__lte=now).order_by('next_attempt_at')
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True, of=('self',))
+            log = due.first()
+            if log is not None:
+                # Redevient due si le processus s'arrête avant la fin de la tentative
+                lease = timedelta(seconds=self.timeout + RETRY_CLAIM_MARGIN)
+                WebhookLog.objects.filter(pk=log.pk).update(next_attempt_at=now + lease)
+        return log
+
+    def retry_due(self, limit=100):
+        """Exécute au plus `limit` nouvelles tentatives dues ; retourne le nombre traité"""
+        from .models import WebhookLog
+
+        count = 0
+        while count < limit:
+            log = self._claim_retry(timezone.now())
+            if log is None:
+                break
+            count += 1
+            webhook = self.get_webhook(log.webhook_id, log.event_type)
+            if webhook is None:
+                logger.info('Webhook %s désactivé ou supprimé, nouvelle tentative abandonnée', log.webhook_id)
+            else:
+                self.deliver(webhook, log.event_type, log.payload, log.attempt_number + 1)
+            WebhookLog.objects.filter(pk=log.pk).update(next_attempt_at=None)
+        return count
+
+    # Livraison
+
+    def max_attempts(self, webhook):
+        if not webhook.retry_on_failure:
+            return 1
+        return max(webhook.max_retries, 1)
+
+    def deliver(self, webhook, event_type, payload, attempt=1, retry=True):
+        """
+        Envoie une requête au webhook et enregistre le résultat dans WebhookLog.
+        Le log est au statut 'retrying' si une nouvelle tentative doit suivre :
+        elle est planifiée à next_attempt_at (voir retry_due).
+        """
+        from .models import WebhookLog
+
+        body = json.dumps(payload, separators=(',', ':')).encode()
+        timestamp = str(int(time.time()))
+
+        headers = {}
+        for name, value in (webhook.custom_headers or {}).items():
+            if name.lower() not in RESERVED_HEADERS:
+                headers[name] = str(value)
+        headers.update({
+            'Content-Type': 'application/json',
+            'User-Agent': USER_AGENT,
+            'X-HostMail-Event': event_type,
+            'X-HostMail-Delivery': uuid.uuid4().hex,
+            'X-HostMail-Timestamp': timestamp,
+        })
+        if webhook.secret:
+            headers['X-HostMail-Signature'] = 'sha256=' + sign_payload(webhook.secret, timestamp, body)
+
+        status_code = None
+        response_body = ''
+        error_message = ''
+        started = time.perf_counter()
+        try:
+            check_destination(webhook.url)
+            response = self.session.post(
+                webhook.url, data=body, headers=headers, timeout=self.timeout, allow_redirects=False
+            )
+            status_code = response.status_code
+            response_body = response.text[:MAX_RESPONSE_BODY]
+            success = 200 <= status_code < 300
+            if not success:
+                error_message = f'HTTP {status_code}'
+        except requests.RequestException as exc:
+            success = False
+            error_message = str(exc)[:MAX_RESPONSE_BODY]
+        duration_ms = int((time.perf_counter() - started) * 1000)
+
+        next_attempt_at = None
+        if success:
+            log_status = 'success'
+        elif retry and attempt < self.max_attempts(webhook):
+            log_status = 'retrying'
+            next_attempt_at = timezone.now() + timedelta(seconds=self.backoff * (2 ** (attempt - 1)))
+        else:
+            log_status = 'failed'
+
+        log = WebhookLog.objects.create(
+            webhook=webhook,
+            event_type=event_type,
+            status=log_status,
+            payload=payload,
+            response_status_code=status_code,
+            response_body=response_body,
+            error_message=error_message,
+            attempt_number=attempt,
+            duration_ms=duration_ms,
+            next_attempt_at=next_attempt_at,
+        )
+
+        webhook_stats.record(webhook.id, success)
+
+        return log
+
+
+dispatcher = WebhookDispatcher()
+
+
+class RetryWorker(PeriodicWorker):
+    """Worker en processus : exécute les nouvelles tentatives dues à intervalle régulier"""
+
+    interval_setting = 'WEBHOOK_RETRY_INTERVAL'
+    default_interval = 5
+    thread_name = 'webhook-retries'
+    error_message = 'Échec des nouvelles tentatives de webhooks'
+
+    def run_once(self):
+        while dispatcher.retry_due():
+            pass
+
+
+retry_worker = RetryWorker()
+
+
+def trigger_webhooks(website_id, event_type, data):
+    """Raccourci pour déclencher un événement webhook"""
+    dispatcher.dispatch(website_id, event_type, data)
@@ -0,0 +1,38 @@
+"""
+Exécution des nouvelles tentatives de webhooks dues
+
+Usage: python manage.py retry_webhooks [--loop]
+
+Sans --loop : traite les tentatives dues puis s'arrête (cron).
+Avec --loop : worker dédié, un passage toutes les WEBHOOK_RETRY_INTERVAL
+secondes (à utiliser avec WEBHOOK_RETRY_WORKER=False sur les serveurs web).
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from webhooks.delivery import dispatcher
+
+
+class Command(BaseCommand):
+    help = "Exécute les nouvelles tentatives de webhooks dues"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Tourne en continu')
+
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            while True:
+                count = dispatcher.retry_due()
+                total += count
+                if not count:
+                    break
+            if total:
+                self.stdout.write(f"{total} nouvelle(s) tentative(s) de webhook exécutée(s)")
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(getattr(settings, 'WEBHOOK_RETRY_INTERVAL', 5))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='webhooklog',
+            index=models.Index(fields=['webhook', '-created_at', '-id'], name='webhook_log_webhook_970c13_idx'),
+        ),
+    ]
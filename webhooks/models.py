@@ -94,20 +94,24 @@ class Webhook(models.Model):
         return f"{self.website.name} - {self.name}"
 
     def increment_success(self):
-        """Incrémente le compteur de succès"""
+        """Incrémente le compteur de succès (atomique)"""
         from django.utils import timezone
-        self.total_calls += 1
-        self.successful_calls += 1
-        self.last_triggered_at = timezone.now()
-        self.save(update_fields=['total_calls', 'successful_calls', 'last_triggered_at'])
+        Webhook.objects.filter(pk=self.pk).update(
+            total_calls=models.F('total_calls') + 1,
+            successful_calls=models.F('successful_calls') + 1,
+            last_triggered_at=timezone.now()
+        )
+        self.refresh_from_db(fields=['total_calls', 'successful_calls', 'last_triggered_at'])
 
     def increment_failure(self):
-        """Incrémente le compteur d'échecs"""
+        """Incrémente le compteur d'échecs (atomique)"""
         from django.utils import timezone
-        self.total_calls += 1
-        self.failed_calls += 1
-        self.last_triggered_at = timezone.now()
-        self.save(update_fields=['total_calls', 'failed_calls', 'last_triggered_at'])
+        Webhook.objects.filter(pk=self.pk).update(
+            total_calls=models.F('total_calls') + 1,
+            failed_calls=models.F('failed_calls') + 1,
+            last_triggered_at=timezone.now()
+        )
+        self.refresh_from_db(fields=['total_calls', 'failed_calls', 'last_triggered_at'])
 
 
 class WebhookLog(models.Model):
@@ -169,6 +173,11 @@ class WebhookLog(models.Model):
         blank=True,
         verbose_name=_("Durée (ms)")
     )
+    next_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Prochaine tentative")
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -180,6 +189,8 @@ class WebhookLog(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['webhook', 'status', '-created_at']),
+            models.Index(fields=['webhook', '-created_at', '-id']),  # pagination par curseur
+            models.Index(fields=['status', 'next_attempt_at']),  # nouvelles tentatives dues
         ]
 
     def __str__(self):
@@ -0,0 +1,66 @@
+"""
+Signals pour déclencher les webhooks sur les événements des contacts et projets
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from contacts.models import ContactMessage
+from projects.models import Project
+from .delivery import trigger_webhooks
+
+
+def contact_data(message):
+    """Données d'un message de contact envoyées aux webhooks"""
+    return {
+        'id': message.id,
+        'form_data': message.form_data,
+        'email': message.email,
+        'name': message.name,
+        'subject': message.subject,
+        'message': message.message,
+        'status': message.status,
+        'created_at': message.created_at,
+    }
+
+
+def project_data(project):
+    """Données d'un projet envoyées aux webhooks"""
+    return {
+        'id': project.id,
+        'title': project.title,
+        'slug': project.slug,
+        'status': project.status,
+        'is_featured': project.is_featured,
+        'published_at': project.published_at,
+        'updated_at': project.updated_at,
+    }
+
+
+@receiver(post_save, sender=ContactMessage)
+def contact_message_saved(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Déclenche contact.received à la création (sauf spam détecté), contact.read /
+    contact.replied lors d'un changement de statut
+    """
+    if created:
+        if instance.status == 'spam':
+            return
+        trigger_webhooks(instance.website_id, 'contact.received', contact_data(instance))
+    elif update_fields and 'status' in update_fields and instance.status in ('read', 'replied'):
+        trigger_webhooks(instance.website_id, f'contact.{instance.status}', contact_data(instance))
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, **kwargs):
+    """
+    Déclenche project.created ou project.updated
+    """
+    event_type = 'project.created' if created else 'project.updated'
+    trigger_webhooks(instance.website_id, event_type, project_data(instance))
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    """
+    Déclenche project.deleted
+    """
+    trigger_webhooks(instance.website_id, 'project.deleted', project_data(instance))
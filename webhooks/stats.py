@@ -0,0 +1,67 @@
+"""
+Statistiques des webhooks écrites par lots
+
+Chaque livraison ajoute un delta (succès / échec) par webhook en mémoire ;
+les deltas sont appliqués périodiquement avec des expressions F() atomiques,
+une requête UPDATE par webhook et par flush, sans lecture préalable.
+last_triggered_at ne recule jamais : un lot plus ancien (autre processus,
+lot réintégré après un échec) ne l'écrase pas.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from core.buffers import BufferedWriter
+
+
+class WebhookStatsBuffer(BufferedWriter):
+    """Accumulateur des compteurs total_calls / successful_calls / failed_calls"""
+
+    interval_setting = 'WEBHOOK_STATS_FLUSH_INTERVAL'
+    max_pending_setting = 'WEBHOOK_STATS_FLUSH_MAX_CALLS'
+    default_interval = 5
+    default_max_pending = 1000
+    thread_name = 'webhook-stats-flusher'
+
+    def reset(self):
+        # webhook_id -> [succès, échecs, dernier déclenchement]
+        self._deltas = {}
+
+    def snapshot(self):
+        return self._deltas
+
+    def merge(self, batch):
+        for webhook_id, (successes, failures, triggered_at) in batch.items():
+            self._add(webhook_id, successes, failures, triggered_at)
+
+    def _add(self, webhook_id, successes, failures, triggered_at):
+        delta = self._deltas.get(webhook_id)
+        if delta is None:
+            self._deltas[webhook_id] = [successes, failures, triggered_at]
+        else:
+            delta[0] += successes
+            delta[1] += failures
+            delta[2] = max(delta[2], triggered_at)
+
+    def record(self, webhook_id, success):
+        """Enregistre le résultat d'un appel (aucune requête SQL)"""
+        with self._lock:
+            self._add(webhook_id, int(success), int(not success), timezone.now())
+            self._pending += 1
+        self.added()
+
+    def write(self, batch):
+        from .models import Webhook
+
+        with transaction.atomic():
+            for webhook_id, (successes, failures, triggered_at) in batch.items():
+                Webhook.objects.filter(pk=webhook_id).update(
+                    total_calls=F('total_calls') + successes + failures,
+                    successful_calls=F('successful_calls') + successes,
+                    failed_calls=F('failed_calls') + failures,
+                    last_triggered_at=Greatest(Coalesce(F('last_triggered_at'), triggered_at), triggered_at),
+                )
+
+
+webhook_stats = WebhookStatsBuffer()
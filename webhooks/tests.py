@@ -1,3 +1,307 @@
-from django.test import TestCase
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from contacts.models import ContactMessage
+from websites.models import Website
+from .delivery import BlockedDestination, check_destination, dispatcher, sign_payload
+from .models import Webhook, WebhookLog
+from .stats import webhook_stats
+
+User = get_user_model()
+
+
+class StubWebhookServer:
+    """Serveur HTTP local qui enregistre les requêtes reçues"""
+
+    def __init__(self, statuses=None):
+        self.statuses = list(statuses or [200])
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                server.requests.append((dict(self.headers), body))
+                code = server.statuses.pop(0) if len(server.statuses) > 1 else server.statuses[0]
+                self.send_response(code)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/hook'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@override_settings(
+    WEBHOOK_ASYNC=False, WEBHOOK_RETRY_BACKOFF=0, WEBHOOK_ALLOW_PRIVATE_NETWORKS=True, ANALYTICS_FLUSH_INTERVAL=0,
+    WEBHOOK_STATS_FLUSH_INTERVAL=0, WEBHOOK_STATS_FLUSH_MAX_CALLS=100000
+)
+class WebhookDeliveryTests(TestCase):
+    """Tests pour la livraison des webhooks"""
+
+    def setUp(self):
+        webhook_stats.flush()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+
+    def create_webhook(self, url, **kwargs):
+        kwargs.setdefault('events', ['contact.received'])
+        return Webhook.objects.create(
+            website=self.website, name='Hook', url=url, secret='s3cret', **kwargs
+        )
+
+    def create_message(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ContactMessage.objects.create(
+                website=self.website, form_data={'email': 'a@example.com'}, email='a@example.com'
+            )
+
+    def run_retries(self):
+        """Exécute les nouvelles tentatives dues (backoff nul) jusqu'à épuisement"""
+        while dispatcher.retry_due():
+            pass
+
+    def test_contact_received_is_signed(self):
+        """Test que l'événement est livré et signé en HMAC-SHA256"""
+        with StubWebhookServer() as server:
+            webhook = self.create_webhook(server.url, custom_headers={'X-Custom': '1'})
+            message = self.create_message()
+
+        self.assertEqual(len(server.requests), 1)
+        headers, body = server.requests[0]
+        expected = sign_payload('s3cret', headers['X-HostMail-Timestamp'], body)
+        self.assertEqual(headers['X-HostMail-Signature'], f'sha256={expected}')
+        self.assertEqual(headers['X-HostMail-Event'], 'contact.received')
+        self.assertEqual(headers['X-Custom'], '1')
+        self.assertEqual(json.loads(body)['data']['id'], message.id)
+
+        log = WebhookLog.objects.get(webhook=webhook)
+        self.assertEqual(log.status, 'success')
+        self.assertEqual(log.response_status_code, 200)
+        self.assertIsNotNone(log.duration_ms)
+
+    def test_retries_until_success(self):
+        """Test des nouvelles tentatives en cas d'erreur serveur"""
+        with StubWebhookServer(statuses=[500, 502, 200]) as server:
+            webhook = self.create_webhook(server.url, max_retries=3)
+            self.create_message()
+            self.assertEqual(len(server.requests), 1)
+            self.run_retries()
+
+        self.assertEqual(len(server.requests), 3)
+        logs = list(WebhookLog.objects.filter(webhook=webhook).order_by('attempt_number'))
+        self.assertEqual([log.status for log in logs], ['retrying', 'retrying', 'success'])
+        self.assertEqual([log.response_status_code for log in logs], [500, 502, 200])
+
+        webhook_stats.flush()
+        webhook.refresh_from_db()
+        self.assertEqual(
+            (webhook.total_calls, webhook.successful_calls, webhook.failed_calls), (3, 1, 2)
+        )
+        self.assertIsNotNone(webhook.last_triggered_at)
+        self.assertFalse(WebhookLog.objects.filter(next_attempt_at__isnull=False).exists())
+
+    def test_gives_up_after_max_retries(self):
+        """Test de l'abandon après max_retries tentatives"""
+        with StubWebhookServer(statuses=[500]) as server:
+            webhook = self.create_webhook(server.url, max_retries=2)
+            self.create_message()
+            self.run_retries()
+
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(WebhookLog.objects.filter(webhook=webhook, status='failed').count(), 1)
+
+    def test_unsubscribed_or_inactive_webhooks_ignored(self):
+        """Test que seuls les webhooks actifs abonnés à l'événement sont appelés"""
+        with StubWebhookServer() as server:
+            self.create_webhook(server.url, events=['project.created'])
+            self.create_webhook(server.url, is_active=False)
+            self.create_message()
+
+        self.assertEqual(server.requests, [])
+
+    def test_connection_error_logged(self):
+        """Test qu'une erreur réseau est enregistrée comme un échec"""
+        webhook = self.create_webhook('http://127.0.0.1:9/hook', retry_on_failure=False)
+        log = dispatcher.deliver(webhook, 'contact.received', {'event': 'contact.received'})
+        self.assertEqual(log.status, 'failed')
+        self.assertIsNone(log.response_status_code)
+        self.assertTrue(log.error_message)
+
+
+    def test_retry_reloads_webhook(self):
+        """Test qu'une nouvelle tentative relit l'URL du webhook et ignore un webhook désactivé"""
+        with StubWebhookServer(statuses=[500]) as first, StubWebhookServer() as second:
+            webhook = self.create_webhook(first.url, max_retries=3)
+            self.create_message()
+            Webhook.objects.filter(pk=webhook.pk).update(url=second.url)
+            self.run_retries()
+        self.assertEqual((len(first.requests), len(second.requests)), (1, 1))
+
+        with StubWebhookServer(statuses=[500]) as server:
+            webhook.url = server.url
+            webhook.save()
+            self.create_message()
+            Webhook.objects.filter(pk=webhook.pk).update(is_active=False)
+            self.run_retries()
+        self.assertEqual(len(server.requests), 1)
+        self.assertFalse(WebhookLog.objects.filter(next_attempt_at__isnull=False).exists())
+
+    @override_settings(WEBHOOK_RETRY_BACKOFF=60)
+    def test_retry_is_persisted(self):
+        """Test que la nouvelle tentative est planifiée en base, sans attente dans le thread appelant"""
+        from datetime import timedelta
+        from django.utils import timezone
+        with StubWebhookServer(statuses=[500, 200]) as server:
+            webhook = self.create_webhook(server.url, max_retries=3)
+            self.create_message()
+            log = WebhookLog.objects.get(webhook=webhook)
+            self.assertEqual(log.status, 'retrying')
+            self.assertGreater(log.next_attempt_at, timezone.now() + timedelta(seconds=50))
+            self.assertEqual(dispatcher.retry_due(), 0)
+
+            # Tentative due (par exemple après un redémarrage)
+            WebhookLog.objects.filter(pk=log.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(dispatcher.retry_due(), 1)
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(WebhookLog.objects.get(webhook=webhook, attempt_number=2).status, 'success')
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_NETWORKS=False)
+    def test_private_destinations_refused(self):
+        """Test que les adresses non publiques sont refusées avant tout envoi"""
+        for url in ('http://127.0.0.1/hook', 'http://10.0.0.5/', 'http://169.254.169.254/latest/meta-data/',
+                    'http://[::1]:8000/', 'http://[::ffff:192.168.1.1]/', 'ftp://example.com/', 'http:///'):
+            with self.assertRaises(BlockedDestination, msg=url):
+                check_destination(url)
+        check_destination('https://93.184.216.34/hook')
+
+        with StubWebhookServer() as server:
+            webhook = self.create_webhook(server.url)
+            log = dispatcher.deliver(webhook, 'contact.received', {'event': 'contact.received'}, retry=False)
+        self.assertEqual(server.requests, [])
+        self.assertEqual(log.status, 'failed')
+        self.assertIn('Destination refusée', log.error_message)
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_NETWORKS=False)
+    def test_rebinding_refused_at_connect(self):
+        """Test qu'un hôte vérifié public mais connecté à une adresse privée est refusé (DNS rebinding)"""
+        from unittest import mock
+        with StubWebhookServer() as server:
+            webhook = self.create_webhook(server.url)
+            with mock.patch('webhooks.delivery.check_destination'):
+                log = dispatcher.deliver(webhook, 'contact.received', {'event': 'contact.received'}, retry=False)
+        self.assertEqual(server.requests, [])
+        self.assertEqual(log.status, 'failed')
+        self.assertIn('Destination refusée', log.error_message)
+
+
+@override_settings(WEBHOOK_STATS_FLUSH_INTERVAL=0, WEBHOOK_STATS_FLUSH_MAX_CALLS=1000000)
+class WebhookStatsBufferTests(TestCase):
+    """Tests pour les statistiques de webhooks écrites par lots"""
+
+    def setUp(self):
+        webhook_stats.flush()
+        user = User.objects.create_user(email='owner@example.com', password='password123')
+        website = Website.objects.create(user=user, name='Site', domain='example.com')
+        self.webhooks = [
+            Webhook.objects.create(website=website, name=f'Hook {i}', url='http://127.0.0.1/', events=[])
+            for i in range(4)
+        ]
+
+    def test_concurrent_records_are_not_lost(self):
+        """Test de charge : aucun appel n'est perdu malgré des flush concurrents"""
+        from unittest import mock
+        threads_count, calls_per_thread = 16, 2000
+        flushed = {webhook.id: [0, 0] for webhook in self.webhooks}
+        done = threading.Event()
+
+        def write_in_memory(batch):
+            for webhook_id, (successes, failures, _) in batch.items():
+                flushed[webhook_id][0] += successes
+                flushed[webhook_id][1] += failures
+
+        def worker(index):
+            for call in range(calls_per_thread):
+                webhook = self.webhooks[(index + call) % len(self.webhooks)]
+                webhook_stats.record(webhook.id, success=call % 3 != 0)
+
+        def flusher():
+            while not done.is_set():
+                webhook_stats.flush()
+
+        with mock.patch.object(webhook_stats, 'write', side_effect=write_in_memory):
+            flusher_thread = threading.Thread(target=flusher)
+            flusher_thread.start()
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(threads_count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            done.set()
+            flusher_thread.join()
+            webhook_stats.flush()
+
+        expected_failures = threads_count * len(range(0, calls_per_thread, 3))
+        self.assertEqual(sum(s + f for s, f in flushed.values()), threads_count * calls_per_thread)
+        self.assertEqual(sum(f for _, f in flushed.values()), expected_failures)
+        self.assertEqual(webhook_stats.pending(), 0)
+
+    def test_flush_applies_deltas_atomically(self):
+        """Test que le flush applique les deltas avec un UPDATE par webhook"""
+        for webhook in self.webhooks:
+            for call in range(10):
+                webhook_stats.record(webhook.id, success=call < 7)
+
+        with self.assertNumQueries(len(self.webhooks) + 2):  # UPDATE par webhook + SAVEPOINT
+            self.assertEqual(webhook_stats.flush(), 40)
+
+        for webhook in Webhook.objects.all():
+            self.assertEqual(
+                (webhook.total_calls, webhook.successful_calls, webhook.failed_calls), (10, 7, 3)
+            )
+            self.assertIsNotNone(webhook.last_triggered_at)
+
+    def test_failed_flush_is_merged_back(self):
+        """Test qu'un lot non écrit est réintégré"""
+        from unittest import mock
+        webhook_stats.record(self.webhooks[0].id, success=True)
+        with mock.patch.object(Webhook.objects, 'filter', side_effect=RuntimeError), \
+                self.assertLogs('core.buffers', level='ERROR'):
+            self.assertEqual(webhook_stats.flush(), 0)
+        self.assertEqual(webhook_stats.pending(), 1)
+        self.assertEqual(webhook_stats.flush(), 1)
+        self.webhooks[0].refresh_from_db()
+        self.assertEqual(self.webhooks[0].successful_calls, 1)
+
+    def test_last_triggered_at_never_moves_back(self):
+        """Test qu'un lot plus ancien n'écrase pas un last_triggered_at plus récent"""
+        from datetime import timedelta
+        from django.utils import timezone
+        recent = timezone.now()
+        webhook = self.webhooks[0]
+        webhook_stats.write({webhook.id: [1, 0, recent - timedelta(minutes=5)]})
+        webhook.refresh_from_db()
+        self.assertEqual(webhook.last_triggered_at, recent - timedelta(minutes=5))
+
+        webhook_stats.write({webhook.id: [1, 0, recent]})
+        webhook_stats.write({webhook.id: [0, 1, recent - timedelta(minutes=1)]})
+        webhook.refresh_from_db()
+        self.assertEqual(webhook.last_triggered_at, recent)
+        self.assertEqual(webhook.total_calls, 3)
@@ -2,7 +2,9 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from core.pagination import KeysetPagination
 from core.permissions import IsWebsiteOwner
+from .delivery import dispatcher, build_payload
 from .models import Webhook, WebhookLog
 from .serializers import (
     WebhookSerializer,
@@ -40,23 +42,20 @@ class WebhookViewSet(viewsets.ModelViewSet):
 
         if serializer.is_valid():
             event_type = serializer.validated_data['event_type']
-            test_payload = serializer.validated_data.get('test_payload', {
-                'event': event_type,
-                'test': True,
-                'timestamp': '2024-01-01T00:00:00Z',
-                'data': {}
-            })
+            test_payload = serializer.validated_data.get(
+                'test_payload',
+                build_payload(event_type, webhook.website_id, {'test': True})
+            )
 
-            # TODO: Implémenter l'envoi du webhook test
-            # from webhooks.utils import send_webhook
-            # result = send_webhook(webhook, event_type, test_payload)
+            # Envoi synchrone d'une seule tentative (sans nouvelle tentative)
+            log = dispatcher.deliver(webhook, event_type, test_payload, retry=False)
 
             return Response({
-                'message': 'Webhook de test envoyé',
+                'message': 'Webhook de test envoyé' if log.status == 'success' else 'Échec du webhook de test',
                 'webhook': webhook.name,
                 'event_type': event_type,
                 'payload': test_payload,
-                'note': 'Implémentation réelle à venir'
+                'result': WebhookLogSerializer(log).data
             })
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -82,6 +81,7 @@ class WebhookLogViewSet(viewsets.ReadOnlyModelViewSet):
 
     serializer_class = WebhookLogSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination  # ?pagination=cursor pour paginer par curseur
 
     def get_queryset(self):
         """Retourne les logs des webhooks de l'utilisateur"""
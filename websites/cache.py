@@ -0,0 +1,125 @@
+"""
+Résolution des API keys avec cache à deux niveaux
+
+Niveau 1 : LRU en mémoire du processus (TTL court, aucune I/O)
+Niveau 2 : cache Django configuré (Redis en production), partagé entre workers
+
+Les clés inconnues sont mises en cache négatif pour protéger la base
+contre les tentatives de devinette de clés.
+"""
+import hashlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import LocalLRUCache, invalidate_two_tier
+from subscriptions.plans import get_catalog
+
+
+WebsiteSnapshot = namedtuple('WebsiteSnapshot', [
+    'id',
+    'user_id',
+    'is_active',
+    'subscription_status',
+    'plan',
+    'websites_limit',
+    'contacts_per_month',
+    'projects_limit',
+    'storage_mb',
+    'allowed_origins',
+])
+
+# Marqueur stocké pour les clés inconnues (cache négatif)
+UNKNOWN_KEY = 'unknown'
+
+CACHE_KEY_PREFIX = 'hostmail:apikey:'
+
+_local_cache = LocalLRUCache(
+    maxsize=getattr(settings, 'APIKEY_CACHE_LOCAL_MAXSIZE', 4096),
+    ttl=getattr(settings, 'APIKEY_CACHE_LOCAL_TTL', 5),
+)
+
+
+def _cache_key(api_key):
+    """
+    Clé de cache dérivée de l'API key (jamais stockée en clair) et de la
+    version du catalogue des plans : les limites en cache suivent un changement de plans
+    """
+    digest = hashlib.sha256(api_key.encode()).hexdigest()
+    return f'{CACHE_KEY_PREFIX}{get_catalog().version}:{digest}'
+
+
+def _load_snapshot(api_key):
+    """Charge le snapshot depuis la base (une seule requête, sans instancier de modèles)"""
+    from .models import Website, parse_origins
+
+    row = Website.objects.filter(api_key=api_key).values_list(
+        'id',
+        'user_id',
+        'is_active',
+        'user__subscription__status',
+        'user__subscription__plan',
+        'user__subscription__limit_overrides',
+        'allowed_origins',
+    ).first()
+
+    if row is None:
+        return None
+
+    website_id, user_id, is_active, status, plan, overrides, allowed_origins = row
+    limits = get_catalog().limits(plan, overrides)
+    return WebsiteSnapshot(
+        website_id, user_id, is_active, status, plan,
+        limits['websites_limit'], limits['contacts_per_month'], limits['projects_limit'], limits['storage_mb'],
+        # Précalculé une fois : le middleware CORS ne fait qu'un test d'appartenance
+        allowed_origins=parse_origins(allowed_origins),
+    )
+
+
+def resolve_api_key(api_key):
+    """
+    Retourne le WebsiteSnapshot associé à l'API key, ou None si la clé est inconnue
+    """
+    key = _cache_key(api_key)
+
+    cached = _local_cache.get(key)
+    if cached is None:
+        cached = cache.get(key)
+        if cached is not None:
+            _local_cache.set(key, cached)
+
+    if cached is None:
+        snapshot = _load_snapshot(api_key)
+        if snapshot is None:
+            cached = UNKNOWN_KEY
+            cache.set(key, cached, getattr(settings, 'APIKEY_CACHE_NEGATIVE_TTL', 30))
+        else:
+            cached = tuple(snapshot)
+            cache.set(key, cached, getattr(settings, 'APIKEY_CACHE_TTL', 300))
+        _local_cache.set(key, cached)
+
+    if cached == UNKNOWN_KEY:
+        return None
+    return WebsiteSnapshot(*cached)
+
+
+def invalidate_api_keys(*api_keys):
+    """
+    Invalide les entrées de cache des API keys données (rejoué après le
+    commit, voir core.cache.invalidate_two_tier)
+    """
+    invalidate_two_tier(_local_cache, [_cache_key(api_key) for api_key in api_keys if api_key])
+
+
+def invalidate_user_websites(user_id):
+    """Invalide les API keys de tous les sites web d'un utilisateur"""
+    from .models import Website
+
+    api_keys = list(Website.objects.filter(user_id=user_id).values_list('api_key', flat=True))
+    invalidate_api_keys(*api_keys)
+
+
+def clear_local_cache():
+    """Vide le cache local du processus (utile pour les tests)"""
+    _local_cache.clear()
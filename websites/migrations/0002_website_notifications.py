@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('websites', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='website',
+            name='notification_digest_minutes',
+            field=models.PositiveIntegerField(default=60, verbose_name='Intervalle du résumé (minutes)'),
+        ),
+        migrations.AddField(
+            model_name='website',
+            name='notification_email',
+            field=models.EmailField(blank=True, help_text='Par défaut : email du propriétaire', max_length=254, verbose_name='Email de notification'),
+        ),
+        migrations.AddField(
+            model_name='website',
+            name='notification_mode',
+            field=models.CharField(choices=[('instant', 'Immédiate'), ('digest', 'Résumé périodique'), ('off', 'Désactivée')], default='instant', max_length=10, verbose_name='Notifications email'),
+        ),
+    ]
@@ -9,6 +9,27 @@ def generate_api_key():
     return f"hm_{secrets.token_urlsafe(32)}"
 
 
+def normalize_origin(origin):
+    """Origine comparable à l'en-tête Origin : sans espace, sans / final, en minuscules"""
+    return origin.strip().rstrip('/').lower()
+
+
+def parse_origins(text):
+    """Origines autorisées (une par ligne) sous forme de frozenset normalisé"""
+    return frozenset(normalize_origin(line) for line in (text or '').split('\n') if line.strip())
+
+
+def origin_allowed(allowed_origins, origin):
+    """Aucune restriction (ensemble vide ou '*') ou origine présente dans l'ensemble"""
+    if not allowed_origins or '*' in allowed_origins:
+        return True
+    return normalize_origin(origin) in allowed_origins
+
+
+# Champs repris dans le snapshot mis en cache par le middleware API key
+SNAPSHOT_FIELDS = frozenset(['api_key', 'is_active', 'allowed_origins', 'user'])
+
+
 class Website(models.Model):
     """Modèle pour gérer les sites web des utilisateurs"""
 
@@ -52,6 +73,28 @@ class Website(models.Model):
         help_text=_("Une origine par ligne. Ex: https://example.com")
     )
 
+    # Notifications email des nouveaux messages (voir contacts.notifications)
+    NOTIFICATION_MODE_CHOICES = [
+        ('instant', 'Immédiate'),
+        ('digest', 'Résumé périodique'),
+        ('off', 'Désactivée'),
+    ]
+    notification_mode = models.CharField(
+        max_length=10,
+        choices=NOTIFICATION_MODE_CHOICES,
+        default='instant',
+        verbose_name=_("Notifications email")
+    )
+    notification_email = models.EmailField(
+        blank=True,
+        verbose_name=_("Email de notification"),
+        help_text=_("Par défaut : email du propriétaire")
+    )
+    notification_digest_minutes = models.PositiveIntegerField(
+        default=60,
+        verbose_name=_("Intervalle du résumé (minutes)")
+    )
+
     # Compteurs
     total_contacts = models.IntegerField(
         default=0,
@@ -75,10 +118,22 @@ class Website(models.Model):
     def __str__(self):
         return f"{self.name} ({self.domain})"
 
+    def save(self, *args, **kwargs):
+        """Invalide le cache de résolution de l'API key si nécessaire"""
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or not SNAPSHOT_FIELDS.isdisjoint(update_fields):
+            from .cache import invalidate_api_keys
+            invalidate_api_keys(self.api_key)
+
     def regenerate_api_key(self):
         """Régénère une nouvelle clé API"""
+        old_api_key = self.api_key
         self.api_key = generate_api_key()
         self.save(update_fields=['api_key'])
+
+        from .cache import invalidate_api_keys
+        invalidate_api_keys(old_api_key)
         return self.api_key
 
     def get_allowed_origins_list(self):
@@ -87,9 +142,15 @@ class Website(models.Model):
             return []
         return [origin.strip() for origin in self.allowed_origins.split('\n') if origin.strip()]
 
+    @property
+    def allowed_origins_set(self):
+        """frozenset des origines autorisées, recalculé seulement si le champ change"""
+        cached = self.__dict__.get('_allowed_origins_cache')
+        if cached is None or cached[0] != self.allowed_origins:
+            cached = (self.allowed_origins, parse_origins(self.allowed_origins))
+            self.__dict__['_allowed_origins_cache'] = cached
+        return cached[1]
+
     def is_origin_allowed(self, origin):
-        """Vérifie si une origine est autorisée"""
-        if not self.allowed_origins:
-            return True  # Si aucune restriction, tout est autorisé
-        allowed = self.get_allowed_origins_list()
-        return origin in allowed
+        """Vérifie si une origine est autorisée (aucune restriction si la liste est vide)"""
+        return origin_allowed(self.allowed_origins_set, origin)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from subscriptions.entitlements import get_entitlements
 from .models import Website
 
 
@@ -17,11 +18,17 @@ class WebsiteSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'user', 'name', 'domain', 'description',
             'api_key', 'is_active', 'allowed_origins', 'allowed_origins_list',
+            'notification_mode', 'notification_email', 'notification_digest_minutes',
             'total_contacts', 'total_projects',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['user', 'api_key', 'total_contacts', 'total_projects', 'created_at', 'updated_at']
 
+    def validate_notification_digest_minutes(self, value):
+        if not 5 <= value <= 10080:
+            raise serializers.ValidationError("Entre 5 minutes et 7 jours.")
+        return value
+
     def validate(self, attrs):
         """Validation personnalisée"""
         # Convertir la liste d'origines en texte multi-lignes
@@ -32,10 +39,10 @@ class WebsiteSerializer(serializers.ModelSerializer):
         # Vérifier la limite de sites web
         request = self.context.get('request')
         if request and not self.instance:  # Création uniquement
-            subscription = request.user.subscription
-            if not subscription.can_add_website():
+            entitlements = get_entitlements(request)
+            if not entitlements.can_add_website():
                 raise serializers.ValidationError(
-                    f"Limite de sites web atteinte ({subscription.websites_limit}). "
+                    f"Limite de sites web atteinte ({entitlements.websites_limit}). "
                     f"Passez à un plan supérieur pour créer plus de sites."
                 )
 
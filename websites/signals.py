@@ -0,0 +1,15 @@
+"""
+Signals pour la gestion du cache des sites web
+"""
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .cache import invalidate_api_keys
+from .models import Website
+
+
+@receiver(post_delete, sender=Website)
+def invalidate_deleted_website(sender, instance, **kwargs):
+    """
+    Retire l'API key d'un site supprimé du cache de résolution
+    """
+    invalidate_api_keys(instance.api_key)
@@ -1,3 +1,311 @@
-from django.test import TestCase
+import unittest
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from .cache import resolve_api_key, clear_local_cache
+from .models import Website
+
+User = get_user_model()
+
+
+class APIKeyCacheTests(TestCase):
+    """Tests pour le cache de résolution des API keys"""
+
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(
+            user=self.user,
+            name='Site',
+            domain='example.com',
+            allowed_origins='https://example.com\nhttps://www.example.com'
+        )
+
+    def test_resolve_snapshot(self):
+        """Test que le snapshot contient les informations du site et de l'abonnement"""
+        snapshot = resolve_api_key(self.website.api_key)
+        self.assertEqual(snapshot.id, self.website.id)
+        self.assertEqual(snapshot.subscription_status, 'active')
+        self.assertEqual(snapshot.contacts_per_month, 50)
+        self.assertEqual(snapshot.allowed_origins, frozenset({'https://example.com', 'https://www.example.com'}))
+
+    def test_resolve_is_cached(self):
+        """Test qu'une clé résolue ne retouche pas la base"""
+        resolve_api_key(self.website.api_key)
+        with self.assertNumQueries(0):
+            resolve_api_key(self.website.api_key)
+        clear_local_cache()
+        with self.assertNumQueries(0):
+            resolve_api_key(self.website.api_key)
+
+    def test_unknown_key_negative_cache(self):
+        """Test que les clés inconnues sont mises en cache négatif"""
+        self.assertIsNone(resolve_api_key('hm_unknown'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(resolve_api_key('hm_unknown'))
+
+    def test_regenerate_invalidates_old_key(self):
+        """Test que la rotation de clé invalide l'ancienne"""
+        old_key = self.website.api_key
+        resolve_api_key(old_key)
+        new_key = self.website.regenerate_api_key()
+        self.assertIsNone(resolve_api_key(old_key))
+        self.assertEqual(resolve_api_key(new_key).id, self.website.id)
+
+    def test_website_save_invalidates(self):
+        """Test que la désactivation du site est prise en compte"""
+        resolve_api_key(self.website.api_key)
+        self.website.is_active = False
+        self.website.save()
+        self.assertFalse(resolve_api_key(self.website.api_key).is_active)
+
+    def test_subscription_save_invalidates(self):
+        """Test que le changement de statut de l'abonnement est pris en compte"""
+        resolve_api_key(self.website.api_key)
+        subscription = self.user.subscription
+        subscription.status = 'suspended'
+        subscription.save()
+        self.assertEqual(resolve_api_key(self.website.api_key).subscription_status, 'suspended')
+
+    def test_unchanged_subscription_keeps_cache(self):
+        """Test qu'une sauvegarde sans changement du plan, du statut ou des exceptions n'invalide pas le cache"""
+        resolve_api_key(self.website.api_key)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Alice'
+        user.save()  # sauvegarde aussi l'abonnement (signal)
+        subscription = user.subscription
+        subscription.current_storage_mb = 12
+        subscription.save()
+        with self.assertNumQueries(0):
+            resolve_api_key(self.website.api_key)
+
+        subscription.limit_overrides['projects_limit'] = 20
+        subscription.save()
+        self.assertEqual(resolve_api_key(self.website.api_key).projects_limit, 20)
+
+    def test_counter_update_keeps_cache(self):
+        """Test que la mise à jour des compteurs n'invalide pas le cache"""
+        resolve_api_key(self.website.api_key)
+        self.website.total_contacts = 1
+        self.website.save(update_fields=['total_contacts'])
+        with self.assertNumQueries(0):
+            resolve_api_key(self.website.api_key)
+
+
+@override_settings(ANALYTICS_FLUSH_INTERVAL=0)
+class APIKeyMiddlewareTests(TestCase):
+    """Tests pour le middleware de validation des API keys"""
+
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+
+    def test_missing_key(self):
+        response = self.client.get('/api/public/projects/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_invalid_key(self):
+        response = self.client.get('/api/public/projects/', HTTP_X_API_KEY='hm_invalid')
+        self.assertEqual(response.status_code, 401)
+
+    def test_inactive_subscription(self):
+        subscription = self.user.subscription
+        subscription.status = 'expired'
+        subscription.save()
+        response = self.client.get('/api/public/projects/', HTTP_X_API_KEY=self.website.api_key)
+        self.assertEqual(response.status_code, 403)
+
+    def test_valid_key(self):
+        response = self.client.get('/api/public/projects/', HTTP_X_API_KEY=self.website.api_key)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(ANALYTICS_FLUSH_INTERVAL=0)
+class PublicRateLimitTests(TestCase):
+    """Tests pour la limitation de débit des endpoints publics"""
+
+    url = '/api/public/projects/'
+
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(user=self.user, name='Site', domain='example.com')
+
+    def get(self, ip='203.0.113.1'):
+        return self.client.get(self.url, HTTP_X_API_KEY=self.website.api_key, REMOTE_ADDR=ip)
+
+    @override_settings(RATELIMIT_PROJECT_VIEW='3/m')
+    def test_ip_budget_and_headers(self):
+        remaining = [int(self.get()['X-RateLimit-Remaining']) for _ in range(3)]
+        self.assertEqual(remaining, [2, 1, 0])
+
+        response = self.get()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['X-RateLimit-Limit'], '3')
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertEqual(self.get(ip='203.0.113.2').status_code, 200)
+
+    @override_settings(RATELIMIT_PROJECT_VIEW='2/m')
+    def test_rejected_requests_not_tracked(self):
+        """Test qu'une requête refusée (429) n'est pas comptée comme appel API"""
+        from analytics.ingestion import analytics_buffer
+        from analytics.models import AnalyticsEvent
+        analytics_buffer.discard()
+        statuses = [self.get().status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        analytics_buffer.flush()
+        self.assertEqual(AnalyticsEvent.objects.filter(event_type='api_call').count(), 2)
+
+    @override_settings(RATELIMIT_PROJECT_VIEW='2/m')
+    def test_forwarded_for_not_trusted(self):
+        """Test qu'un X-Forwarded-For fourni par le client ne contourne pas le budget par IP"""
+        statuses = [
+            self.client.get(self.url, HTTP_X_API_KEY=self.website.api_key,
+                            HTTP_X_FORWARDED_FOR=f'198.51.100.{index}', REMOTE_ADDR='203.0.113.1').status_code
+            for index in range(3)
+        ]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_client_ip_behind_trusted_proxies(self):
+        """Test de l'adresse retenue derrière des proxies de confiance"""
+        from django.test import RequestFactory
+        from core.ratelimit import client_ip
+        request = RequestFactory().get(
+            self.url, HTTP_X_FORWARDED_FOR='198.51.100.7, 203.0.113.9, 10.0.0.2', REMOTE_ADDR='10.0.0.1'
+        )
+        self.assertEqual(client_ip(request), '10.0.0.1')
+        with override_settings(RATELIMIT_TRUSTED_PROXIES=2):
+            self.assertEqual(client_ip(request), '203.0.113.9')
+        with override_settings(RATELIMIT_TRUSTED_PROXIES=10):
+            self.assertEqual(client_ip(request), '198.51.100.7')
+
+    def test_plan_budget_per_api_key(self):
+        from django.conf import settings
+        plans = {plan: dict(config) for plan, config in settings.HOSTMAIL_PLANS.items()}
+        plans['free']['api_rate_limit'] = '2/m'
+        with override_settings(HOSTMAIL_PLANS=plans):
+            statuses = [self.get(ip=f'203.0.113.{index}').status_code for index in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_fail_open_or_closed(self):
+        from unittest import mock
+        with mock.patch('core.ratelimit.get_backend', side_effect=ConnectionError('cache indisponible')):
+            self.assertEqual(self.get().status_code, 200)
+            with override_settings(RATELIMIT_FAIL_OPEN=False):
+                self.assertEqual(self.get().status_code, 503)
+
+    def test_parse_rate(self):
+        from core.ratelimit import Rate, parse_rate
+        self.assertEqual(parse_rate('10/m'), Rate(10, 60))
+        self.assertEqual(parse_rate('100/5m'), Rate(100, 300))
+        self.assertEqual(parse_rate('1000/hour'), Rate(1000, 3600))
+        self.assertIsNone(parse_rate(''))
+
+
+try:
+    import fakeredis
+except ImportError:  # dépendance de test (requirements-dev.txt)
+    fakeredis = None
+
+
+@unittest.skipUnless(fakeredis, 'fakeredis[lua] non installé')
+class RedisRateLimitTests(TestCase):
+    """Tests du script Lua GCRA (RedisBackend) sur un Redis simulé"""
+
+    def setUp(self):
+        from django.core.cache.backends.locmem import LocMemCache
+        from django.core.cache.backends.redis import RedisCache
+        from core.ratelimit import CacheBackend, RedisBackend
+        self.redis_cache = RedisCache('redis://localhost:6379/0', {
+            'OPTIONS': {'connection_class': fakeredis.FakeConnection, 'server': fakeredis.FakeServer()},
+        })
+        self.redis = RedisBackend(self.redis_cache)
+        self.local = CacheBackend(LocMemCache('ratelimit-tests', {}))
+        self.now = 1760000000.0
+
+    def test_same_decisions_as_cache_backend(self):
+        """Test que le script Lua prend les mêmes décisions que l'implémentation Python"""
+        from core.ratelimit import Bucket, Rate
+        buckets = [Bucket('ip', Rate(3, 60)), Bucket('key', Rate(10, 60))]
+        for step in (0, 0.1, 0.2, 0.3, 5, 21, 60):
+            now = self.now + step
+            self.assertEqual(self.redis.hit(buckets, now), self.local.hit(buckets, now), step)
+
+    def test_budget_and_ttl(self):
+        from core.ratelimit import Bucket, Rate
+        bucket = Bucket('ip', Rate(3, 60))
+        allowed = [self.redis.hit([bucket], self.now)[0].allowed for _ in range(4)]
+        self.assertEqual(allowed, [True, True, True, False])
+        self.assertGreaterEqual(self.redis.hit([bucket], self.now)[0].retry_after, 1)
+
+        # Expiration en millisecondes, bornée par la période
+        client = self.redis_cache._cache.get_client(write=True)
+        ttl = client.pttl(self.redis_cache.make_key('ip'))
+        self.assertGreater(ttl, 0)
+        self.assertLessEqual(ttl, 60 * 1000)
+
+    def test_denied_request_consumes_no_bucket(self):
+        """Test qu'un refus par un seau ne consomme pas le budget des autres"""
+        from core.ratelimit import Bucket, Rate
+        narrow, wide = Bucket('ip', Rate(1, 60)), Bucket('key', Rate(10, 60))
+        self.redis.hit([narrow, wide], self.now)
+        for _ in range(3):
+            self.assertFalse(self.redis.hit([narrow, wide], self.now)[0].allowed)
+        self.assertEqual(self.redis.hit([wide], self.now)[0].remaining, 8)
+
+
+@override_settings(ANALYTICS_FLUSH_INTERVAL=0)
+class PublicCorsTests(TestCase):
+    """Tests pour le CORS par site web des endpoints publics"""
+
+    url = '/api/public/projects/'
+
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@example.com', password='password123')
+        self.website = Website.objects.create(
+            user=self.user, name='Site', domain='example.com',
+            allowed_origins='https://example.com/\nhttps://WWW.example.com'
+        )
+
+    def get(self, origin):
+        return self.client.get(self.url, HTTP_X_API_KEY=self.website.api_key, HTTP_ORIGIN=origin)
+
+    def test_preflight_answered_without_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.options(
+                self.url, HTTP_ORIGIN='https://example.com',
+                HTTP_ACCESS_CONTROL_REQUEST_METHOD='GET', HTTP_ACCESS_CONTROL_REQUEST_HEADERS='x-api-key'
+            )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Access-Control-Allow-Origin'], 'https://example.com')
+        self.assertIn('x-api-key', response['Access-Control-Allow-Headers'])
+        self.assertEqual(response['Access-Control-Max-Age'], '86400')
+
+    def test_allowed_origin(self):
+        response = self.get('https://www.example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Access-Control-Allow-Origin'], 'https://www.example.com')
+        self.assertIn('X-RateLimit-Remaining', response['Access-Control-Expose-Headers'])
+        self.assertIn('Origin', response['Vary'])
+
+    def test_refused_origin(self):
+        response = self.get('https://evil.example')
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('Access-Control-Allow-Origin', response)
+
+    def test_no_restriction(self):
+        self.website.allowed_origins = ''
+        self.website.save()
+        self.assertTrue(self.website.is_origin_allowed('https://any.example'))
+        self.assertEqual(self.get('https://any.example')['Access-Control-Allow-Origin'], 'https://any.example')